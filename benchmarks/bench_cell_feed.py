@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for reading a worksheet's cell feed.
+
+Compares the single-request read (a parsed ElementTree plus a list of every
+cell) with the streaming reader used by Sheet.data(). Each mode runs in a
+fresh process so peak memory can be compared. Run with:
+
+    python benchmarks/bench_cell_feed.py [rows] [cols]
+"""
+import os, sys, time, resource, subprocess, tempfile, threading, collections
+
+import sheetsync
+
+FEED_URL = 'https://spreadsheets.google.com/feeds/cells/key/od6/private/full'
+
+def make_feed(path, rows, cols):
+    out = open(path, 'wb')
+    out.write("<?xml version='1.0' encoding='UTF-8'?>"
+              "<feed xmlns='http://www.w3.org/2005/Atom' "
+              "xmlns:gs='http://schemas.google.com/spreadsheets/2006'>")
+    for row in xrange(2, rows + 2):
+        for col in xrange(1, cols + 1):
+            cell_id = 'R%sC%s' % (row, col)
+            out.write("<entry><id>%s/%s</id><title>%s</title>"
+                      "<link rel='edit' type='application/atom+xml' "
+                      "href='%s/%s/1'/>"
+                      "<gs:cell row='%s' col='%s' inputValue='value %s'>"
+                      "value %s</gs:cell></entry>" % (FEED_URL, cell_id,
+                      cell_id, FEED_URL, cell_id, row, col, cell_id, cell_id))
+    out.write("</feed>")
+    out.close()
+
+class FakeSession(object):
+    def __init__(self, path):
+        self.path = path
+
+    def get(self, url):
+        return open(self.path, 'rb')
+
+class FakeClient(object):
+    # Serves the feed file like gspread: get_cells_feed parses the whole
+    # response, session.get returns the unread response.
+    def __init__(self, path):
+        self.session = FakeSession(path)
+
+    def get_cells_feed(self, worksheet, params=None):
+        from xml.etree import ElementTree
+        return ElementTree.fromstring(self.session.get(None).read())
+
+class FakeRegistry(object):
+    def __init__(self, path):
+        self.client = FakeClient(path)
+
+    def gspread_client(self, credentials):
+        return self.client
+
+class FakeWorksheet(object):
+    def get_id_fields(self):
+        return {'spreadsheet_id': 'key', 'worksheet_id': 'od6'}
+
+def make_sheet(path, cols):
+    # A Sheet wired to a canned feed, skipping the google lookups in __init__.
+    sheet = sheetsync.Sheet.__new__(sheetsync.Sheet)
+    sheet.credentials = None
+    sheet.client_registry = FakeRegistry(path)
+    sheet._worksheet = FakeWorksheet()
+    sheet._thread_local = threading.local()
+    sheet.request_hooks = []
+    sheet.retry_policy = sheetsync.RetryPolicy()
+    sheet._counts = collections.Counter()
+    sheet._counts_lock = threading.Lock()
+    sheet.header_row_ix = 1
+    sheet.formula_ref_row_ix = None
+    sheet.read_page_rows = None
+    sheet.read_concurrency = 1
+    sheet.header = sheetsync.Header()
+    for col in xrange(1, cols + 1):
+        sheet.header.set(col, 'Column %s' % col)
+    return sheet
+
+def run(mode, path, cols):
+    sheet = make_sheet(path, cols)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    if mode == 'single':
+        cells = sheet._cell_feed(row=2, further_rows=True, col=1,
+                                 max_col=cols, return_empty=True)
+    else:
+        cells = sheet._iter_cell_feed(row=2, col=1, max_col=cols,
+                                      return_empty=True)
+    first_row = None
+    count = 0
+    for wks_row in sheet._yield_rows(cells):
+        if first_row is None:
+            first_row = time.time() - start
+        count += 1
+    total = time.time() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    print "%-10s %8s %14.3fs %10.3fs %10.1fMB" % (mode, count, first_row,
+                                                   total, peak / 1024.0)
+
+def main(rows, cols):
+    fd, path = tempfile.mkstemp(suffix='.xml')
+    os.close(fd)
+    try:
+        make_feed(path, rows, cols)
+        print "%s rows x %s columns, %.1fMB feed" % (rows, cols,
+                                        os.path.getsize(path) / 1048576.0)
+        print "%-10s %8s %15s %11s %12s" % ('mode', 'rows', 'first row',
+                                            'total', 'peak mem')
+        for mode in ('single', 'streaming'):
+            subprocess.check_call([sys.executable, __file__, '--run', mode,
+                                   path, str(cols)])
+    finally:
+        os.remove(path)
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--run']:
+        run(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+    else:
+        args = [int(arg) for arg in sys.argv[1:]]
+        main(*(args + [20000, 10][len(args):]))
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for reading a worksheet with parallel page requests.
+
+Starts a local HTTP server (in its own process) that mimics the spreadsheets
+cell feed, with a fixed latency per request plus a delay per cell returned,
+and times Sheet.data() reading it with different read_concurrency settings.
+Run with:
+
+    python benchmarks/bench_concurrent_read.py [rows] [cols] [latency]
+"""
+import sys, time, threading, collections, urlparse, subprocess
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+
+import gspread
+import sheetsync
+
+ATOM = 'http://www.w3.org/2005/Atom'
+GS = 'http://schemas.google.com/spreadsheets/2006'
+SECONDS_PER_CELL = 0.0001     # Server time to produce each cell.
+
+class FeedServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, rows, cols, latency):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), FeedHandler)
+        self.rows, self.cols, self.latency = rows, cols, latency
+
+    @property
+    def feeds_url(self):
+        return 'http://127.0.0.1:%s/feeds/' % self.server_address[1]
+
+class ServerInfo(object):
+    # What the client side needs to know about the server process.
+    def __init__(self, port, rows, cols):
+        self.feeds_url = 'http://127.0.0.1:%s/feeds/' % port
+        self.rows, self.cols = rows, cols
+
+class FeedHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        parsed = urlparse.urlparse(self.path)
+        if parsed.path.startswith('/feeds/worksheets/'):
+            body = worksheet_entry(server)
+        else:
+            query = dict(urlparse.parse_qsl(parsed.query))
+            min_row = int(query.get('min-row', 1))
+            max_row = min(int(query.get('max-row', server.rows)), server.rows)
+            min_col = int(query.get('min-col', 1))
+            max_col = min(int(query.get('max-col', server.cols)), server.cols)
+            body = cells_feed(server, min_row, max_row, min_col, max_col)
+            cells = max(0, max_row - min_row + 1) * (max_col - min_col + 1)
+            time.sleep(cells * SECONDS_PER_CELL)
+        time.sleep(server.latency)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def worksheet_entry(server):
+    self_link = server.feeds_url + 'worksheets/key/private/full/od6'
+    return ("<entry xmlns='%s' xmlns:gs='%s'><id>%s</id>"
+            "<updated>2014-01-01T00:00:00.000Z</updated>"
+            "<link rel='self' href='%s'/>"
+            "<gs:rowCount>%s</gs:rowCount><gs:colCount>%s</gs:colCount>"
+            "</entry>" % (ATOM, GS, self_link, self_link, server.rows, server.cols))
+
+def cells_feed(server, min_row, max_row, min_col, max_col):
+    base = server.feeds_url + 'cells/key/od6/private/full'
+    parts = ["<feed xmlns='%s' xmlns:gs='%s'>" % (ATOM, GS)]
+    for row in xrange(min_row, max_row + 1):
+        for col in xrange(min_col, max_col + 1):
+            cell_id = 'R%sC%s' % (row, col)
+            value = row if col == 1 else 'value %s' % cell_id
+            parts.append("<entry><id>%s/%s</id><title>%s</title>"
+                "<link rel='edit' type='application/atom+xml' href='%s/%s/1'/>"
+                "<gs:cell row='%s' col='%s' inputValue='%s'>%s</gs:cell>"
+                "</entry>" % (base, cell_id, cell_id, base, cell_id,
+                              row, col, value, value))
+    parts.append("</feed>")
+    return ''.join(parts)
+
+class Credentials(object):
+    access_token = 'token'
+    access_token_expired = False
+
+class Worksheet(object):
+    def __init__(self, server):
+        self._element = sheetsync.ElementTree.fromstring(worksheet_entry(server))
+
+    def _get_link(self, rel, element):
+        return element.find("{%s}link[@rel='%s']" % (ATOM, rel))
+
+    @property
+    def row_count(self):
+        return int(self._element.find('{%s}rowCount' % GS).text)
+
+    def get_id_fields(self):
+        return {'spreadsheet_id': 'key', 'worksheet_id': 'od6'}
+
+def make_sheet(server, concurrency, page_rows=None):
+    # A Sheet wired to the local server, skipping the drive lookups in __init__.
+    sheet = sheetsync.Sheet.__new__(sheetsync.Sheet)
+    sheet.credentials = Credentials()
+    sheet.client_registry = sheetsync.ClientRegistry()
+    sheet._worksheet = Worksheet(server)
+    sheet._thread_local = threading.local()
+    sheet.request_hooks = []
+    sheet.retry_policy = sheetsync.RetryPolicy()
+    sheet._counts = collections.Counter()
+    sheet._counts_lock = threading.Lock()
+    sheet.header_row_ix = 1
+    sheet.formula_ref_row_ix = None
+    sheet.read_page_rows = page_rows
+    sheet.read_concurrency = concurrency
+    sheet.key_column_headers = ['Key']
+    sheet.key_index = sheetsync.KeyIndex()
+    sheet.header = sheetsync.Header()
+    sheet.header.set(1, 'Key')
+    for col in xrange(2, server.cols + 1):
+        sheet.header.set(col, 'Column %s' % col)
+    return sheet
+
+def serve(rows, cols, latency):
+    server = FeedServer(rows, cols, latency)
+    print server.server_address[1]
+    sys.stdout.flush()
+    server.serve_forever()
+
+def main(rows, cols, latency):
+    process = subprocess.Popen([sys.executable, __file__, '--serve', str(rows),
+                                str(cols), str(latency)],
+                               stdout=subprocess.PIPE)
+    port = int(process.stdout.readline())
+    server = ServerInfo(port, rows, cols)
+    gspread.urls.SPREADSHEETS_FEED_URL = server.feeds_url
+    try:
+        print "%s rows x %s columns, %.2fs latency per request" % (rows, cols,
+                                                                   latency)
+        print "%12s %10s %10s %10s" % ('concurrency', 'page rows', 'time', 'speedup')
+        serial_data, serial_time = None, None
+        for concurrency, page_rows in [(1, None), (2, None), (4, None),
+                                       (8, None), (16, None), (16, 1000)]:
+            sheet = make_sheet(server, concurrency, page_rows)
+            start = time.time()
+            data = sheet.data()
+            elapsed = time.time() - start
+            if serial_data is None:
+                serial_data, serial_time = data, elapsed
+            assert data == serial_data
+            print "%12s %10s %9.2fs %9.1fx" % (concurrency, page_rows or '-',
+                                               elapsed, serial_time / elapsed)
+    finally:
+        process.terminate()
+
+if __name__ == '__main__':
+    serve_mode = sys.argv[1:2] == ['--serve']
+    args = [float(arg) for arg in sys.argv[1 + serve_mode:]]
+    rows, cols, latency = (args + [20000, 10, 0.2][len(args):])
+    (serve if serve_mode else main)(int(rows), int(cols), latency)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the row diff used by Sheet._update.
+
+Compares the old per-field google_equivalent loop with bulk_row_differences
+for no-op and 1%-changed syncs. Run with:
+
+    python benchmarks/bench_diff.py [rows ...]
+"""
+import sys, time, random
+
+from sheetsync import google_equivalent, bulk_row_differences
+
+COLUMNS = ['Name', 'Team', 'Position', 'Started', 'Apps', 'Goals',
+           'Notes', 'Updated']
+
+def make_rows(count):
+    rows = {}
+    for i in xrange(count):
+        rows[(str(i),)] = {
+            'Name': u'Player %s' % i,
+            'Team': u'Team %s' % (i % 20),
+            'Position': random.choice([u'GK', u'DF', u'MF', u'FW']),
+            'Started': u'%s/%s/20%02d' % (i % 12 + 1, i % 28 + 1, i % 15),
+            'Apps': unicode(i % 60),
+            'Goals': unicode(i % 7),
+            'Notes': u'Line one\nLine two' if i % 10 == 0 else u'',
+            'Updated': u'%s/1/2014' % (i % 12 + 1)}
+    return rows
+
+def change_rows(rows, fraction):
+    changed = dict((key, dict(row)) for key, row in rows.iteritems())
+    for key in random.sample(changed.keys(), int(len(changed) * fraction)):
+        changed[key]['Goals'] = u'99'
+    return changed
+
+def per_field_diff(raw_data, sheet_data):
+    changed = 0
+    for key, raw_row in raw_data.iteritems():
+        sheet_row = sheet_data[key]
+        different_fields = []
+        for header, raw_value in raw_row.iteritems():
+            if not google_equivalent(raw_value, sheet_row.get(header, "")):
+                different_fields.append(header)
+        if different_fields:
+            changed += 1
+    return changed
+
+def bulk_diff(raw_data, sheet_data):
+    keys = raw_data.keys()
+    differences = bulk_row_differences([raw_data[key] for key in keys],
+                                       [sheet_data[key] for key in keys])
+    return len([different for different in differences if different])
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+def main(sizes):
+    random.seed(1)
+    print "%8s %8s %12s %12s %8s" % ('rows', 'changed', 'per-field', 'bulk', 'speedup')
+    for size in sizes:
+        sheet_data = make_rows(size)
+        for fraction in (0.0, 0.01):
+            raw_data = change_rows(sheet_data, fraction)
+            old_count, old_time = timed(per_field_diff, raw_data, sheet_data)
+            new_count, new_time = timed(bulk_diff, raw_data, sheet_data)
+            assert old_count == new_count
+            print "%8s %7.0f%% %11.3fs %11.3fs %7.1fx" % (size, fraction * 100,
+                    old_time, new_time, old_time / new_time)
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000])
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the memory held by the rows that Sheet.data() returns.
+
+Compares the previous layout (a dict of gspread Cells plus a dict of values
+for every row) with the column-oriented Table. Each layout is built in a
+fresh process from the same canned cell feed so peak memory can be compared.
+Run with:
+
+    python benchmarks/bench_memory.py [rows] [cols]
+"""
+import os, sys, time, resource, subprocess, tempfile
+
+from bench_cell_feed import make_feed, make_sheet
+
+class OldRow(dict):
+    # The row object used before the Table: one Cell per column and a
+    # parallel dictionary of values.
+    def __init__(self, row_num):
+        self.row_num = row_num
+        self.db = {}
+        dict.__init__(self)
+
+    def __setitem__(self, key, cell):
+        dict.__setitem__(self, key, cell)
+        self.db[key] = cell.value
+
+def read_old(sheet, cells):
+    rows = {}
+    cur_row = None
+    for cell in cells:
+        if cur_row is None or cur_row.row_num != cell.row:
+            cur_row = rows[cell.row] = OldRow(cell.row)
+        cur_row[sheet.header.col_lookup(cell.col)] = cell
+    return rows
+
+def run(mode, path, cols):
+    sheet = make_sheet(path, cols)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    cells = sheet._iter_cell_feed(row=2, col=1, max_col=cols,
+                                  return_empty=True)
+    if mode == 'row-dicts':
+        rows = read_old(sheet, cells)
+    else:
+        rows = sheet._read_table(cells)
+    total = time.time() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    print "%-10s %8s %10.3fs %10.1fMB" % (mode, len(rows), total,
+                                          peak / 1024.0)
+
+def main(rows, cols):
+    fd, path = tempfile.mkstemp(suffix='.xml')
+    os.close(fd)
+    try:
+        make_feed(path, rows, cols)
+        print "%s rows x %s columns" % (rows, cols)
+        print "%-10s %8s %11s %12s" % ('layout', 'rows', 'total', 'peak mem')
+        for mode in ('row-dicts', 'table'):
+            subprocess.check_call([sys.executable, __file__, '--run', mode,
+                                   path, str(cols)])
+    finally:
+        os.remove(path)
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--run']:
+        run(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+    else:
+        args = [int(arg) for arg in sys.argv[1:]]
+        main(*(args + [50000, 10][len(args):]))
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for comparing whole columns of input values with the values
+google stores in a worksheet.
+
+Compares calling google_equivalent for every cell with
+google_equivalent_columns, on columns of a million cells in total. The input
+data differs from the worksheet the way it often does: dates written in
+another format, stray whitespace, tabs and a few real changes. Run with:
+
+    python benchmarks/bench_normalize.py [rows]
+"""
+import sys, time, random
+
+from sheetsync import google_equivalent, google_equivalent_columns, date_cache
+
+COLUMNS = ['Name', 'Team', 'Position', 'Started', 'Apps', 'Goals',
+           'Notes', 'Updated']
+
+def make_columns(rows):
+    # Returns the worksheet's values and the input values for each column.
+    sheet, raw = dict((c, []) for c in COLUMNS), dict((c, []) for c in COLUMNS)
+    for i in xrange(rows):
+        month, day, year = i % 12 + 1, i % 28 + 1, 2000 + i % 15
+        values = {
+            'Name': (u'Player %s' % i, u'Player %s ' % i if i % 3 else u'Player %s' % i),
+            'Team': (u'Team %s' % (i % 20), u'Team %s' % (i % 20)),
+            'Position': (u'MF', random.choice([u'MF', u'MF ', u'FW'])),
+            'Started': (u'%s/%s/%s' % (month, day, year),
+                        u'%04d-%02d-%02d' % (year, month, day)),
+            'Apps': (unicode(i % 60), unicode(i % 60)),
+            'Goals': (unicode(i % 7), u'99' if i % 100 == 0 else unicode(i % 7)),
+            'Notes': (u'Line one\nLine two' if i % 10 == 0 else u'',
+                      u'Line one\t\nLine  two' if i % 10 == 0 else u''),
+            'Updated': (u'%s/1/2014' % month, u'%02d/01/2014' % month)}
+        for column, (sheet_value, raw_value) in values.iteritems():
+            sheet[column].append(sheet_value)
+            raw[column].append(raw_value)
+    return sheet, raw
+
+def main(rows):
+    random.seed(1)
+    sheet, raw = make_columns(rows)
+    print "%s rows x %s columns = %s cells" % (rows, len(COLUMNS),
+                                               rows * len(COLUMNS))
+    print "%-10s %10s %12s %12s %8s" % ('column', 'different', 'per-cell',
+                                        'columns', 'speedup')
+    total_old = total_new = 0
+    for column in COLUMNS:
+        start = time.time()
+        old = [google_equivalent(raw_value, sheet_value) for raw_value,
+                                sheet_value in zip(raw[column], sheet[column])]
+        old_time = time.time() - start
+        start = time.time()
+        new = google_equivalent_columns(raw[column], sheet[column])
+        new_time = time.time() - start
+        assert old == new
+        total_old += old_time
+        total_new += new_time
+        print "%-10s %10s %11.3fs %11.3fs %7.1fx" % (column, new.count(False),
+                            old_time, new_time, old_time / max(new_time, 1e-6))
+    print "%-10s %10s %11.3fs %11.3fs %7.1fx" % ('total', '', total_old,
+                                                 total_new, total_old / total_new)
+    stats = date_cache.stats()
+    print "date cache: %(hits)s hits, %(misses)s misses (%(hit_rate).1f%%)" % dict(
+                                    stats, hit_rate=stats['hit_rate'] * 100)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if sys.argv[1:] else 125000)
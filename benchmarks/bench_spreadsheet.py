@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for syncing one dataset split across many worksheets of a
+spreadsheet, against the in-process mock of the Google APIs
+(tests/mock_google.py) with latency added to every request.
+
+Compares a Sheet per worksheet synced one after another, with a Spreadsheet
+syncing them in parallel, and with an AsyncSheet per worksheet. Run from the top of the repository with:
+
+    PYTHONPATH=. python benchmarks/bench_spreadsheet.py [worksheets] [rows]
+                                                        [latency]
+"""
+import sys, time, logging
+
+import sheetsync
+from tests import mock_google
+
+HEADER = ['Key', 'Color', 'Performer']
+
+def worksheet_data(worksheets, rows):
+    return dict(('Worksheet %02d' % ws,
+                 dict(('row%s' % i, {'Color': 'color %s %s' % (ws, i),
+                                     'Performer': 'name %s' % i})
+                      for i in xrange(rows)))
+                for ws in xrange(worksheets))
+
+def load(google, data):
+    # A document with the data already in it, so the sync is all reads.
+    doc = google.create_document('Benchmark')
+    del doc.worksheets[:]
+    for name in sorted(data):
+        wks = mock_google.MockWorksheet(google._new_key('ws'), name, 1, 1)
+        doc.worksheets.append(wks)
+        google.load_rows(doc, HEADER, [[key, row['Color'], row['Performer']]
+                                       for key, row in sorted(data[name].items())],
+                         worksheet=wks)
+    return doc
+
+def run_sheets(doc, data):
+    results = {}
+    for name, rows in data.items():
+        sheet = sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                                document_key=doc.key, worksheet_name=name,
+                                key_column_headers=['Key'])
+        results[name] = sheet.sync(rows)
+    return results
+
+def run_spreadsheet(doc, data, concurrency):
+    spreadsheet = sheetsync.Spreadsheet(
+                            credentials=mock_google.MockCredentials(),
+                            document_key=doc.key, concurrency=concurrency,
+                            key_column_headers=['Key'])
+    return spreadsheet.sync(data)
+
+def run_async(doc, data):
+    sheets = dict((name, sheetsync.AsyncSheet(
+                            credentials=mock_google.MockCredentials(),
+                            document_key=doc.key, worksheet_name=name,
+                            key_column_headers=['Key']))
+                  for name in data)
+    futures = dict((name, sheet.sync(data[name]))
+                   for name, sheet in sheets.items())
+    return dict((name, future.result()) for name, future in futures.items())
+
+def main(worksheets, rows, latency):
+    logging.basicConfig(level=logging.WARNING)
+    google = mock_google.install(google=mock_google.MockGoogle(latency))
+    data = worksheet_data(worksheets, rows)
+    doc = load(google, data)
+    print "%s worksheets x %s rows, %.2fs latency per request" % (worksheets,
+                                                                 rows, latency)
+    print "%-20s %10s %9s" % ('mode', 'seconds', 'requests')
+    for mode, concurrency in [('sheets', None), ('spreadsheet', 1),
+                              ('spreadsheet', 8), ('spreadsheet', worksheets),
+                              ('async sheets', None)]:
+        google.reset_counters()
+        start = time.time()
+        if mode == 'async sheets':
+            results = run_async(doc, data)
+        elif concurrency is None:
+            results = run_sheets(doc, data)
+        else:
+            results = run_spreadsheet(doc, data, concurrency)
+            mode = '%s x%s' % (mode, concurrency)
+        assert all(result.nochange == rows for result in results.values())
+        print "%-20s %10.3f %9s" % (mode, time.time() - start, google.requests)
+
+if __name__ == '__main__':
+    args = [float(arg) for arg in sys.argv[1:]]
+    worksheets, rows, latency = args + [30, 100, 0.2][len(args):]
+    main(int(worksheets), int(rows), latency)
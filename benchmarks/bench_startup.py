@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the time a new process takes to import sheetsync and open a
+worksheet, as short lived cron jobs do.
+
+Each mode runs in a fresh process against the in-process mock of the Google
+APIs (tests/mock_google.py), which adds latency to every request:
+
+    eager   imports every google client library up front and downloads the
+            Drive discovery document, as sheetsync used to.
+    cold    imports lazily, with an empty discovery document cache.
+    warm    imports lazily, with the discovery document already cached.
+
+The open time includes importing the libraries that weren't needed until
+then. Run from the top of the repository with:
+
+    PYTHONPATH=. python benchmarks/bench_startup.py [latency]
+"""
+import os, sys, time, shutil, tempfile, subprocess
+
+def run(mode, cache_dir, latency):
+    start = time.time()
+    import sheetsync
+    if mode == 'eager':
+        import httplib2, gspread, apiclient.discovery, oauth2client.client
+        import dateutil.parser
+    imported = time.time()
+
+    from tests import mock_google
+    google = mock_google.install(google=mock_google.MockGoogle(latency))
+    cache = None if mode == 'eager' else sheetsync.DiscoveryCache(cache_dir)
+    sheetsync.shared_clients = sheetsync.ClientRegistry(cache)
+    setup = time.time()
+    doc = google.create_document('Startup')
+
+    start_open = time.time()
+    sheet = sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                            document_key=doc.key)
+    sheet.data()
+    opened = (setup - imported) + (time.time() - start_open)
+    print "%-8s %10.3fs %10.3fs %10.3fs" % (mode, imported - start, opened,
+                                            imported - start + opened)
+
+def main(latency):
+    cache_dir = tempfile.mkdtemp()
+    try:
+        print "%.2fs latency per request" % latency
+        print "%-8s %11s %11s %11s" % ('mode', 'import', 'open', 'total')
+        for mode in ('eager', 'cold', 'warm'):
+            subprocess.check_call([sys.executable, __file__, '--run', mode,
+                                   cache_dir, str(latency)])
+    finally:
+        shutil.rmtree(cache_dir)
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--run']:
+        run(sys.argv[2], sys.argv[3], float(sys.argv[4]))
+    else:
+        main(float(sys.argv[1]) if sys.argv[1:] else 0.1)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+End to end benchmarks for sync, inject and data() against the in-process mock
+of the Google APIs (tests/mock_google.py).
+
+Each scenario preloads a worksheet (or leaves it empty, for the load
+scenarios), then times one call on a fresh Sheet and counts the requests and bytes it needed. Results can be checked against, or
+saved as, the baselines in benchmarks/baselines.json. Run from the top of the
+repository with:
+
+    PYTHONPATH=. python benchmarks/bench_sync.py [--sizes 1000,10000,100000]
+                                                 [--check | --update]
+
+--check exits with an error if any scenario needs more requests or bytes than
+its baseline, or is much slower.
+"""
+import os, sys, json, time, argparse, logging
+
+import sheetsync
+from tests import mock_google
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'baselines.json')
+HEADER = ['Key', 'Color', 'Performer', 'Notes']
+CHANGES = [0.0, 0.01, 0.5]
+
+# Request and byte counts are deterministic, timings are not.
+COUNT_TOLERANCE = 1.1
+TIME_TOLERANCE = 2.0
+TIME_SLACK = 0.5
+
+def sheet_rows(rows):
+    return [['row%06d' % i, 'color %s' % i, 'name %s' % i, 'notes %s' % i]
+            for i in xrange(rows)]
+
+def raw_data(rows, changes):
+    changed = int(rows * changes)
+    data = {}
+    for key, color, performer, notes in sheet_rows(rows):
+        data[key] = {'Color': color, 'Performer': performer, 'Notes': notes}
+    for i in xrange(changed):
+        data['row%06d' % i]['Color'] = 'changed %s' % i
+    return data
+
+def run(google, operation, rows, changes):
+    # The load operation syncs all the rows into a worksheet holding only
+    # the header, as the first run of a new sync job does.
+    doc = google.create_document('Benchmark')
+    google.load_rows(doc, HEADER, [] if operation == 'load' else sheet_rows(rows))
+    data = raw_data(rows, changes)
+    sheet = sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                            document_key=doc.key, key_column_headers=['Key'])
+    google.reset_counters()
+    start = time.time()
+    if operation == 'data':
+        result = sheet.data()
+        assert len(result) == rows
+    elif operation == 'load':
+        result = sheet.sync(data)
+        assert result.added == rows, str(result)
+    else:
+        result = getattr(sheet, operation)(data)
+        assert result.changed == int(rows * changes), str(result)
+    seconds = time.time() - start
+    del google.documents[doc.key]
+    return {'seconds': round(seconds, 3),
+            'requests': google.requests,
+            'bytes_sent': google.bytes_sent,
+            'bytes_received': google.bytes_received}
+
+def scenarios(sizes):
+    for rows in sizes:
+        yield 'data-%s' % rows, 'data', rows, 0.0
+        yield 'load-%s' % rows, 'load', rows, 0.0
+        for operation in ('sync', 'inject'):
+            for changes in CHANGES:
+                yield ('%s-%s-%s%%' % (operation, rows, int(changes * 100)),
+                       operation, rows, changes)
+
+def regressions(name, result, baseline):
+    problems = []
+    for counter in ('requests', 'bytes_sent', 'bytes_received'):
+        if result[counter] > baseline[counter] * COUNT_TOLERANCE:
+            problems.append("%s: %s %s, baseline %s" % (name, counter,
+                                        result[counter], baseline[counter]))
+    if result['seconds'] > baseline['seconds'] * TIME_TOLERANCE + TIME_SLACK:
+        problems.append("%s: %.3fs, baseline %.3fs" % (name,
+                                        result['seconds'], baseline['seconds']))
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default='1000,10000',
+                        help="Comma separated worksheet sizes in rows")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="Seconds added to every mock request")
+    parser.add_argument('--check', action='store_true',
+                        help="Fail if results regress from the baselines")
+    parser.add_argument('--update', action='store_true',
+                        help="Save the results as the new baselines")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    google = mock_google.install(google=mock_google.MockGoogle(args.latency))
+    baselines = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as fh:
+            baselines = json.load(fh)
+
+    print "%-20s %10s %9s %12s %14s" % ('scenario', 'seconds', 'requests',
+                                        'bytes sent', 'bytes received')
+    problems = []
+    for name, operation, rows, changes in scenarios(
+                                [int(size) for size in args.sizes.split(',')]):
+        result = run(google, operation, rows, changes)
+        print "%-20s %10.3f %9s %12s %14s" % (name, result['seconds'],
+                result['requests'], result['bytes_sent'], result['bytes_received'])
+        if args.check and name in baselines:
+            problems.extend(regressions(name, result, baselines[name]))
+        baselines[name] = result
+
+    if args.update:
+        with open(BASELINES, 'w') as fh:
+            json.dump(baselines, fh, indent=2, sort_keys=True,
+                      separators=(',', ': '))
+            fh.write('\n')
+    if problems:
+        print "\nRegressions:\n  " + "\n  ".join(problems)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
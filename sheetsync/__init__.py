@@ -16,26 +16,123 @@
 from version import __version__
 
 import logging
-import httplib2 # pip install httplib2
-from datetime import datetime
+import importlib
+import imp
+import sys
+import types
+from datetime import datetime, timedelta
 import json
+import os
+import hashlib
+import re
+import urllib
+import math
+import threading
+import time
+import random
+import errno
+import socket
+import httplib
+import urlparse
+import collections
+import contextlib
+import itertools
+import bisect
+import array
+from multiprocessing.pool import ThreadPool
+try:
+    from xml.etree import cElementTree as ElementTree
+except ImportError:
+    from xml.etree import ElementTree
+
+class _LazyModule(object):
+    # Stands in for a module, and imports it when an attribute is first
+    # used. The google client libraries are slow to import, and short lived
+    # processes may not need all of them. Submodules are imported too, so
+    # apiclient.discovery works without importing it first.
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        try:
+            return getattr(self._module, attr)
+        except AttributeError:
+            pass
+        try:
+            imp.find_module(attr, getattr(self._module, '__path__', []))
+        except ImportError:
+            raise AttributeError("'%s' module has no attribute '%s'" %
+                                 (self._name, attr))
+        return importlib.import_module("%s.%s" % (self._name, attr))
+
+# Names sheetsync re-exports from the google libraries, and the modules they
+# come from. They're imported the first time they're used.
+_LAZY_EXPORTS = {
+    'OAuth2WebServerFlow': 'oauth2client.client',
+    'OAuth2Credentials': 'oauth2client.client',
+    'AccessTokenRefreshError': 'oauth2client.client',
+    'SpreadsheetNotFound': 'gspread',
+    'WorksheetNotFound': 'gspread',
+}
+
+class _ExportingModule(types.ModuleType):
+    # Replaces the sheetsync module in sys.modules, so that the names in
+    # _LAZY_EXPORTS can be imported from it lazily. Everything else is read,
+    # set and deleted on the real module, so monkeypatching still reaches
+    # the module's functions.
+    def __init__(self, module):
+        types.ModuleType.__init__(self, module.__name__, module.__doc__)
+        self.__dict__['_module'] = module
+
+    def __getattr__(self, attr):
+        module = self.__dict__['_module']
+        try:
+            return getattr(module, attr)
+        except AttributeError:
+            if attr not in _LAZY_EXPORTS:
+                raise
+        value = getattr(importlib.import_module(_LAZY_EXPORTS[attr]), attr)
+        setattr(module, attr, value)
+        return value
 
-# import latest google api python client.
-import apiclient.errors # pip install --upgrade google-api-python-client
-import apiclient.discovery 
-from oauth2client.client import OAuth2WebServerFlow, OAuth2Credentials, AccessTokenRefreshError
+    def __setattr__(self, attr, value):
+        setattr(self.__dict__['_module'], attr, value)
 
-# import the excellent gspread library.
-import gspread # pip install --upgrade gspread
-from gspread import SpreadsheetNotFound, WorksheetNotFound
+    def __delattr__(self, attr):
+        delattr(self.__dict__['_module'], attr)
+
+    def __dir__(self):
+        return sorted(set(dir(self.__dict__['_module'])) | set(_LAZY_EXPORTS))
 
-import dateutil.parser # pip install python-dateutil
+httplib2 = _LazyModule('httplib2') # pip install httplib2
+# import latest google api python client.
+apiclient = _LazyModule('apiclient') # pip install --upgrade google-api-python-client
+# import the excellent gspread library.
+gspread = _LazyModule('gspread') # pip install --upgrade gspread
+dateutil = _LazyModule('dateutil') # pip install python-dateutil
+futures = _LazyModule('concurrent.futures') # pip install futures
 
 logger = logging.getLogger('sheetsync')
 
 MAX_BATCH_LEN = 500   # Google's limit is 1MB or 1000 batch entries.
+MAX_BATCH_ENTRIES = 1000
+MAX_BATCH_BYTES = 1000000
+BATCH_ENTRY_BYTES = 450   # Approximate size of a batch entry, less its value.
+RANGE_BATCH_CELLS = 10000   # Cells sent with one request when writing ranges.
+MAX_RANGE_BYTES = 1000000
+RANGE_ENTRY_BYTES = 8     # Quotes and separators around a value in a range.
+MIN_RANGE_CELLS = 2       # Smaller blocks of cells are written one by one.
+TARGET_BATCH_SECONDS = 10.0
 DELETE_ME_FLAG = ' (DELETED)'
 DEFAULT_WORKSHEET_NAME = 'Sheet1'
+DISCOVERY_CACHE_SECONDS = 24 * 60 * 60
+DATE_CACHE_SIZE = 50000
+DATE_COLUMN_SAMPLE = 25
+ASYNC_POOL_SIZE = 16
+WORKER_POOL_SIZE = 16     # Threads reading pages and sending batches.
 
 def ia_credentials_helper(client_id, client_secret, 
                           credentials_cache_file="credentials.json",
@@ -61,6 +158,9 @@ def ia_credentials_helper(client_id, client_secret,
         https://developers.google.com/api-client-library/python/guide/aaa_oauth
 
     """
+    from oauth2client.client import (OAuth2WebServerFlow, OAuth2Credentials,
+                                     AccessTokenRefreshError)
+
     def _load_credentials(key):
         with open(credentials_cache_file, 'rb') as inf:
             cache = json.load(inf)
@@ -121,6 +221,125 @@ def _is_google_fmt_date(text):
     except:
         return False
 
+# Returned by the date cache for text that dateutil can't parse.
+_UNPARSEABLE = object()
+
+# Text that _is_google_fmt_date might accept. Anything else isn't a date in
+# google's format, which is decided without touching the date cache.
+_GOOGLE_DATE_SHAPE = re.compile(r'\d+/\d+/\d+\Z')
+
+def _next_midnight():
+    # The time.time() at which today ends.
+    tomorrow = datetime.now().date() + timedelta(days=1)
+    return time.mktime(tomorrow.timetuple())
+
+class DateCache(object):
+    """ A bounded cache of the dates found when comparing values, keeping
+    the most recently used.
+
+    Checking whether a value is a date in google's format, and parsing it,
+    is the slow part of comparing most cells. Date columns repeat the same
+    values from row to row and from one sync to the next, so sheetsync
+    remembers the results. All Sheets share the module's date_cache. The
+    hit and miss counts show whether maxsize suits your data:
+
+    >>> sheetsync.date_cache.stats()
+    {'hits': 9950, 'misses': 50, 'hit_rate': 0.995, 'size': 50, 'maxsize': 50000}
+
+    Text that isn't shaped like a google date is turned away before the
+    cache is looked at, and only text that turns out to be a date is
+    remembered, so other values neither slow down nor fill the cache.
+
+    Lookups don't take a lock. Entries are kept in two generations: when the
+    newer fills up the older one is dropped, and an entry found in the older
+    one is moved back to the newer, so the dates in use stay cached. With
+    many threads comparing at once the hit and miss counts are approximate.
+
+    Values parsed by dateutil take missing parts from today's date, so the
+    cache is emptied when the day changes. The hit and miss counts are kept
+    until clear is called.
+
+    Args:
+        maxsize (int): The most values remembered.
+    """
+    def __init__(self, maxsize=DATE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """ Forgets all values, and resets the statistics. """
+        with self._lock:
+            self._forget()
+            self.hits = 0
+            self.misses = 0
+
+    def _forget(self):
+        # Empties the cache until the next midnight. Call with the lock held.
+        self._recent = {}
+        self._older = {}
+        self._expires = _next_midnight()
+
+    def stats(self):
+        """ Returns a dictionary of the hits, misses, hit_rate, size and
+        maxsize of the cache. """
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+                'size': len(self._recent) + len(self._older),
+                'maxsize': self.maxsize}
+
+    def google_date(self, text):
+        """ The date, if text is a date in google's M/D/YYYY format, or
+        False. """
+        if _GOOGLE_DATE_SHAPE.match(text) is None:
+            return False
+        return self._lookup(text, 0, _is_google_fmt_date)
+
+    def parse(self, text):
+        """ The datetime dateutil parses text as, or _UNPARSEABLE if it
+        raises a ValueError. Other errors are raised. """
+        return self._lookup(text, 1, _parse_date)
+
+    def _lookup(self, text, field, compute):
+        # Each entry holds both results for a text, filled in as needed.
+        if time.time() >= self._expires:
+            with self._lock:
+                self._forget()
+        entry = self._recent.get(text)
+        if entry is None:
+            entry = self._older.pop(text, None)
+            if entry is not None:
+                self._insert(text, entry)
+        if entry is not None and entry[field] is not None:
+            self.hits += 1
+            return entry[field]
+        self.misses += 1
+        value = compute(text)
+        if value and value is not _UNPARSEABLE:
+            if entry is None:
+                entry = [None, None]
+                entry[field] = value
+                self._insert(text, entry)
+            else:
+                entry[field] = value
+        return value
+
+    def _insert(self, text, entry):
+        with self._lock:
+            if len(self._recent) >= max(1, self.maxsize // 2):
+                self._older = self._recent
+                self._recent = {}
+            self._recent[text] = entry
+
+def _parse_date(text):
+    try:
+        return dateutil.parser.parse(text)
+    except ValueError:
+        return _UNPARSEABLE
+
+date_cache = DateCache()
+
 def google_equivalent(text1, text2):
     # Google spreadsheets modify some characters, and anything that looks like
     # a date. So this function will return true if text1 would equal text2 if 
@@ -142,19 +361,232 @@ def google_equivalent(text1, text2):
         return True
 
     # Might be dates.
-    text1 = lines1[0]
-    text2 = lines2[0]
-    if _is_google_fmt_date(text1) or _is_google_fmt_date(text2):
-        try:
-            date1 = dateutil.parser.parse(text1)
-            date2 = dateutil.parser.parse(text2)
-            if date1 == date2:
-                return True
-        except ValueError:
+    return _equivalent_dates(lines1[0], lines2[0])
+
+def _equivalent_dates(text1, text2):
+    # Compares two different single lines, which google treats as equal if
+    # either is a date in its format and they're the same date.
+    if date_cache.google_date(text1) or date_cache.google_date(text2):
+        date1 = date_cache.parse(text1)
+        if date1 is _UNPARSEABLE:
             # Couldn't parse one of the dates.
-            pass
+            return False
+        date2 = date_cache.parse(text2)
+        return date2 is not _UNPARSEABLE and date1 == date2
     return False
 
+# Characters that may split a value into lines, or need replacing within a
+# line. Values without any are a single line that only needs stripping.
+_LINE_SPECIALS = re.compile(u'[\n\r\t\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+
+def _is_date_column(values):
+    # Infers from a sample of its values whether a column holds dates.
+    sample = [value for value in itertools.islice(values, DATE_COLUMN_SAMPLE)
+                    if value]
+    dates = [value for value in sample
+                   if date_cache.google_date(value.strip())]
+    return bool(sample) and len(dates) >= len(sample) * 0.8
+
+def google_equivalent_columns(values1, values2, date_column=None):
+    """Compares two equal length columns of values pair by pair, and returns
+    a list of booleans. Each is exactly what google_equivalent returns for
+    the pair (and errors are raised the same way), but whole columns are
+    compared much faster.
+
+    Identical values are matched without normalizing them, and each distinct
+    value is split into lines, and each line checked and parsed as a date,
+    at most once. Dates go through the shared date_cache. A str and a
+    unicode value are distinct even when equal, since they split into lines
+    differently.
+
+    Columns of dates are recognized from a sample of values2, unless
+    date_column says whether they are. Their values are compared as dates
+    without splitting them into lines.
+    """
+    if date_column is None:
+        date_column = _is_date_column(values2)
+    lines_memo = {}
+    equivalent_memo = {}
+
+    def lines(text):
+        key = (type(text), text)
+        result = lines_memo.get(key)
+        if result is None:
+            if _LINE_SPECIALS.search(text) is None:
+                result = (text.strip(),) if text else ()
+            else:
+                result = tuple([l.replace('\t',' ').strip()
+                                for l in text.splitlines()])
+            lines_memo[key] = result
+        return result
+
+    def equivalent_dates(line1, line2):
+        key = (type(line1), line1, type(line2), line2)
+        result = equivalent_memo.get(key)
+        if result is None:
+            result = equivalent_memo[key] = _equivalent_dates(line1, line2)
+        return result
+
+    results = []
+    append = results.append
+    for text1, text2 in itertools.izip(values1, values2):
+        if text1 == text2:
+            append(True)
+            continue
+        if (date_column and text1 and text2 and
+                _LINE_SPECIALS.search(text1) is None and
+                _LINE_SPECIALS.search(text2) is None):
+            # Both are single lines.
+            line1, line2 = text1.strip(), text2.strip()
+            append(line1 == line2 or equivalent_dates(line1, line2))
+            continue
+        lines1 = lines(text1)
+        lines2 = lines(text2)
+        if lines1 == lines2:
+            append(True)
+        elif len(lines1) != 1 or len(lines2) != 1:
+            append(False)
+        else:
+            append(equivalent_dates(lines1[0], lines2[0]))
+    return results
+
+def bulk_row_differences(raw_rows, sheet_rows):
+    """Returns a list of differences for each pair of rows from the two
+    lists: the fields of the raw row, in its order, whose values are not
+    google_equivalent to the values in the sheet row.
+
+    Identical values are skipped, and the rest are compared a column at a
+    time with google_equivalent_columns, which keeps syncs with few changes
+    cheap.
+    """
+    differences = [[] for raw_row in raw_rows]
+    columns = collections.defaultdict(lambda: ([], [], []))
+    for ix, (raw_row, sheet_row) in enumerate(itertools.izip(raw_rows,
+                                                              sheet_rows)):
+        for header, raw_value in raw_row.iteritems():
+            sheet_value = sheet_row.get(header, u"")
+            if raw_value != sheet_value:
+                row_ixs, raw_values, sheet_values = columns[header]
+                row_ixs.append(ix)
+                raw_values.append(raw_value)
+                sheet_values.append(sheet_value)
+
+    different = collections.defaultdict(set)
+    for header, (row_ixs, raw_values, sheet_values) in columns.iteritems():
+        for ix, equivalent in itertools.izip(row_ixs,
+                    google_equivalent_columns(raw_values, sheet_values)):
+            if not equivalent:
+                different[ix].add(header)
+    for ix, headers in different.iteritems():
+        differences[ix] = [header for header in raw_rows[ix]
+                                                if header in headers]
+    return differences
+
+def _consecutive_runs(numbers):
+    # Groups numbers into [first, last] runs of consecutive values.
+    runs = []
+    for number in sorted(numbers):
+        if runs and runs[-1][1] == number - 1:
+            runs[-1][1] = number
+        else:
+            runs.append([number, number])
+    return runs
+
+def _a1_address(row, col):
+    # The A1 notation for a cell, e.g. _a1_address(2, 28) is 'AB2'.
+    label = ''
+    while col:
+        col, rem = divmod(col - 1, 26)
+        label = chr(65 + rem) + label
+    return '%s%s' % (label, row)
+
+def _coalesce_ranges(cells, min_cells=MIN_RANGE_CELLS):
+    # Splits CellUpdates into rectangular blocks of adjacent cells and the
+    # scattered cells left over. Blocks are (first_row, first_col, values),
+    # where values is a list of rows of values. When a cell is updated twice
+    # the later value is kept.
+    latest = collections.OrderedDict()
+    for cell in cells:
+        latest[(cell.row, cell.col)] = cell
+    row_cols = collections.defaultdict(list)
+    for row, col in latest:
+        row_cols[row].append(col)
+
+    # Runs of columns are joined with the same run on the row above.
+    blocks = []         # [first_row, last_row, first_col, last_col]
+    above = {}
+    for row in sorted(row_cols):
+        current = {}
+        for first_col, last_col in _consecutive_runs(row_cols[row]):
+            block = above.get((first_col, last_col))
+            if block is None or block[1] != row - 1:
+                block = [row, row, first_col, last_col]
+                blocks.append(block)
+            block[1] = row
+            current[(first_col, last_col)] = block
+        above = current
+
+    ranges, scattered = [], []
+    for first_row, last_row, first_col, last_col in blocks:
+        block_cells = [[latest[(row, col)] for col in xrange(first_col, last_col + 1)]
+                       for row in xrange(first_row, last_row + 1)]
+        if len(block_cells) * len(block_cells[0]) >= min_cells:
+            ranges.append((first_row, first_col,
+                           [[cell.value for cell in row] for row in block_cells]))
+        else:
+            scattered.extend(cell for row in block_cells for cell in row)
+    return ranges, scattered
+
+def _ns_batch(name):
+    return '{http://schemas.google.com/gdata/batch}%s' % name
+
+def _http_status(error):
+    # Reads the HTTP status code from a google API client error, or from a
+    # gspread error ("413: Too large").
+    resp = getattr(error, 'resp', None)
+    if resp is not None and getattr(resp, 'status', None):
+        return int(resp.status)
+    status = str(error).split(':', 1)[0].strip()
+    if status.isdigit():
+        return int(status)
+    return None
+
+def _api_not_enabled(error):
+    # True if error is google's 403 for an API that isn't enabled in the
+    # credentials' project, rather than a real permission error.
+    content = getattr(error, 'content', None) or str(error)
+    return (_http_status(error) == 403 and
+            ('accessNotConfigured' in content or 'SERVICE_DISABLED' in content))
+
+def _connection_refused(error):
+    # True if error shows that a request never reached google, because the
+    # host couldn't be resolved or the connection was refused.
+    return (isinstance(error, socket.gaierror) or
+            (isinstance(error, socket.error) and
+             getattr(error, 'errno', None) == errno.ECONNREFUSED))
+
+def _retry_after(error):
+    # Seconds asked for by a Retry-After header, if the error carries one.
+    resp = getattr(error, 'resp', None)
+    value = resp.get('retry-after') if hasattr(resp, 'get') else None
+    if value and str(value).strip().isdigit():
+        return int(value)
+    return None
+
+def _estimate_entry_bytes(cell, entry_bytes=BATCH_ENTRY_BYTES):
+    # Estimates the size of a cell's entry in a batch update feed, allowing
+    # for characters that are escaped in XML attributes. Pass
+    # RANGE_ENTRY_BYTES for the size of the value in a range write.
+    value = unicode(cell.value)
+    escapes = (value.count('&') + value.count('<') + value.count('>') +
+               value.count('"') + value.count('\n'))
+    return entry_bytes + len(value.encode('utf-8')) + 5 * escapes
+
+class BatchUpdateError(Exception):
+    """ Raised when cells in a batch update are still rejected by google
+    after retrying them. """
+    pass
+
 class MissingSheet(Exception):
     pass
 
@@ -167,6 +599,9 @@ class BadDataFormat(Exception):
 class DuplicateRows(Exception):
     pass
 
+REQUEST_COUNTERS = ('requests', 'bytes_sent', 'bytes_received',
+                    'cells_read', 'cells_written', 'batches')
+
 class UpdateResults(object):
     """ A lightweight counter object that holds statistics about number of
     updates made after using the 'sync' or 'inject' method. 
@@ -177,34 +612,332 @@ class UpdateResults(object):
       nochange (int): Number of rows that were not modified.
       deleted (int): Number of rows deleted (which will always be 0 when using
           the 'inject' function)
+      timings (dict): Seconds spent in each phase of the update: 'headers',
+          'read', 'diff', 'resize', 'insert' and 'flush'. 'write' is the
+          total time spent sending batches of cell updates, which overlaps
+          the other phases.
+      requests (int): Number of HTTP requests made to google.
+      bytes_sent (int): Size of the request bodies sent.
+      bytes_received (int): Size of the response bodies read.
+      cells_read (int): Number of cells read from the worksheet.
+      cells_written (int): Number of cells sent in batch updates.
+      batches (int): Number of batch update requests.
+      compacted (int): Number of blank rows removed from the worksheet by
+          an automatic compaction. See Sheet.compact.
     """
     def __init__(self):
         self.added = 0
         self.changed = 0
         self.deleted = 0
         self.nochange = 0
+        self.compacted = 0
+        self.timings = {}
+        for counter in REQUEST_COUNTERS:
+            setattr(self, counter, 0)
+        self._lap_start = time.time()
+
+    def lap(self, phase):
+        # Adds the time since the previous lap to the named phase.
+        now = time.time()
+        self.timings[phase] = self.timings.get(phase, 0.0) + (now - self._lap_start)
+        self._lap_start = now
+
+    def metrics(self):
+        """ Returns a flat dictionary of metric names to numbers, ready to be
+        sent to statsd, prometheus or similar. """
+        metrics = {'added': self.added,
+                   'changed': self.changed,
+                   'deleted': self.deleted,
+                   'nochange': self.nochange,
+                   'compacted': self.compacted}
+        for counter in REQUEST_COUNTERS:
+            metrics[counter] = getattr(self, counter)
+        for name, seconds in self.timings.iteritems():
+            metrics['%s_seconds' % name] = seconds
+        return metrics
 
     def __str__(self):
         r = 'Added: %s Changed: %s Deleted: %s No Change: %s' % (
                     self.added, self.changed, self.deleted, self.nochange)
         return r
 
-class Row(dict):
-    def __init__(self, row_num):
-        self.row_num = row_num
-        self.db = {}
-        dict.__init__(self)
+class RequestHook(object):
+    """ Base class for hooks that are called around every request sheetsync
+    makes to google. Subclass it and pass instances to Sheet's request_hooks
+    to add profiling, tracing or metrics without patching sheetsync.
 
-    def __setitem__(self, key, cell):
-        dict.__setitem__(self, key, cell)
-        self.db[key] = cell.value
+    Hooks are called on the thread making the request, which can be a
+    background writer thread, so they must be thread safe.
+    """
+    def before_request(self, operation, params):
+        """ Called before a request is made.
 
-    def cell_list(self):
-        for cell in self.itervalues():
-            yield cell
+        Args:
+          operation (str): The name of the API call, e.g. 'cells.batch'.
+          params (dict): The parameters of the call.
+        """
+        pass
+
+    def after_request(self, operation, params, seconds, bytes_sent,
+                      bytes_received, error):
+        """ Called after a request has finished, or failed.
+
+        Args:
+          operation (str): The name of the API call.
+          params (dict): The parameters of the call.
+          seconds (float): Time taken by the request. Streamed responses
+            are timed until they have been read.
+          bytes_sent (int): Size of the request body.
+          bytes_received (int): Size of the response body.
+          error (Exception): The error raised by the request, or None.
+        """
+        pass
+
+class _CountedResponse(object):
+    # Wraps an HTTP response to count the bytes read from it. on_error is
+    # called if the connection fails while the response is being read.
+    def __init__(self, response, count, on_error=None):
+        self._response = response
+        self._count = count
+        self._on_error = on_error
+
+    def read(self, *args):
+        try:
+            content = self._response.read(*args)
+        except (socket.error, httplib.HTTPException):
+            if self._on_error is not None:
+                self._on_error()
+            raise
+        self._count(bytes_received=len(content))
+        return content
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+class _RecordedConnection(object):
+    # Wraps an httplib connection to keep the last response it returned.
+    def __init__(self, connection):
+        self._connection = connection
+        self.last_response = None
+
+    def request(self, *args, **kwargs):
+        self.last_response = None
+        return self._connection.request(*args, **kwargs)
+
+    def getresponse(self, *args, **kwargs):
+        self.last_response = self._connection.getresponse(*args, **kwargs)
+        return self.last_response
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+class _CountedSession(object):
+    # Wraps a gspread HTTPSession to count the requests made through it.
+    # Its get, post, put and delete are gspread's own, bound to this wrapper
+    # so that they go through request.
+    _VERBS = ('get', 'post', 'put', 'delete')
+
+    def __init__(self, session, count):
+        self._session = session
+        self._count = count
+
+    def request(self, method, url, data=None, headers=None):
+        self._count(requests=1,
+                    bytes_sent=len(data) if isinstance(data, basestring) else 0)
+        connection = self._connection(url)
+        try:
+            # gspread adds a Content-Type to the headers it's given, which
+            # may be the default argument of its post, so it gets a copy.
+            response = self._session.request(method, url, data=data,
+                                             headers=dict(headers or {}))
+        except (socket.error, httplib.HTTPException):
+            self._drop_connection(url)
+            raise
+        except gspread.exceptions.HTTPError, e:
+            # gspread drops the response headers, but the RetryPolicy wants
+            # Retry-After, so they are attached the way the google API
+            # client attaches them.
+            if getattr(connection, 'last_response', None) is not None:
+                e.resp = dict((name.lower(), value) for name, value in
+                              connection.last_response.getheaders())
+            raise
+        return _CountedResponse(response, self._count,
+                                lambda: self._drop_connection(url))
+
+    def _connection(self, url):
+        # Opens the connection gspread will use for url, if it has none yet,
+        # wrapped so that its last response can be read after an error.
+        connections = getattr(self._session, 'connections', None)
+        if connections is None:
+            return None
+        uri = urlparse.urlparse(url)
+        key = uri.scheme + uri.netloc
+        if not connections.get(key):
+            if uri.scheme == 'https':
+                connection = httplib.HTTPSConnection(uri.netloc)
+            else:
+                connection = httplib.HTTPConnection(uri.netloc)
+            connections[key] = _RecordedConnection(connection)
+        return connections[key]
+
+    def _drop_connection(self, url):
+        # gspread keeps one connection per host and never replaces it, so
+        # after a transport error every later request would fail with
+        # CannotSendRequest. Closing and forgetting it makes the next request
+        # (or retry) open a new one.
+        connections = getattr(self._session, 'connections', None)
+        if connections is None:
+            return
+        uri = urlparse.urlparse(url)
+        connection = connections.pop(uri.scheme + uri.netloc, None)
+        if connection is not None:
+            connection.close()
+
+    def __getattr__(self, name):
+        if name in self._VERBS:
+            verb = getattr(type(self._session), name)
+            return types.MethodType(verb.im_func, self, type(self))
+        return getattr(self._session, name)
+
+# The Sheets (or Spreadsheets) making requests on each thread, innermost
+# last. Clients shared through the ClientRegistry count their traffic against
+# the one on top.
+_active_sheets = threading.local()
+
+def _count_active(**amounts):
+    sheets = getattr(_active_sheets, 'stack', None)
+    if sheets:
+        sheets[-1]._count(**amounts)
+
+class Table(object):
+    """ Column-oriented storage for rows of worksheet values.
+
+    Each column's values are kept in one list, and row numbers in a typed
+    array, rather than holding a dictionary (and gspread Cell objects) for
+    every row. Rows are read and written through RowView objects.
+    """
+    def __init__(self, headers):
+        self.headers = [intern(h) if isinstance(h, str) else h
+                                                for h in headers]
+        self.row_nums = array.array('l')
+        self.columns = dict((header, []) for header in self.headers)
+
+    def __len__(self):
+        return len(self.row_nums)
+
+    def append(self, row_num, row_values):
+        self.row_nums.append(row_num)
+        for header in self.headers:
+            self.columns[header].append(row_values.get(header, u""))
+        return RowView(self, len(self.row_nums) - 1)
+
+    def add_column(self, header):
+        self.headers.append(header)
+        self.columns[header] = [u""] * len(self.row_nums)
+
+    def rows(self):
+        for ix in xrange(len(self.row_nums)):
+            yield RowView(self, ix)
+
+class RowView(collections.MutableMapping):
+    """ A dictionary-like view of one row of a Table, mapping headers to
+    cell values. """
+    __slots__ = ('table', 'ix')
+
+    def __init__(self, table, ix):
+        self.table = table
+        self.ix = ix
+
+    @property
+    def row_num(self):
+        return self.table.row_nums[self.ix]
+
+    def __getitem__(self, header):
+        return self.table.columns[header][self.ix]
+
+    def __setitem__(self, header, value):
+        if header not in self.table.columns:
+            self.table.add_column(header)
+        self.table.columns[header][self.ix] = value
+
+    def __delitem__(self, header):
+        raise TypeError("Can't remove the '%s' column from one row" % header)
+
+    def __iter__(self):
+        return iter(self.table.headers)
+
+    def __len__(self):
+        return len(self.table.headers)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def copy(self):
+        return dict(self)
 
     def is_empty(self):
-        return all((val is None or val == '') for val in self.db.itervalues())
+        return all((val is None or val == '') for val in self.itervalues())
+
+class KeyIndex(object):
+    """ Maps the key tuples of a worksheet's rows to their row numbers.
+
+    The index is rebuilt whenever the whole worksheet is read and is kept up
+    to date as rows are inserted, flagged and deleted. It is only trusted
+    while the worksheet's updated timestamp matches the one recorded after
+    the last write.
+
+    Attributes:
+      key_column_headers (list of str): The key headers the index was built
+        with.
+      updated (str): The worksheet's updated timestamp when the index was
+        last known to be correct, or None.
+    """
+    def __init__(self):
+        self.clear()
+
+    def clear(self, key_column_headers=None):
+        self.key_column_headers = list(key_column_headers or [])
+        self.updated = None
+        self._key_to_row = {}
+        self._row_to_key = {}
+
+    def __len__(self):
+        return len(self._key_to_row)
+
+    def __contains__(self, key_tuple):
+        return key_tuple in self._key_to_row
+
+    def row_for(self, key_tuple):
+        return self._key_to_row.get(key_tuple)
+
+    def key_for(self, row_num):
+        return self._row_to_key.get(row_num)
+
+    def add(self, key_tuple, row_num):
+        self.remove_row(row_num)
+        self._key_to_row[key_tuple] = row_num
+        self._row_to_key[row_num] = key_tuple
+
+    def remove_row(self, row_num):
+        key_tuple = self._row_to_key.pop(row_num, None)
+        if key_tuple is not None and self._key_to_row.get(key_tuple) == row_num:
+            del self._key_to_row[key_tuple]
+
+    def delete_rows(self, row_nums):
+        """ Updates the index after the given rows were deleted from the
+        worksheet, moving the rows below them up. """
+        deleted = sorted(row_nums)
+        for row_num in deleted:
+            self.remove_row(row_num)
+        moved = lambda row_num: row_num - bisect.bisect_left(deleted, row_num)
+        self._row_to_key = dict((moved(row_num), key_tuple) for row_num, key_tuple
+                                                in self._row_to_key.iteritems())
+        self._key_to_row = dict((key_tuple, moved(row_num)) for key_tuple, row_num
+                                                in self._key_to_row.iteritems())
+
+    def is_current(self, key_column_headers, updated):
+        return (self.updated is not None and self.updated == updated and
+                self.key_column_headers == list(key_column_headers))
 
 class Header(object):
     def __init__(self):
@@ -255,8 +988,770 @@ class Header(object):
         return (header in self.header_to_col)
 
 
+class CellUpdate(object):
+    """ A write of value to the cell at row and col of a worksheet. Sheet
+    batches these rather than gspread Cells, so that cells can be written
+    by their address without being read first.
+    """
+    __slots__ = ('row', 'col', 'value')
+
+    def __init__(self, row, col, value):
+        self.row = row
+        self.col = col
+        self.value = value
+
+    @property
+    def cell_id(self):
+        return "R%sC%s" % (self.row, self.col)
+
+    def __repr__(self):
+        return 'CellUpdate(%r, %r, %r)' % (self.row, self.col, self.value)
+
+class BatchStats(object):
+    """ Statistics about one batch of cell updates sent to google.
+
+    Attributes:
+      cells (int): Number of cells in the batch.
+      bytes (int): Size of the request body.
+      seconds (float): Time taken to send the batch.
+      error (Exception): The error raised by the batch, or None.
+    """
+    def __init__(self, cells, bytes, seconds, error=None):
+        self.cells = cells
+        self.bytes = bytes
+        self.seconds = seconds
+        self.error = error
+
+    def __str__(self):
+        return 'Cells: %s Bytes: %s Seconds: %.3f%s' % (self.cells,
+                    self.bytes, self.seconds, ' (failed)' if self.error else '')
+
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+def _shared_worker_pool():
+    # The threads that read pages of cells and send batches for every Sheet.
+    # They live as long as the process, so the clients they get from the
+    # client registry, and their connections, are reused from call to call.
+    # Work run on them must never wait for other work on them.
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            _worker_pool = ThreadPool(WORKER_POOL_SIZE)
+        return _worker_pool
+
+def _bounded_imap(pool, func, items, limit):
+    # Like pool.imap, returning the results in order, but with at most limit
+    # calls queued or running at once, so that a shared pool is used no more
+    # than a pool of limit threads would be.
+    items = iter(items)
+    pending = collections.deque(pool.apply_async(func, (item,))
+                                for item in itertools.islice(items, limit))
+    while pending:
+        result = pending.popleft().get()
+        for item in itertools.islice(items, 1):
+            pending.append(pool.apply_async(func, (item,)))
+        yield result
+
+class BatchWriter(object):
+    """ Sends batches of cell updates on background threads, so sheetsync
+    can keep diffing rows while earlier batches are being written.
+
+    Batches are sent on the shared worker pool, at most concurrency at a
+    time. At most max_pending batches wait to be sent; beyond that submit
+    blocks until one has been. join waits for every batch to be sent, and if
+    any failed raises the error from the earliest batch.
+
+    The writer also picks the number of cells per batch (batch_size). It
+    grows while batches are answered within TARGET_BATCH_SECONDS, and
+    shrinks after slow or failed batches. Batches rejected as too large are
+    split in half and sent again. Statistics for the most recent batches
+    are kept in stats.
+
+    Args:
+        send_batch (func): Called on a worker thread with a list of cells,
+            returns the number of bytes sent.
+        concurrency (int): The number of batches sent at once. If this is 1
+            the batches are sent straight away on the calling thread.
+        max_pending (Optional) (int): The most unsent batches.
+    """
+    def __init__(self, send_batch, concurrency=1, max_pending=None):
+        self.send_batch = send_batch
+        self.concurrency = concurrency
+        self.batch_size = MAX_BATCH_LEN
+        self.stats = collections.deque(maxlen=1000)
+        self.max_pending = max_pending or concurrency * 2
+        self._pending = collections.deque()
+        self._running = 0
+        self._state = threading.Condition()
+        self._errors = []
+        self._batch_count = 0
+        self._lock = threading.Lock()
+
+    def _send(self, cells):
+        start = time.time()
+        try:
+            bytes = self.send_batch(cells)
+        except Exception, e:
+            self.stats.append(BatchStats(len(cells), 0, time.time() - start, e))
+            with self._lock:
+                self.batch_size = max(1, min(self.batch_size, len(cells)) / 2)
+            if _http_status(e) == 413 and len(cells) > 1:
+                logger.info("Batch of %s cells was too large. Splitting it.",
+                                                                  len(cells))
+                half = len(cells) / 2
+                self._send(cells[:half])
+                self._send(cells[half:])
+                return
+            raise e
+
+        seconds = time.time() - start
+        self.stats.append(BatchStats(len(cells), bytes, seconds))
+        with self._lock:
+            if seconds > TARGET_BATCH_SECONDS:
+                self.batch_size = max(1, int(self.batch_size *
+                                             TARGET_BATCH_SECONDS / seconds))
+            elif len(cells) >= self.batch_size:
+                self.batch_size = min(MAX_BATCH_ENTRIES,
+                                      int(self.batch_size * 1.25))
+
+    def _work(self, batch_ix, cells):
+        # Sends one batch on a pool thread, then starts the next one waiting.
+        try:
+            if not self._errors:
+                self._send(cells)
+        except Exception, e:
+            self._errors.append((batch_ix, e))
+        finally:
+            with self._state:
+                self._running -= 1
+                self._start_pending()
+                self._state.notify_all()
+
+    def _start_pending(self):
+        # Called holding self._state.
+        while self._pending and self._running < self.concurrency:
+            self._running += 1
+            _shared_worker_pool().apply_async(self._work,
+                                              self._pending.popleft())
+
+    def submit(self, cells):
+        if self.concurrency == 1:
+            self._send(cells)
+            return
+
+        if self._errors:
+            # Stop queueing writes once one has failed.
+            self.join()
+        with self._state:
+            while len(self._pending) >= self.max_pending:
+                self._state.wait()
+            self._pending.append((self._batch_count, cells))
+            self._batch_count += 1
+            self._start_pending()
+
+    def join(self):
+        with self._state:
+            while self._pending or self._running:
+                self._state.wait()
+
+        errors, self._errors = sorted(self._errors), []
+        if errors:
+            for batch_ix, e in errors[1:]:
+                logger.error("Batch %s also failed: %s", batch_ix, e)
+            raise errors[0][1]
+
+
+class RetryPolicy(object):
+    """ Decides which failed requests to google are retried, and how long to
+    wait before each retry.
+
+    Rate limit (429) and server (5xx) errors, and dropped connections, are
+    retried with exponential backoff and full jitter. A Retry-After header
+    on the error is honored instead of the backoff. Requests that create
+    documents, folders or worksheets aren't idempotent, so they are only
+    retried when google can't have acted on them: after a rate limit error,
+    or when the connection couldn't be opened.
+
+    Args:
+        max_attempts (int): Attempts made before giving up, including the
+            first. Use 1 to turn retries off.
+        base_delay (float): Longest wait in seconds before the first retry.
+            The limit doubles with each retry.
+        max_delay (float): Longest wait between attempts.
+        retry_statuses (tuple of int): HTTP status codes that are retried.
+    """
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=60.0,
+                 retry_statuses=(429, 500, 502, 503, 504)):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = retry_statuses
+
+    def should_retry(self, error, attempt, idempotent=True):
+        """ True if the request that raised error on the given attempt
+        (counting from 1) should be made again. idempotent is False for
+        requests that create something. """
+        if attempt >= self.max_attempts:
+            return False
+        if not idempotent:
+            return _http_status(error) == 429 or _connection_refused(error)
+        if isinstance(error, (socket.error, httplib.HTTPException)):
+            return True
+        return _http_status(error) in self.retry_statuses
+
+    def delay(self, error, attempt):
+        """ Seconds to wait before retrying after the given attempt. """
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return retry_after
+        limit = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, limit)
+
+class TokenBucket(object):
+    """ A client-side rate limiter. Requests take a token each, and tokens
+    are added at rate per second up to capacity, so short bursts are
+    allowed but the average rate is capped.
+
+    All Sheet objects share the module's rate_limiter, which doesn't limit
+    anything until a rate is set. For example:
+
+    >>> sheetsync.rate_limiter.configure(rate=10)
+
+    Args:
+        rate (float): Tokens added per second, or None for no limit.
+        capacity (float): Most tokens that can be saved up. Defaults to rate.
+    """
+    def __init__(self, rate=None, capacity=None):
+        self._lock = threading.Lock()
+        self.configure(rate, capacity)
+
+    def configure(self, rate=None, capacity=None):
+        with self._lock:
+            self.rate = rate
+            self.capacity = capacity or rate or 1
+            self._tokens = self.capacity
+            self._last = time.time()
+
+    def acquire(self):
+        """ Takes a token, waiting for one to be added if necessary. """
+        while True:
+            with self._lock:
+                if not self.rate:
+                    return
+                now = time.time()
+                self._tokens = min(self.capacity,
+                                   self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+rate_limiter = TokenBucket()
+
+class DiscoveryCache(object):
+    """ An on-disk cache of google API discovery documents.
+
+    Building the Drive service needs the API's discovery document, which
+    would otherwise be downloaded by every new process. A saved document is
+    used until it is ttl seconds old. Nothing is saved to disk unless a
+    ClientRegistry is given a DiscoveryCache.
+
+    Args:
+        directory (str): The folder documents are saved in. It is created if
+            necessary.
+        ttl (Optional) (int): Seconds a saved document is used for. Defaults
+            to a day.
+    """
+    def __init__(self, directory, ttl=DISCOVERY_CACHE_SECONDS):
+        self.directory = directory
+        self.ttl = ttl
+
+    def _path(self, api, version):
+        return os.path.join(self.directory, "%s.%s.json" % (api, version))
+
+    def load(self, api, version):
+        path = self._path(api, version)
+        try:
+            if time.time() - os.path.getmtime(path) >= self.ttl:
+                return None
+            with open(path, 'rb') as inf:
+                content = inf.read()
+            json.loads(content)
+            return content
+        except (OSError, IOError, ValueError), e:
+            return None
+
+    def save(self, api, version, content):
+        # Other processes may be saving the same document, so each writes
+        # its own temporary file. Failing to save isn't an error.
+        path = self._path(api, version)
+        tmp_path = "%s.%s.tmp" % (path, os.getpid())
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            with open(tmp_path, 'wb') as ouf:
+                ouf.write(content)
+            if os.path.exists(path):
+                os.remove(path)
+            os.rename(tmp_path, path)
+        except (OSError, IOError), e:
+            logger.warning("Couldn't cache discovery document: %s", e)
+
+class ClientRegistry(object):
+    """ Shares google clients between all the Sheet objects in a process
+    that use the same credentials, so opening another worksheet doesn't log
+    in or download the Drive discovery document again.
+
+    gspread clients and httplib2 connections can't be used by two threads at
+    once, so each thread is handed its own, and keeps its connections open
+    between requests. The discovery document is fetched once per process.
+    Expired access tokens are refreshed once, and the new token is given to
+    every thread's client.
+
+    Sheets use the module's shared_clients registry unless they're given
+    another. It keeps discovery documents in memory only. To save them
+    between processes, give it a DiscoveryCache::
+
+        sheetsync.shared_clients.discovery_cache = sheetsync.DiscoveryCache(
+            os.path.expanduser('~/.cache/sheetsync'))
+
+    Args:
+        discovery_cache (Optional) (DiscoveryCache): Where discovery
+            documents are saved between processes. By default they aren't.
+    """
+    def __init__(self, discovery_cache=None):
+        self.discovery_cache = discovery_cache
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._credentials = {}
+        self._discovery = {}
+        self._discovery_locks = {}
+
+    def _key(self, credentials):
+        # Credentials for the same account and client share connections,
+        # even when they were loaded into separate objects.
+        return (getattr(credentials, 'client_id', None),
+                getattr(credentials, 'refresh_token', None) or
+                getattr(credentials, 'access_token', None) or id(credentials))
+
+    def _thread_clients(self, credentials):
+        # Returns the shared credentials object for the account, and this
+        # thread's dictionary of clients for it.
+        key = self._key(credentials)
+        with self._lock:
+            credentials = self._credentials.setdefault(key, credentials)
+        clients = getattr(self._local, 'clients', None)
+        if clients is None:
+            clients = self._local.clients = {}
+        return credentials, clients.setdefault(key, {})
+
+    def _access_token(self, credentials):
+        with self._lock:
+            if (not credentials.access_token or
+                    getattr(credentials, 'access_token_expired', False)):
+                logger.info('Refreshing expired credentials')
+                credentials.refresh(httplib2.Http())
+            return credentials.access_token
+
+    def gspread_client(self, credentials):
+        """ Returns this thread's logged in gspread client. """
+        credentials, clients = self._thread_clients(credentials)
+        client = clients.get('gspread')
+        if client is None:
+            logger.info('Creating gspread client')
+            session = _CountedSession(gspread.client.HTTPSession(),
+                                      _count_active)
+            client = clients['gspread'] = gspread.Client(auth=credentials,
+                                                         http_session=session)
+        authorization = "Bearer " + self._access_token(credentials)
+        if client.session.headers.get('Authorization') != authorization:
+            client.session.add_header('Authorization', authorization)
+        return client
+
+    def drive_service(self, credentials):
+        """ Returns this thread's Drive v2 service. """
+        return self._service(credentials, 'drive', 'v2')
+
+    def sheets_service(self, credentials):
+        """ Returns this thread's Sheets v4 service, used to write ranges
+        of cells. """
+        return self._service(credentials, 'sheets', 'v4')
+
+    def _service(self, credentials, api, version):
+        credentials, clients = self._thread_clients(credentials)
+        service = clients.get(api)
+        if service is None:
+            self._access_token(credentials)
+            logger.info('Creating %s service', api)
+            http = credentials.authorize(httplib2.Http())
+            request = http.request
+            def counted_request(uri, method='GET', body=None, *args, **kwargs):
+                _count_active(requests=1, bytes_sent=len(body or ''))
+                response, content = request(uri, method, body, *args, **kwargs)
+                _count_active(bytes_received=len(content or ''))
+                return response, content
+            http.request = counted_request
+            service = clients[api] = apiclient.discovery.build_from_document(
+                            self._discovery_document(api, version), http=http)
+        return service
+
+    def _discovery_document(self, api, version):
+        # Each document has its own lock, so threads wanting it wait for one
+        # download while the registry lock stays free for everything else.
+        with self._lock:
+            content = self._discovery.get((api, version))
+            if content is not None:
+                return content
+            lock = self._discovery_locks.setdefault((api, version),
+                                                    threading.Lock())
+        with lock:
+            with self._lock:
+                content = self._discovery.get((api, version))
+            if content is not None:
+                return content
+            if self.discovery_cache:
+                content = self.discovery_cache.load(api, version)
+            if content is None:
+                uri = apiclient.discovery.DISCOVERY_URI.format(api=api,
+                                                               apiVersion=version)
+                logger.info('Downloading discovery document %s', uri)
+                response, content = httplib2.Http().request(uri)
+                if response.status >= 400:
+                    raise apiclient.errors.HttpError(response, content, uri=uri)
+                if self.discovery_cache:
+                    self.discovery_cache.save(api, version, content)
+            with self._lock:
+                self._discovery[(api, version)] = content
+            return content
+
+    def clear(self):
+        """ Forgets the clients and discovery documents, so the next
+        request creates them afresh. Clients on other threads are kept until
+        those threads ask for them again. """
+        with self._lock:
+            self._credentials = {}
+            self._discovery = {}
+            self._local = threading.local()
+
+shared_clients = ClientRegistry()
+
+class SnapshotStore(object):
+    """ An on-disk cache of the last synced state of worksheets.
+
+    Pass a SnapshotStore to a Sheet and the sync and inject methods will
+    diff the input data against the saved snapshot instead of downloading the
+    whole worksheet. A snapshot is only used if the worksheet's updated
+    timestamp still matches the one recorded after the last sync, otherwise
+    sheetsync falls back to a full read. Only the rows that need writing are
+    read from the worksheet.
+
+    Note, an edit made in the moment between sheetsync's last write and it
+    reading the updated timestamp will not be detected.
+
+    Args:
+        directory (str): The folder snapshot files are saved in. It is
+            created if necessary.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, document_key, worksheet_name):
+        name = "%s/%s" % (document_key, worksheet_name)
+        digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, "%s.json" % digest)
+
+    def load(self, document_key, worksheet_name):
+        try:
+            with open(self._path(document_key, worksheet_name), 'rb') as inf:
+                return json.load(inf)
+        except (IOError, ValueError), e:
+            return None
+
+    def save(self, document_key, worksheet_name, snapshot):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        path = self._path(document_key, worksheet_name)
+        with open(path + '.tmp', 'wb') as ouf:
+            json.dump(snapshot, ouf)
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(path + '.tmp', path)
+
+    def clear(self, document_key, worksheet_name):
+        path = self._path(document_key, worksheet_name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+
+class _ThreadClient(object):
+    # Stands in for the gspread client of gspread's Spreadsheet and Worksheet
+    # objects, so that whichever thread uses them makes requests with its own
+    # client.
+    def __init__(self, document):
+        self._document = document
+
+    def __getattr__(self, name):
+        return getattr(self._document.gspread_client, name)
+
+class _GoogleDocument(object):
+    # The connection to a google spreadsheet document, shared by Sheet and
+    # Spreadsheet. Finds or creates the document, and makes every request to
+    # google with the request hooks, retry policy and counters.
+    def _connect(self, credentials, request_hooks=None, retry_policy=None,
+                 client_registry=None):
+        self.credentials = credentials
+        self.request_hooks = list(request_hooks or [])
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.client_registry = client_registry or shared_clients
+        self._counts = collections.Counter()
+        self._counts_lock = threading.Lock()
+        self._thread_local = threading.local()
+        self._sheet = None              # Gspread sheet instance.
+
+    def _open_document(self, document_key=None, document_name=None,
+                       template_key=None, template_name=None,
+                       folder_key=None, folder_name=None):
+        # Find or create the Google spreadsheet document
+        document = self._find_document(document_key, document_name)
+        if document is None:
+            if document_name is None:
+                raise ValueError("Must specify a document_name")
+            # We need to create the document
+            template = self._find_document(template_key, template_name) 
+            if template is None and template_name is not None:
+                raise ValueError("Could not find template: %s" % template_name)
+            self.folder = self._find_or_create_folder(folder_key, folder_name)
+            document = self._create_new_or_copy(source_doc=template, 
+                                                target_name=document_name, 
+                                                folder=self.folder)
+            if not document:
+                raise Exception("Could not create doc '%s'." % document_name)
+  
+        # Create attribute for document key
+        self.document_key = document['id']
+        self.document_name = document['title']
+        self.document_href = document['alternateLink']
+
+    @property
+    def sheet(self):
+        # Finds and returns a gspread.Spreadsheet object
+        if self._sheet:
+            return self._sheet
+        sheet = self._execute('spreadsheets.open',
+                              lambda: self.gspread_client.open_by_key(self.document_key),
+                              key=self.document_key)
+        # Its worksheets make requests with the calling thread's client.
+        sheet.client = _ThreadClient(self)
+        self._sheet = sheet
+        return self._sheet
+
+    def _open_worksheet(self, worksheet_name):
+        # Finds (or creates) then returns a gspread.Worksheet object 
+        worksheets = self._execute('worksheets.list', self.sheet.worksheets)
+        for worksheet in worksheets:
+            if worksheet.title == worksheet_name:
+                return worksheet
+
+        logger.info("Not found. Creating worksheet '%s'", worksheet_name)
+        return self._execute('worksheets.add',
+                    lambda: self.sheet.add_worksheet(title=worksheet_name,
+                                                     rows=20, cols=10),
+                    idempotent=False, title=worksheet_name)
+
+    @property
+    def gspread_client(self):
+        # The calling thread's client, shared with other documents.
+        return self.client_registry.gspread_client(self.credentials)
+
+    def _count(self, **amounts):
+        # Adds to the request counters. Called from writer threads too, so
+        # each thread also keeps its own counts for _google_request.
+        with self._counts_lock:
+            self._counts.update(amounts)
+        thread_counts = getattr(self._thread_local, 'counts', None)
+        if thread_counts is None:
+            thread_counts = self._thread_local.counts = collections.Counter()
+        thread_counts.update(amounts)
+
+    @contextlib.contextmanager
+    def _google_request(self, operation, **params):
+        # Every attempt at a call to google runs inside this block. It waits
+        # for the shared rate limiter, then calls the request hooks.
+        rate_limiter.acquire()
+        for hook in self.request_hooks:
+            hook.before_request(operation, params)
+        self._count()
+        counts_before = self._thread_local.counts.copy()
+        sheets = getattr(_active_sheets, 'stack', None)
+        if sheets is None:
+            sheets = _active_sheets.stack = []
+        sheets.append(self)
+        start = time.time()
+        error = None
+        try:
+            yield
+        except Exception, e:
+            error = e
+            raise
+        finally:
+            sheets.remove(self)
+            seconds = time.time() - start
+            counts = self._thread_local.counts
+            for hook in self.request_hooks:
+                hook.after_request(operation, params, seconds,
+                    counts['bytes_sent'] - counts_before['bytes_sent'],
+                    counts['bytes_received'] - counts_before['bytes_received'],
+                    error)
+
+    def _execute(self, operation, request, idempotent=True, **params):
+        # Makes one call to google, retrying it as the retry policy allows.
+        # request takes no arguments, and params describe the call to the
+        # request hooks. Pass idempotent=False for calls that create
+        # something, so they aren't repeated if google may have acted on them.
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                with self._google_request(operation, **params):
+                    return request()
+            except Exception, e:
+                if not self._wait_to_retry(operation, e, attempt, idempotent):
+                    raise
+
+    def _wait_to_retry(self, operation, error, attempt, idempotent=True):
+        # Sleeps and returns True if a failed call should be retried, or
+        # logs the error and returns False.
+        if not self.retry_policy.should_retry(error, attempt, idempotent):
+            logger.exception("Google API error in %s. %s", operation, error)
+            return False
+        delay = self.retry_policy.delay(error, attempt)
+        logger.warning("Google API error in %s, retrying in %.1fs. %s",
+                       operation, delay, error)
+        time.sleep(delay)
+        return True
+
+    @property
+    def drive_service(self):
+        # The calling thread's Drive service, shared with other documents.
+        return self.client_registry.drive_service(self.credentials)
+
+    @property
+    def sheets_service(self):
+        # The calling thread's Sheets v4 service, shared with other documents.
+        return self.client_registry.sheets_service(self.credentials)
+
+
+    def _create_new_or_copy(self, 
+                            target_name=None,
+                            source_doc=None, 
+                            folder=None,
+                            sheet_description="new"):
+        if target_name is None:
+            raise KeyError("Must specify a name for the new document")
+
+        body = {'title': target_name }
+        if folder:
+            body['parents'] = [{'kind' : 'drive#parentReference',
+                                'id' : folder['id'],
+                                'isRoot' : False }]
+
+        drive_service = self.drive_service
+        if source_doc is not None:
+            logger.info("Copying spreadsheet.")
+            new_document = self._execute('files.copy',
+                    drive_service.files().copy(fileId=source_doc['id'], body=body).execute,
+                    idempotent=False, fileId=source_doc['id'], body=body)
+
+        else:
+            # Create new blank spreadsheet.
+            logger.info("Creating blank spreadsheet.")
+            body['mimeType'] = 'application/vnd.google-apps.spreadsheet'
+            new_document = self._execute('files.insert',
+                    drive_service.files().insert(body=body).execute,
+                    idempotent=False, body=body)
+
+        logger.info("Created %s spreadsheet with ID '%s'", 
+                sheet_description,
+                new_document.get('id'))
+
+        return new_document
+
+    def _find_or_create_folder(self, folder_key=None, folder_name=None):
+        drive_service = self.drive_service
+        # Search by folder key.. raise Exception if not found.
+        if folder_key is not None:
+            # XXX: WRONG... probably returns 404 if not found,.. which is not an error.
+            folder_rsrc = self._execute('files.get',
+                    drive_service.files().get(fileId=folder_key).execute,
+                    fileId=folder_key)
+
+            if not folder_rsrc:
+                raise KeyError("Folder with key %s was not found." % folder_key)
+            return folder_rsrc
+
+        if not folder_name:
+            return None
+
+        # Search by folder name.
+        query = ("title='%s' and trashed=false and "
+                 "mimeType='application/vnd.google-apps.folder'") % \
+                        folder_name.replace("'","\\'")
+        name_query = self._execute('files.list',
+                        drive_service.files().list(q=query).execute, q=query)
+        items = name_query['items']
+        if len(items) == 1:
+            return items[0]
+        elif len(items) > 1:
+            raise KeyError("%s folders found named: %s" % (len(items), folder_name))
+
+        logger.info("Creating a new folder named: '%s'", folder_name)
+        body = { 'mimeType' : 'application/vnd.google-apps.folder',
+                 'title' : folder_name }
+        new_folder_rsrc = self._execute('files.insert',
+                        drive_service.files().insert(body=body).execute,
+                        idempotent=False, body=body)
+
+        return new_folder_rsrc
+
+
+    def _find_document(self, doc_key=None, doc_name=None):
+        # Find the document by key and raise "KeyError" if not found.
+        # Otherwise search by document_name
+        drive_service = self.drive_service
+        if doc_key is not None:
+            logger.debug("Finding document by key.")
+            doc_rsrc = self._execute('files.get',
+                    drive_service.files().get(fileId=doc_key).execute,
+                    fileId=doc_key)
+
+            if doc_rsrc is None:
+                raise KeyError("Could not find document with key: %s" % doc_key)
+            return doc_rsrc
+
+        if doc_name is None:
+            return None
+
+        query = ("title='%s' and trashed=false and "
+                 "mimeType='application/vnd.google-apps.spreadsheet'") % \
+                        doc_name.replace("'","\\'")
+        name_query = self._execute('files.list',
+                        drive_service.files().list(q=query).execute, q=query)
+        matches = name_query['items']
+
+        if len(matches) == 1:
+            return matches[0]
+
+        if len(matches) > 1:
+            raise KeyError("Too many matches for doc named '%s'" % doc_name)
+        
+        return None
+
 
-class Sheet(object):
+class Sheet(_GoogleDocument):
     """ Represents a single worksheet within a google spreadsheet.
     
     This class tracks the google connection, the reference to the worksheet, as
@@ -273,6 +1768,9 @@ class Sheet(object):
            it as a parameter in subsequent calls to __init__
        document_name (str): The title of the google spreadsheet document
        document_href (str): The HTML href for the google spreadsheet document
+       key_index (KeyIndex): The row number of each key, kept up to date by
+           sync and inject so that later injects only read the rows they
+           change.
     """
     def __init__(self, 
                  credentials=None,
@@ -284,9 +1782,20 @@ class Sheet(object):
                  formula_ref_row_ix=None,
                  flag_deletes=True,
                  protected_fields=None,
+                 snapshot_store=None,
+                 read_page_rows=None,
+                 read_concurrency=1,
+                 write_concurrency=1,
+                 range_writes=False,
+                 compact_threshold=None,
+                 metrics_callback=None,
+                 request_hooks=None,
+                 retry_policy=None,
+                 client_registry=None,
                  # Document creation behavior
                  template_key=None, template_name=None,
-                 folder_key=None, folder_name=None):
+                 folder_key=None, folder_name=None,
+                 spreadsheet=None):
         """Creates a worksheet object (also creating a new Google sheet doc if required)
 
         Args:
@@ -341,6 +1850,38 @@ class Sheet(object):
                 and edit values in certain columns (e.g. modifying a "Test result" 
                 column from "PENDING" to "PASSED") and don't want to overwrite
                 their edits.
+            snapshot_store (Optional) (SnapshotStore): A local cache of the
+                worksheet's contents. Used by sync and inject to avoid reading
+                the whole worksheet when it hasn't changed since the last sync.
+            read_page_rows (Optional) (int): Read the worksheet in pages of
+                this many rows, rather than with one request. Cells are parsed
+                as they are downloaded either way.
+            read_concurrency (Optional) (int): The number of pages of rows
+                that are downloaded in parallel when reading the worksheet. If
+                read_page_rows isn't given the rows are split evenly between
+                the parallel requests.
+            write_concurrency (Optional) (int): The number of batches of cell
+                updates that can be sent in parallel, on background threads,
+                while sync and inject carry on comparing rows.
+            range_writes (Optional) (bool): Write blocks of adjacent cells,
+                like new rows, as ranges with the Sheets v4 API, which needs
+                far fewer bytes than updating each cell. The API must be
+                enabled for the credentials' project; if google says it
+                isn't, sheetsync goes back to writing cell by cell. Off by
+                default.
+            compact_threshold (Optional) (int): If given, sync and inject
+                call compact once sheetsync knows of at least this many blank
+                rows in the worksheet, such as rows left by hard deletes.
+            metrics_callback (Optional) (func): Called after every sync and
+                inject with the dictionary returned by UpdateResults.metrics,
+                to push timings and request counts to a metrics system.
+            request_hooks (Optional) (list of RequestHook): Hooks called
+                before and after every request made to google.
+            retry_policy (Optional) (RetryPolicy): Which failed requests are
+                retried and how long to wait between attempts. Defaults to
+                RetryPolicy(), which makes up to 5 attempts.
+            client_registry (Optional) (ClientRegistry): Where google clients
+                are shared from. Defaults to the module's shared_clients.
             template_key (Optional) (str): This optional key references the spreadsheet 
                 that will be copied if a new spreadsheet needs to be created. 
                 This is useful for copying over formatting, a specific header 
@@ -355,37 +1896,36 @@ class Sheet(object):
                 optional folder that a spreadsheet will be created in (if
                 required). If a folder matching the name cannot be found, sheetsync
                 will attempt to create it.
+            spreadsheet (Optional) (Spreadsheet): The document the worksheet is
+                in, already found by a Spreadsheet object. Its credentials and
+                connection settings are used, and the document options above
+                are ignored. Spreadsheet.worksheet passes this.
  
         """
 
-        # Record connection settings, and create a connection.
-        self.credentials = credentials
-        self._drive_service = None
-        self._gspread_client = None
-        self._sheet = None              # Gspread sheet instance.
-        self._worksheet = None          # Gspread worksheet instance.
-
-        # Find or create the Google spreadsheet document
-        document = self._find_document(document_key, document_name)
-        if document is None:
-            if document_name is None:
-                raise ValueError("Must specify a document_name")
-            # We need to create the document
-            template = self._find_document(template_key, template_name) 
-            if template is None and template_name is not None:
-                raise ValueError("Could not find template: %s" % template_name)
-            self.folder = self._find_or_create_folder(folder_key, folder_name)
-            document = self._create_new_or_copy(source_doc=template, 
-                                                target_name=document_name, 
-                                                folder=self.folder)
-            if not document:
-                raise Exception("Could not create doc '%s'." % document_name)
-  
-        # Create attribute for document key
-        self.document_key = document['id']
-        self.document_name = document['title']
-        self.document_href = document['alternateLink']
-
+        # Record connection settings, and create a connection.
+        self.metrics_callback = metrics_callback
+        self.compact_threshold = compact_threshold
+        self.blank_rows = set()         # Blank rows found above max_row.
+        self._v4_sheet_id = None
+        self.spreadsheet = spreadsheet
+        self._worksheet = None          # Gspread worksheet instance.
+        if spreadsheet is not None:
+            # The document has already been found.
+            self._connect(spreadsheet.credentials,
+                          request_hooks or spreadsheet.request_hooks,
+                          retry_policy or spreadsheet.retry_policy,
+                          client_registry or spreadsheet.client_registry)
+            self.document_key = spreadsheet.document_key
+            self.document_name = spreadsheet.document_name
+            self.document_href = spreadsheet.document_href
+        else:
+            self._connect(credentials, request_hooks, retry_policy,
+                          client_registry)
+            self._open_document(document_key, document_name,
+                                template_key, template_name,
+                                folder_key, folder_name)
+
         # Find or create the worksheet
         if worksheet_name is None:
             logger.info("Using the default worksheet name")
@@ -402,10 +1942,18 @@ class Sheet(object):
         self.formula_ref_row_ix = formula_ref_row_ix
         self.flag_delete_mode = flag_deletes
         self.protected_fields = (protected_fields or [])
+        self.snapshot_store = snapshot_store
+        self.key_index = KeyIndex()
+        self.read_page_rows = read_page_rows
+        self.read_concurrency = max(1, read_concurrency)
  
         # Cache batch operations to write efficiently
         self._batch_request = None
-        self._batch_href = None
+        self._batch_bytes = 0
+        self.range_writes = range_writes
+        self._cells_url = None
+        self._batch_writer = BatchWriter(self._send_batch,
+                                         concurrency=max(1, write_concurrency))
 
         # Track headers and reference formulas
         self.header = Header()
@@ -414,184 +1962,15 @@ class Sheet(object):
         self.read_ref_formulas()
 
 
-    @property
-    def sheet(self):
-        # Finds and returns a gspread.Spreadsheet object
-        if self._sheet:
-            return self._sheet
-        self._sheet = self.gspread_client.open_by_key(self.document_key)
-        return self._sheet
-
     @property
     def worksheet(self):
         # Finds (or creates) then returns a gspread.Worksheet object 
         if self._worksheet:
             return self._worksheet
-        try:
-            try:
-                self._worksheet = self.sheet.worksheet(self.worksheet_name)
-            except WorksheetNotFound:
-                logger.info("Not found. Creating worksheet '%s'", self.worksheet_name)
-                self._worksheet = self.sheet.add_worksheet(title=self.worksheet_name, 
-                                                           rows=20, cols=10)
-        except Exception, e:
-            logger.exception("Failed to find or create worksheet: %s. %s", 
-                                                      self.worksheet_name, e)
-            raise e
+        opener = self.spreadsheet or self
+        self._worksheet = opener._open_worksheet(self.worksheet_name)
         return self._worksheet
 
-    @property
-    def gspread_client(self):
-        if self._gspread_client:
-            return self._gspread_client
-        self._gspread_client = gspread.authorize(self.credentials)
-        self._gspread_client.login()
-        return self._gspread_client 
-
-    @property
-    def drive_service(self):
-        if self._drive_service:
-            return self._drive_service
-
-        http = httplib2.Http()
-        if self.credentials.access_token_expired:
-            logger.info('Refreshing expired credentials')
-            self.credentials.refresh(http)
-
-        logger.info('Creating drive service')
-        http = self.credentials.authorize(http)
-        drive_service = apiclient.discovery.build('drive', 'v2', http=http)
-        # Cache the drive_service object for future calls. 
-        self._drive_service = drive_service 
-        return drive_service
-
-
-    def _create_new_or_copy(self, 
-                            target_name=None,
-                            source_doc=None, 
-                            folder=None,
-                            sheet_description="new"):
-        if target_name is None:
-            raise KeyError("Must specify a name for the new document")
-
-        body = {'title': target_name }
-        if folder:
-            body['parents'] = [{'kind' : 'drive#parentReference',
-                                'id' : folder['id'],
-                                'isRoot' : False }]
-
-        drive_service = self.drive_service
-        if source_doc is not None:
-            logger.info("Copying spreadsheet.")
-            try:
-                print body
-                print source_doc['id']
-                new_document = drive_service.files().copy(fileId=source_doc['id'], body=body).execute()
-            except Exception, e:
-                logger.exception("gdata API error. %s", e)
-                raise e
-
-        else:
-            # Create new blank spreadsheet.
-            logger.info("Creating blank spreadsheet.")
-            body['mimeType'] = 'application/vnd.google-apps.spreadsheet'
-            try:
-                new_document = drive_service.files().insert(body=body).execute()
-            except Exception, e:
-                logger.exception("gdata API error. %s", e)
-                raise e
-
-        logger.info("Created %s spreadsheet with ID '%s'", 
-                sheet_description,
-                new_document.get('id'))
-
-        return new_document
-
-    def _find_or_create_folder(self, folder_key=None, folder_name=None):
-        drive_service = self.drive_service
-        # Search by folder key.. raise Exception if not found.
-        if folder_key is not None:
-            try:
-                folder_rsrc = drive_service.files().get(fileId=folder_key).execute()
-            except apiclient.errors.HttpError, e:
-                # XXX: WRONG... probably returns 404 if not found,.. which is not an error.
-                logger.exception("Google API error: %s", e)
-                raise e
-
-            if not folder_rsrc:
-                raise KeyError("Folder with key %s was not found." % folder_key)
-            return folder_rsrc
-
-        if not folder_name:
-            return None
-
-        # Search by folder name.
-        try:
-            name_query = drive_service.files().list(
-                q=("title='%s' and trashed=false and "
-                   "mimeType='application/vnd.google-apps.folder'") % 
-                        folder_name.replace("'","\\'")
-                        ).execute()
-            items = name_query['items']
-            if len(items) == 1:
-                return items[0]
-            elif len(items) > 1:
-                raise KeyError("%s folders found named: %s" % (len(items), folder_name))
-        except Exception, e:
-            logger.exception("Google API error. %s", e)
-            raise e
-
-        logger.info("Creating a new folder named: '%s'", folder_name)
-        try:
-            new_folder_rsrc = drive_service.files().insert(
-                body={ 'mimeType' : 'application/vnd.google-apps.folder',
-                       'title' : folder_name }).execute()
-        except Exception, e:
-            logger.exception("Google API error. %s", e)
-            raise e
-
-        return new_folder_rsrc
-
-
-    def _find_document(self, doc_key=None, doc_name=None):
-        # Find the document by key and raise "KeyError" if not found.
-        # Otherwise search by document_name
-        drive_service = self.drive_service
-        if doc_key is not None:
-            logger.debug("Finding document by key.")
-            try:
-                doc_rsrc = drive_service.files().get(fileId=doc_key).execute()
-            except Exception, e:
-                logger.exception("gdata API error. %s", e)
-                raise e
-
-            if doc_rsrc is None:
-                raise KeyError("Could not find document with key: %s" % doc_key)
-            return doc_rsrc
-
-        if doc_name is None:
-            return None
-
-        try:
-            name_query = drive_service.files().list(
-                q=("title='%s' and trashed=false and "
-                   "mimeType='application/vnd.google-apps.spreadsheet'") %
-                        doc_name.replace("'","\\'")
-                        ).execute()
-            matches = name_query['items']
-        except Exception, e:
-            logger.exception("gdata API error. %s", e)
-            raise e
-
-        if len(matches) == 1:
-            return matches[0]
-
-        if len(matches) > 1:
-            raise KeyError("Too many matches for doc named '%s'" % doc_name)
-        
-        return None
-
-
     def _extends(self, rows=None, columns=None):
         # Resizes the sheet if needed, to match the given
         # number of rows and/or columns
@@ -603,37 +1982,177 @@ class Sheet(object):
             new_cols = columns
 
         if new_rows or new_cols:
-            try:
-                self.worksheet.resize(rows=new_rows, cols=new_cols)
-            except Exception, e:
-                logger.exception("Error resizing worksheet. %s", e)
-                raise e
+            self._execute('worksheets.resize',
+                    lambda: self.worksheet.resize(rows=new_rows, cols=new_cols),
+                    rows=new_rows, cols=new_cols)
 
 
-    def _write_cell(self, cell):
-        # Creates a batch_update if required, and adds the passed cell
-        # to it. Then tests if a flush_writes call is required (when the
-        # batch write might be close to the 1MB limit)
+    @property
+    def batch_stats(self):
+        """ A list of BatchStats for the most recent batches of cell updates
+        sent by this sheet. """
+        return list(self._batch_writer.stats)
+
+    def _write_cell(self, row, col, value):
+        # Creates a batch_update if required, and adds a CellUpdate for the
+        # cell at row, col to it. The batch is sent first if the cell would take it past the
+        # writer's batch size, or close to the 1MB limit.
         if not self._batch_request: 
             self._batch_request = []
+            self._batch_bytes = 0
+
+        cell = CellUpdate(row, col, value)
+        if self.range_writes:
+            # Most of the batch is expected to be sent as ranges.
+            max_cells, max_bytes = RANGE_BATCH_CELLS, MAX_RANGE_BYTES
+            cell_bytes = _estimate_entry_bytes(cell, RANGE_ENTRY_BYTES)
+        else:
+            max_cells, max_bytes = self._batch_writer.batch_size, MAX_BATCH_BYTES
+            cell_bytes = _estimate_entry_bytes(cell)
+        if self._batch_request and (
+                len(self._batch_request) >= max_cells or
+                self._batch_bytes + cell_bytes > max_bytes):
+            self._flush_writes(wait=False)
+            self._batch_bytes = 0
 
         logger.debug("_write_cell: Adding batch update")
         self._batch_request.append(cell)
-
-        if len(self._batch_request) > MAX_BATCH_LEN:
-            self._flush_writes()
-
-
-    def _flush_writes(self):
-        # Write current batch_updates to google sheet.
-        if self._batch_request:
-            logger.info("_flush_writes: Writing %s cell writes",
-                                        len(self._batch_request))
+        self._batch_bytes += cell_bytes
+
+
+    def _send_batch(self, cells):
+        # Posts a batch of cell updates. This can run on a writer thread, so
+        # it uses that thread's own clients. With range_writes on, blocks of
+        # adjacent cells are written as ranges and only the scattered cells
+        # are sent in cells batch feeds. Returns the number of bytes sent.
+        logger.info("_flush_writes: Writing %s cell writes", len(cells))
+        sent_bytes = 0
+        if self.range_writes:
+            ranges, scattered = _coalesce_ranges(cells)
             try:
-                self.worksheet.update_cells(self._batch_request)
+                if ranges:
+                    sent_bytes += self._send_ranges(ranges)
+                cells = scattered
             except Exception, e:
-                logger.exception("gdata API error. %s", e)
-                raise e
+                if not _api_not_enabled(e):
+                    raise
+                logger.warning("The Sheets v4 API isn't enabled, writing cell "
+                               "by cell instead. %s", e)
+                self.range_writes = False
+
+        batch, batch_bytes = [], 0
+        for cell in cells:
+            cell_bytes = _estimate_entry_bytes(cell)
+            if batch and (len(batch) >= self._batch_writer.batch_size or
+                          batch_bytes + cell_bytes > MAX_BATCH_BYTES):
+                sent_bytes += self._send_cells(batch)
+                batch, batch_bytes = [], 0
+            batch.append(cell)
+            batch_bytes += cell_bytes
+        if batch:
+            sent_bytes += self._send_cells(batch)
+        return sent_bytes
+
+    def _send_ranges(self, ranges):
+        # Writes blocks of values, as made by _coalesce_ranges, with one
+        # values.batchUpdate request. Returns the number of bytes sent.
+        title = "'%s'" % self.worksheet.title.replace("'", "''")
+        data, cells = [], 0
+        for first_row, first_col, values in ranges:
+            last_row, last_col = first_row + len(values) - 1, first_col + len(values[0]) - 1
+            data.append({'range': '%s!%s:%s' % (title,
+                                                _a1_address(first_row, first_col),
+                                                _a1_address(last_row, last_col)),
+                         'values': [[unicode(value) for value in row]
+                                    for row in values]})
+            cells += len(values) * len(values[0])
+        body = {'valueInputOption': 'USER_ENTERED', 'data': data}
+        request = self.sheets_service.spreadsheets().values().batchUpdate(
+                                    spreadsheetId=self.document_key, body=body)
+        start = time.time()
+        try:
+            self._execute('values.batchUpdate', request.execute,
+                          ranges=len(ranges), cells=cells)
+        finally:
+            self._count(batches=1, write_seconds=time.time() - start)
+        self._count(cells_written=cells)
+        return len(request.body or '')
+
+    def _send_cells(self, cells):
+        # Posts a cells batch feed, resending any cells google rejects.
+        # Returns the number of bytes sent.
+        client = self.gspread_client
+        sent_bytes = 0
+        attempt = 0
+        while cells:
+            attempt += 1
+            data = ElementTree.tostring(self._update_feed(cells))
+            sent_bytes += len(data)
+            start = time.time()
+            try:
+                response = self._execute('cells.batch',
+                            lambda: client.post_cells(self.worksheet, data),
+                            cells=len(cells))
+            finally:
+                self._count(batches=1, write_seconds=time.time() - start)
+
+            # Resend just the cells that google didn't acknowledge.
+            failed, error = self._failed_batch_cells(response, cells)
+            self._count(cells_written=len(cells) - len(failed))
+            if failed and not self._wait_to_retry('cells.batch', error, attempt):
+                raise error
+            cells = failed
+        return sent_bytes
+
+    def _update_feed(self, cells):
+        # Builds the batch update feed for a list of CellUpdates, like
+        # gspread's Worksheet._create_update_feed does for Cells.
+        if self._cells_url is None:
+            self._cells_url = gspread.urls.construct_url('cells', self.worksheet)
+        feed = ElementTree.Element('feed', {'xmlns': gspread.ns.ATOM_NS,
+                                            'xmlns:batch': gspread.ns.BATCH_NS,
+                                            'xmlns:gs': gspread.ns.SPREADSHEET_NS})
+        ElementTree.SubElement(feed, 'id').text = self._cells_url
+        for cell in cells:
+            cell_url = "%s/%s" % (self._cells_url, cell.cell_id)
+            entry = ElementTree.SubElement(feed, 'entry')
+            ElementTree.SubElement(entry, 'batch:id').text = cell.cell_id
+            ElementTree.SubElement(entry, 'batch:operation', {'type': 'update'})
+            ElementTree.SubElement(entry, 'id').text = cell_url
+            ElementTree.SubElement(entry, 'link', {'rel': 'edit',
+                                                   'type': 'application/atom+xml',
+                                                   'href': cell_url})
+            ElementTree.SubElement(entry, 'gs:cell', {'row': str(cell.row),
+                                                      'col': str(cell.col),
+                                                      'inputValue': unicode(cell.value)})
+        return feed
+
+    def _failed_batch_cells(self, response, cells):
+        # Reads the status of each entry in a batch response. Returns the
+        # cells that weren't updated, and a BatchUpdateError describing the
+        # first failure.
+        cells_by_id = dict((cell.cell_id, cell) for cell in cells)
+        failed, first_status = [], None
+        for entry in response.findall(gspread.client._ns('entry')):
+            status = entry.find(_ns_batch('status'))
+            batch_id = entry.find(_ns_batch('id'))
+            if status is None or batch_id is None or status.get('code') == '200':
+                continue
+            if batch_id.text in cells_by_id:
+                failed.append(cells_by_id[batch_id.text])
+                first_status = first_status or (status, batch_id.text)
+        if not failed:
+            return [], None
+        status, batch_id = first_status
+        # The message starts with the status code, like gspread's errors.
+        return failed, BatchUpdateError("%s: %s cells not updated, first %s. %s" % (
+                    status.get('code'), len(failed), batch_id, status.get('reason')))
+
+    def _flush_writes(self, wait=True):
+        # Write current batch_updates to google sheet. Unless wait is False,
+        # this returns once every batch has been written.
+        if self._batch_request:
+            self._batch_writer.submit(self._batch_request)
 
             # Now check the response code. 
             #for entry in resp.entry:
@@ -645,13 +2164,29 @@ class Sheet(object):
 
             self._batch_request = []
 
-
-    def _cell_feed(self, row=None, max_row=None, further_rows=False,        # XXX: REFACTOR
-                         col=None, max_col=None, further_cols=False,
-                         return_empty=False):
-
-        # Fetches cell data for a given row, and all following rows if 
-        # further_rows is True. If no row is given, all cells are returned.
+        if wait:
+            self._batch_writer.join()
+
+
+    def _refresh_worksheet(self):
+        # Re-reads the worksheet's entry, to pick up its current size and
+        # 'updated' timestamp.
+        self_uri = self.worksheet._get_link('self', self.worksheet._element).get('href')
+        entry = self._execute('worksheets.get',
+                              lambda: self.gspread_client.get_feed(self_uri))
+        self.worksheet._element = entry
+        return entry
+
+    def _worksheet_updated(self):
+        # Fetches the worksheet's current 'updated' timestamp. Google changes
+        # this whenever a cell in the worksheet is edited.
+        return self._refresh_worksheet().find(gspread.client._ns('updated')).text
+
+    def _cell_feed_params(self, row=None, max_row=None, further_rows=False,
+                                col=None, max_col=None, further_cols=False,
+                                return_empty=False):
+        # Builds the query parameters for a cell feed request. Returns None
+        # if the requested range is empty.
         params = {}
         if row is not None:
             params['min-row'] = str(row)
@@ -667,25 +2202,115 @@ class Sheet(object):
             elif not further_cols:
                 params['max-col'] = str(col)
 
-            if (params['min-col'] == params['max-col'] and
+            if (params['min-col'] == params.get('max-col') and
                 params['min-col'] == '0'):
-                return []
+                return None
 
         if return_empty:
             params['return-empty'] = "true"
+        return params
+
+    def _cell_feed(self, row=None, max_row=None, further_rows=False,
+                         col=None, max_col=None, further_cols=False,
+                         return_empty=False):
+
+        # Fetches cell data for a given row, and all following rows if 
+        # further_rows is True. If no row is given, all cells are returned.
+        params = self._cell_feed_params(row, max_row, further_rows,
+                                        col, max_col, further_cols,
+                                        return_empty)
+        if params is None:
+            return []
 
         logger.info("getting cell feed")
-        try:
-            feed = self.gspread_client.get_cells_feed(self.worksheet, params=params)
-            # Bit of a hack to rip out Gspread's xml parsing.
-            cfeed = [gspread.Cell(self, elem) for elem in
-                                        feed.findall(gspread.client._ns('entry'))]
-        except Exception, e:
-            logger.exception("gspread error. %s", e)
-            raise e
+        feed = self._execute('cells.list',
+                lambda: self.gspread_client.get_cells_feed(self.worksheet,
+                                                           params=params),
+                **params)
+        # Bit of a hack to rip out Gspread's xml parsing.
+        cfeed = [gspread.Cell(self, elem) for elem in
+                                    feed.findall(gspread.client._ns('entry'))]
 
         return cfeed
 
+    def _stream_cell_feed(self, params):
+        # Requests a cell feed and yields its cells as they are parsed from
+        # the response, so the whole feed is never held in memory. The
+        # response must be read to the end before another request is made.
+        client = self.gspread_client
+        url = "%s?%s" % (gspread.urls.construct_url('cells', self.worksheet),
+                         urllib.urlencode(params))
+        entry_tag = gspread.client._ns('entry')
+        logger.info("streaming cell feed")
+        attempt = 0
+        while True:
+            attempt += 1
+            yielded = False
+            try:
+                with self._google_request('cells.list', **params):
+                    response = client.session.get(url)
+                    root = None
+                    for event, elem in ElementTree.iterparse(response,
+                                                    events=('start', 'end')):
+                        if root is None:
+                            root = elem
+                        elif event == 'end' and elem.tag == entry_tag:
+                            yielded = True
+                            yield gspread.Cell(self, elem)
+                            # Drop parsed entries from the tree.
+                            root.clear()
+                return
+            except Exception, e:
+                # Cells already handed on can't be taken back, so only a
+                # feed that failed before its first cell is retried.
+                if yielded or not self._wait_to_retry('cells.list', e, attempt):
+                    raise
+
+    def _fetch_page(self, params):
+        # Reads one page of the cell feed on a worker thread.
+        return list(self._stream_cell_feed(params))
+
+    def _iter_cell_feed(self, row, col=None, max_col=None, return_empty=False):
+        # Streams the cells of the given row and all the rows after it, in
+        # row order. If read_page_rows or read_concurrency are set then the
+        # rows are requested in pages, read_concurrency pages at a time.
+        page_rows = self.read_page_rows
+        if not page_rows and self.read_concurrency == 1:
+            params = self._cell_feed_params(row=row, further_rows=True,
+                                            col=col, max_col=max_col,
+                                            return_empty=return_empty)
+            if params is not None:
+                for cell in self._stream_cell_feed(params):
+                    yield cell
+            return
+
+        self._refresh_worksheet()
+        last_row = self.worksheet.row_count
+        if not page_rows:
+            page_rows = int(math.ceil(max(1, last_row - row + 1) /
+                                      float(self.read_concurrency)))
+        pages = []
+        for page_row in xrange(row, last_row + 1, page_rows):
+            params = self._cell_feed_params(row=page_row,
+                        max_row=min(page_row + page_rows - 1, last_row),
+                        col=col, max_col=max_col, return_empty=return_empty)
+            if params is not None:
+                pages.append(params)
+
+        if self.read_concurrency == 1 or len(pages) < 2:
+            for params in pages:
+                for cell in self._stream_cell_feed(params):
+                    yield cell
+            return
+
+        logger.info("Reading %s pages, %s at a time", len(pages),
+                                                      self.read_concurrency)
+        # The pages come back in order, whichever finishes first.
+        for cells in _bounded_imap(_shared_worker_pool(), self._fetch_page,
+                                   pages, self.read_concurrency):
+            for cell in cells:
+                yield cell
+
     def read_ref_formulas(self):
         self.header_to_ref_formula = {}
 
@@ -722,19 +2347,15 @@ class Sheet(object):
         target_cols = self.header.last_column + len(headers_to_add)
         self._extends(columns=target_cols)
 
-        cells_list = self._cell_feed(row=self.header_row_ix, 
-                                     return_empty=True)
-        for cell in cells_list:
+        # The header row's feed only returned cells with values, so the new
+        # headers fill the other columns from the left.
+        for col in xrange(1, target_cols + 1):
             if not headers_to_add:
                 break
-            if not cell.value:
+            if self.header.col_lookup(col) is None:
                 header = headers_to_add.pop(0)
-                cell.value = header
-                self.header.set(cell.col, header)
-                self._write_cell(cell)
-
-        if headers_to_add:
-            raise CorruptHeader("Error adding headers")
+                self.header.set(col, header)
+                self._write_cell(self.header_row_ix, col, header)
 
         self._flush_writes()
 
@@ -754,11 +2375,9 @@ class Sheet(object):
 
         folder = self._find_or_create_folder(folder_key, folder_name)
         drive_service = self.drive_service
-        try:
-            source_rsrc = drive_service.files().get(fileId=self.document_key).execute()
-        except Exception, e:
-            logger.exception("Google API error. %s", e)
-            raise e
+        source_rsrc = self._execute('files.get',
+                drive_service.files().get(fileId=self.document_key).execute,
+                fileId=self.document_key)
 
         backup = self._create_new_or_copy(source_doc=source_rsrc, 
                                         target_name=backup_name, 
@@ -769,24 +2388,44 @@ class Sheet(object):
         return backup_key
          
     def _yield_rows(self, cells_feed):
-        cur_row = None
+        # Groups a feed of cells into (row_num, {header: value}) pairs. The
+        # cells themselves aren't kept.
+        cur_row_num, cur_values = None, None
+        col_to_header = self.header.col_to_header
+        cells_read = 0
         for cell in cells_feed:
+            cells_read += 1
             if cell.row <= self.header_row_ix:
                 # Never yield the header from this function to avoid overwrites
                 continue
             if self.formula_ref_row_ix and cell.row == self.formula_ref_row_ix:
                 # Never yield the formula ref row to avoid overwrites
                 continue
-            if cur_row is None or cur_row.row_num != cell.row:
-                if cur_row is not None:
-                    yield cur_row
+            if cur_row_num != cell.row:
+                if cur_row_num is not None:
+                    yield cur_row_num, cur_values
                 # Make a new row.
-                cur_row = Row(cell.row)
-            if cell.col in self.header.columns:
-                cur_row[self.header.col_lookup(cell.col)] = cell
-
-        if cur_row is not None:
-            yield cur_row
+                cur_row_num, cur_values = cell.row, {}
+            header = col_to_header.get(cell.col)
+            if header is not None:
+                cur_values[header] = cell.value
+
+        if cur_row_num is not None:
+            yield cur_row_num, cur_values
+        self._count(cells_read=cells_read)
+
+    def _read_table(self, cells_feed, skip_empty=True, blank_rows=None):
+        # Reads a feed of cells into a Table, leaving out blank rows unless
+        # skip_empty is False. The numbers of the rows left out are added to
+        # the blank_rows list, if one is given.
+        table = Table(self.header.headers_in_order)
+        for row_num, row_values in self._yield_rows(cells_feed):
+            if skip_empty and all(val == '' for val in row_values.itervalues()):
+                if blank_rows is not None:
+                    blank_rows.append(row_num)
+                continue
+            table.append(row_num, row_values)
+        return table
 
     def data(self, as_cells=False):
         """ Reads the worksheet and returns an indexed dictionary of the
@@ -798,60 +2437,308 @@ class Sheet(object):
 
         {'Miss Piggy': {'Color': 'Pink', 'Performer': 'Frank Oz'}, 'Kermit': {'Color': 'Green', 'Performer': 'Jim Henson'}} 
         
+        Rows are read into column-oriented storage, and each is returned as
+        its own dictionary.
         """
-        sheet_data = {}
         self.max_row = max(self.header_row_ix, self.formula_ref_row_ix)
-        all_cells = self._cell_feed(row=self.max_row+1,
-                                    further_rows=True,
-                                    col=self.header.first_column,
-                                    max_col=self.header.last_column,
-                                    return_empty=True)
-
-        for wks_row in self._yield_rows(all_cells):
-            if wks_row.row_num not in sheet_data and not wks_row.is_empty():
-                sheet_data[wks_row.row_num] = wks_row
-
-        all_rows = sheet_data.keys()
-        if all_rows:
-            self.max_row = max(all_rows)
-
+        self.key_index.clear(self.key_column_headers)
+        all_cells = self._iter_cell_feed(row=self.max_row+1,
+                                         col=self.header.first_column,
+                                         max_col=self.header.last_column,
+                                         return_empty=True)
+        blank_rows = []
+        table = self._read_table(all_cells, blank_rows=blank_rows)
+        if len(table):
+            self.max_row = max(table.row_nums)
+        self.blank_rows = set(row for row in blank_rows if row < self.max_row)
+        return self._index_table(table, as_cells)
+
+    def _narrow_data(self, headers):
+        # Like data(as_cells=True) but only reads the key columns and the
+        # columns of the given headers. Each run of adjacent columns is read
+        # with its own cell feed, skipping empty cells.
+        if len(self.key_column_headers) == 0:
+            self._assume_key_column_headers()
+        cols = set(self.header.header_lookup(header) for header in
+                        set(headers) | set(self.key_column_headers))
+        cols.discard(None)
+        first_row = max(self.header_row_ix, self.formula_ref_row_ix) + 1
+        rows = collections.defaultdict(dict)
+        for first_col, last_col in _consecutive_runs(cols):
+            cells = self._iter_cell_feed(row=first_row, col=first_col,
+                                         max_col=last_col)
+            for row_num, row_values in self._yield_rows(cells):
+                rows[row_num].update(row_values)
+
+        table = Table([self.header.col_lookup(col) for col in sorted(cols)])
+        for row_num in sorted(rows):
+            table.append(row_num, rows.pop(row_num))
+        # Rows further down can hold values only in the columns that weren't
+        # read, and max_row must be past them before anything is appended.
+        self.max_row = max(table.row_nums or [first_row - 1])
+        self.max_row = self._last_used_row()
+        self.key_index.clear(self.key_column_headers)
+        return self._index_table(table, as_cells=True)
+
+    def _last_used_row(self):
+        # Finds the last row below max_row holding a value in any column.
+        # Only cells with values are returned by the feed, so this is cheap
+        # when the rows below are empty.
+        cells = self._iter_cell_feed(row=self.max_row+1)
+        return max([self.max_row] + [cell.row for cell in cells])
+
+    def _rows_with_unheaded_values(self, row_nums):
+        # Returns those of row_nums holding a value in a column without a
+        # header. Blank rows are found by reading just the header columns,
+        # so these would look blank. Only cells with values are returned by
+        # the feeds.
+        row_nums = set(row_nums)
+        headed = set(self.header.columns)
+        last_column = self.header.last_column
+        runs = _consecutive_runs(col for col in xrange(1, last_column + 1)
+                                                if col not in headed)
+        runs.append([last_column + 1, None])
+        found = set()
+        for first_col, last_col in runs:
+            for cell in self._cell_feed(row=min(row_nums), max_row=max(row_nums),
+                                        col=first_col, max_col=last_col,
+                                        further_cols=last_col is None):
+                if cell.row in row_nums:
+                    found.add(cell.row)
+        return found
+
+    def _index_table(self, table, as_cells):
         # Now index by key_tuple
         indexed_sheet_data = {}
-        for row, wks_row in sheet_data.iteritems():
+        for wks_row in table.rows():
             # Make the key tuple
             if len(self.key_column_headers) == 0:
-                # Are there any default key column headers?
-                if "Key" in wks_row:
-                    logger.info("Assumed key column's header is 'Key'")
-                    self.key_column_headers = ['Key']
-                elif "Key-1" in wks_row:
-                    self.key_column_headers = [h for h in wks_row.keys() 
-                        if h.startswith("Key-") and h.split("-")[1].isdigit()]
-                    logger.info("Assumed key column headers were: %s",
-                                self.key_column_headers)
-                else:
-                    raise Exception("Unable to read spreadsheet. Specify"
-                        "key_column_headers when initializing Sheet object.")
-
-            key_list = []
-            for key_hdr in self.key_column_headers:
-                key_val = wks_row.db.get(key_hdr,"")
-                if key_val.startswith("'"):
-                    key_val = key_val[1:]
-                key_list.append(key_val)
-            key_tuple = tuple(key_list)
+                self._assume_key_column_headers()
+                self.key_index.clear(self.key_column_headers)
+
+            key_tuple = self._row_key(wks_row)
             if all(k == "" for k in key_tuple):
                 continue
 
+            self.key_index.add(key_tuple, wks_row.row_num)
             if as_cells:
                 indexed_sheet_data[key_tuple] = wks_row
+                continue
+            if len(key_tuple) == 1:
+                key_tuple = key_tuple[0]
+            indexed_sheet_data[key_tuple] = dict(wks_row)
+
+        return indexed_sheet_data
+
+    def _assume_key_column_headers(self):
+        # Are there any default key column headers?
+        if "Key" in self.header:
+            logger.info("Assumed key column's header is 'Key'")
+            self.key_column_headers = ['Key']
+        elif "Key-1" in self.header:
+            self.key_column_headers = [h for h in self.header.headers_in_order
+                if h.startswith("Key-") and h.split("-")[1].isdigit()]
+            logger.info("Assumed key column headers were: %s",
+                        self.key_column_headers)
+        else:
+            raise Exception("Unable to read spreadsheet. Specify"
+                "key_column_headers when initializing Sheet object.")
+
+    def get(self, key):
+        """ Reads a single row of the worksheet.
+
+        Args:
+          key (str or tuple): The row's key, as used by data() and inject.
+
+        Returns:
+          The row's dictionary of values, or None if the key isn't found.
+        """
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """ Reads the rows for some keys without downloading the whole
+        worksheet. Only the key columns and then the matching rows are read,
+        fetching each run of adjacent rows with one request.
+
+        Args:
+          keys (list): The keys of the rows to read.
+
+        Returns:
+          A dictionary of key to the row's dictionary of values. Keys that
+          aren't found in the worksheet are left out.
+        """
+        if len(self.key_column_headers) == 0:
+            self._assume_key_column_headers()
+        key_tuples = {}
+        for key in keys:
+            if isinstance(key, tuple):
+                key_tuples[tuple(str(k) for k in key)] = key
             else:
-                if len(key_tuple) == 1:
-                    key_tuple = key_tuple[0]
-                indexed_sheet_data[key_tuple] = wks_row.db
+                key_tuples[(str(key),)] = key
+
+        key_rows = None
+        if self._key_index_current():
+            key_rows = dict((self.key_index.row_for(key_tuple), key_tuple)
+                        for key_tuple in key_tuples if key_tuple in self.key_index)
+            rows = self._read_rows(key_rows.keys())
+            if any(self._row_key(rows[row_num]) != key_tuple
+                   for row_num, key_tuple in key_rows.iteritems()):
+                logger.info("Key index of worksheet '%s' is stale",
+                            self.worksheet_name)
+                key_rows = None
+        if key_rows is None:
+            key_rows = self._read_key_rows(key_tuples)
+            rows = self._read_rows(key_rows.keys())
+
+        return dict((key_tuples[key_tuple], dict(rows[row_num]))
+                    for row_num, key_tuple in key_rows.iteritems())
+
+    def _read_key_rows(self, key_tuples):
+        # Reads just the key columns to find the rows holding the given key
+        # tuples. Returns a dictionary of row_num to key_tuple.
+        key_cols = [self.header.header_lookup(key_hdr)
+                                    for key_hdr in self.key_column_headers]
+        if None in key_cols:
+            return {}
+        first_row = max(self.header_row_ix, self.formula_ref_row_ix) + 1
+        runs = _consecutive_runs(set(key_cols))
+        if len(runs) == 1:
+            rows = self._yield_rows(self._iter_cell_feed(row=first_row,
+                                        col=runs[0][0], max_col=runs[0][1]))
+        else:
+            # Key columns with others between them are read a run at a
+            # time, and their values joined up by row.
+            key_values = collections.defaultdict(dict)
+            for first_col, last_col in runs:
+                cells = self._iter_cell_feed(row=first_row, col=first_col,
+                                             max_col=last_col)
+                for row_num, row_values in self._yield_rows(cells):
+                    key_values[row_num].update(row_values)
+            rows = sorted(key_values.iteritems())
+        found = {}
+        for row_num, row_values in rows:
+            key_tuple = self._row_key(row_values)
+            if key_tuple in key_tuples:
+                # Like data(), a later duplicate of a key wins.
+                found[key_tuple] = row_num
+        return dict((row_num, key_tuple)
+                    for key_tuple, row_num in found.iteritems())
+
+    def _row_key(self, row_values):
+        # Makes the key tuple for a dictionary of row values.
+        key_list = []
+        for key_hdr in self.key_column_headers:
+            key_val = row_values.get(key_hdr,"")
+            if key_val.startswith("'"):
+                key_val = key_val[1:]
+            key_list.append(key_val)
+        return tuple(key_list)
+
+    def _read_rows(self, row_nums):
+        # Reads the given rows, fetching each run of consecutive rows with a
+        # single cell feed. Returns a dictionary of row_num to RowView.
+        rows = {}
+        for first_row, last_row in _consecutive_runs(row_nums):
+            cells = self._cell_feed(row=first_row, max_row=last_row,
+                                    col=self.header.first_column,
+                                    max_col=self.header.last_column,
+                                    return_empty=True)
+            for wks_row in self._read_table(cells, skip_empty=False).rows():
+                rows[wks_row.row_num] = wks_row
+        return rows
+
+    def _snapshot_data(self, fixed_data, delete_rows):
+        # Uses the snapshot to build the same key_tuple index as
+        # data(as_cells=True). Only rows that will be written are read
+        # from the worksheet. Returns None if the snapshot is out of date.
+        snapshot = self.snapshot_store.load(self.document_key, self.worksheet_name)
+        if snapshot is None:
+            logger.info("No snapshot for worksheet '%s'", self.worksheet_name)
+            return None
+
+        headers = dict((int(col), header) for col, header in
+                                            snapshot['headers'].iteritems())
+        if (headers != self.header.col_to_header or
+            snapshot['key_column_headers'] != self.key_column_headers or
+            snapshot['header_row_ix'] != self.header_row_ix or
+            snapshot['formula_ref_row_ix'] != self.formula_ref_row_ix or
+            snapshot['updated'] != self._worksheet_updated()):
+            logger.info("Snapshot of worksheet '%s' is stale", self.worksheet_name)
+            return None
+
+        logger.info("Using snapshot of worksheet '%s'", self.worksheet_name)
+        indexed_sheet_data = {}
+        rows_to_read = []
+        matched_rows = []
+        table = Table(self.header.headers_in_order)
+        self.key_index.clear(self.key_column_headers)
+        for row_num, row_values in snapshot['rows']:
+            wks_row = table.append(row_num, row_values)
+            key_tuple = self._row_key(row_values)
+            indexed_sheet_data[key_tuple] = wks_row
+            self.key_index.add(key_tuple, row_num)
+            if key_tuple in fixed_data:
+                matched_rows.append((key_tuple, row_num, row_values))
+            elif delete_rows:
+                if not (self.flag_delete_mode and
+                        self._is_flagged_delete(key_tuple, wks_row)):
+                    rows_to_read.append(row_num)
+
+        differences = bulk_row_differences(
+            [fixed_data[key_tuple] for key_tuple, _, _ in matched_rows],
+            [row_values for _, _, row_values in matched_rows])
+        rows_to_read.extend(row_num for (_, row_num, _), different
+                                in itertools.izip(matched_rows, differences)
+                                if different)
+
+        read_rows = self._read_rows(rows_to_read)
+        for key_tuple, wks_row in indexed_sheet_data.items():
+            if wks_row.row_num in read_rows:
+                indexed_sheet_data[key_tuple] = read_rows[wks_row.row_num]
+
+        self.max_row = snapshot['max_row']
+        return indexed_sheet_data
 
+    def _key_index_current(self):
+        # Only asks google for the updated timestamp if the index was stamped.
+        return (self.key_index.updated is not None and
+                self.key_index.is_current(self.key_column_headers,
+                                          self._worksheet_updated()))
+
+    def _key_index_data(self, fixed_data):
+        # Uses the key index to read only the rows holding the given keys,
+        # returning them indexed like data(as_cells=True). Returns None if
+        # the index is out of date.
+        if not self._key_index_current():
+            return None
+
+        key_rows = dict((self.key_index.row_for(key_tuple), key_tuple)
+                        for key_tuple in fixed_data if key_tuple in self.key_index)
+        read_rows = self._read_rows(key_rows.keys())
+        indexed_sheet_data = {}
+        for row_num, key_tuple in key_rows.iteritems():
+            wks_row = read_rows.get(row_num)
+            if wks_row is None or self._row_key(wks_row) != key_tuple:
+                logger.info("Key index of worksheet '%s' is stale",
+                            self.worksheet_name)
+                return None
+            indexed_sheet_data[key_tuple] = wks_row
+        logger.info("Using key index of worksheet '%s'", self.worksheet_name)
         return indexed_sheet_data
 
+    def _save_snapshot(self, synced_rows, updated):
+        # Records the state of the worksheet after an update. synced_rows is
+        # a dictionary of row_num to the dictionary of row values.
+        snapshot = {'updated': updated,
+                    'headers': self.header.col_to_header,
+                    'key_column_headers': self.key_column_headers,
+                    'header_row_ix': self.header_row_ix,
+                    'formula_ref_row_ix': self.formula_ref_row_ix,
+                    'max_row': self.max_row,
+                    'rows': [(row_num, dict(row_values)) for row_num, row_values
+                                                in sorted(synced_rows.items())]}
+        self.snapshot_store.save(self.document_key, self.worksheet_name, snapshot)
+
     @property
     def key_length(self):
         return len(self.key_column_headers)
@@ -878,7 +2765,7 @@ class Sheet(object):
         """
         return self._update(raw_data, row_change_callback, delete_rows=True)
 
-    def inject(self, raw_data, row_change_callback=None):
+    def inject(self, raw_data, row_change_callback=None, narrow_read=False):
         """ Use this function to add rows or update existing rows in the
         spreadsheet.
     
@@ -896,13 +2783,24 @@ class Sheet(object):
                              row_dict_after, 
                              list_of_changed_keys)
 
+          narrow_read (Optional) (bool): Only read the key columns and the
+             columns found in raw_data, rather than every column of the
+             worksheet. This is much quicker on wide worksheets. The
+             row_dict_before passed to row_change_callback only holds the
+             columns that were read. New rows are still added after the
+             last row holding a value in any column.
+
         Returns:
           UpdateResults (object): A simple counter object providing statistics
             about the changes made by sheetsync.
         """
-        return self._update(raw_data, row_change_callback, delete_rows=False)
+        return self._update(raw_data, row_change_callback, delete_rows=False,
+                            narrow_read=narrow_read)
 
-    def _update(self, raw_data, row_change_callback=None, delete_rows=False):
+    def _update(self, raw_data, row_change_callback=None, delete_rows=False,
+                narrow_read=False):
+        results = UpdateResults()
+        counts_before = self._counts.copy()
         required_headers = set()
         logger.debug("In _update. Checking for bad keys and missing headers")
         fixed_data = {}
@@ -930,28 +2828,67 @@ class Sheet(object):
             required_headers.update( set(row_data.keys()) )
 
         self._get_or_create_headers(required_headers)
-
-        results = UpdateResults()
+        results.lap('headers')
+
+        synced_rows = {}    # row_num -> values, for the snapshot store.
+
+        sheet_data = None
+        # blank_rows can be filled by new rows if they were just read, or if
+        # nothing has changed since this sheet last wrote to the worksheet.
+        blank_rows_current = False
+        if self.snapshot_store:
+            sheet_data = self._snapshot_data(fixed_data, delete_rows)
+        elif not delete_rows:
+            # Rows that aren't being injected don't need reading.
+            sheet_data = self._key_index_data(fixed_data)
+            blank_rows_current = sheet_data is not None
+        whole_rows = True
+        if sheet_data is None:
+            if narrow_read:
+                sheet_data = self._narrow_data(required_headers)
+                whole_rows = False
+            else:
+                sheet_data = self.data(as_cells=True)
+                blank_rows_current = True
+        if not blank_rows_current:
+            self.blank_rows = set()
+        # Rows blanked by this update aren't reused, as their writes could
+        # be sent after the new row's.
+        free_rows = collections.deque(sorted(self.blank_rows))
+        # The index is stamped again once the writes are done.
+        self.key_index.updated = None
+        results.lap('read')
+
+        # Compare the rows in both the fixed_data and the worksheet, a column
+        # at a time.
+        matched_keys = [key_tuple for key_tuple in sheet_data
+                                  if key_tuple in fixed_data]
+        differences = dict(itertools.izip(matched_keys, bulk_row_differences(
+                                [fixed_data[key_tuple] for key_tuple in matched_keys],
+                                [sheet_data[key_tuple] for key_tuple in matched_keys])))
 
         # Check for changes and deletes.
-        for key_tuple, wks_row in self.data(as_cells=True).iteritems():
+        for key_tuple, wks_row in sheet_data.iteritems():
+            synced_rows[wks_row.row_num] = wks_row
             if key_tuple in fixed_data:
                 # This worksheet row is in the fixed_data, might be a change or no-change.
                 raw_row = fixed_data[key_tuple]
-                different_fields = []
-                for header, raw_value in raw_row.iteritems():
-                    sheet_val = wks_row.db.get(header, "")
-                    if not google_equivalent(raw_value, sheet_val):
-                        logger.debug("Identified different field '%s' on %s: %s != %s", header, key_tuple, sheet_val, raw_value)
-                        different_fields.append(header)
+                different_fields = differences[key_tuple]
+                for header in different_fields:
+                    logger.debug("Identified different field '%s' on %s: %s != %s", header, key_tuple, wks_row.get(header, ""), raw_row[header])
 
                 if different_fields:
-                    if self._change_row(key_tuple, 
-                                        wks_row, 
-                                        raw_row, 
-                                        different_fields,
-                                        row_change_callback):
+                    changed_fields = self._change_row(key_tuple,
+                                                      wks_row,
+                                                      raw_row,
+                                                      different_fields,
+                                                      row_change_callback)
+                    if changed_fields:
                         results.changed += 1
+                        row_values = dict(wks_row)
+                        for header in changed_fields:
+                            row_values[header] = raw_row[header]
+                        synced_rows[wks_row.row_num] = row_values
                 else:
                     results.nochange += 1
                 missing_raw_keys.remove( key_tuple )
@@ -963,34 +2900,47 @@ class Sheet(object):
                         logger.debug("Flagging row %s for deletion (key %s)", 
                                                    wks_row.row_num, key_tuple)
                         if row_change_callback:
-                            row_change_callback(key_tuple, wks_row.db, 
+                            row_change_callback(key_tuple, dict(wks_row),
                                         None, self.key_column_headers[:])
                         self._delete_flag_row(key_tuple, wks_row)
                         results.deleted += 1
+                        row_values = dict(wks_row)
+                        for header in self.key_column_headers:
+                            row_values[header] = "%s%s" % (
+                                        row_values.get(header, ""), DELETE_ME_FLAG)
+                        synced_rows[wks_row.row_num] = row_values
                 else:
                     # Hard delete. Actually delete the row's data.
                     logger.debug("Deleting row: %s for key %s", 
                                                     wks_row.row_num, key_tuple)
                     if row_change_callback:
-                        row_change_callback(key_tuple, wks_row.db, 
-                                            None, wks_row.db.keys())
+                        row_change_callback(key_tuple, dict(wks_row),
+                                            None, wks_row.keys())
                     self._log_change(key_tuple, "Deleted entry.")
                     self._delete_row(key_tuple, wks_row)
                     results.deleted += 1
+                    del synced_rows[wks_row.row_num]
 
+        results.lap('diff')
         if missing_raw_keys:
+            if free_rows:
+                # Like compact(), don't treat a row holding values in other
+                # columns as blank.
+                occupied = self._rows_with_unheaded_values(free_rows)
+                free_rows = collections.deque(row_num for row_num in free_rows
+                                              if row_num not in occupied)
+                self.blank_rows -= occupied
             # Add missing key in raw
-            self._extends(rows=(self.max_row+len(missing_raw_keys)))
-            
-            empty_cells_list = self._cell_feed(row=self.max_row+1,
-                                               col=self.header.first_column, 
-                                               max_col=self.header.last_column, 
-                                               further_rows=True,
-                                               return_empty=True)
-
-            iter_empty_rows = self._yield_rows(empty_cells_list)
+            appended_rows = len(missing_raw_keys) - len(free_rows)
+            if appended_rows > 0:
+                self._extends(rows=(self.max_row+appended_rows))
+            results.lap('resize')
+
+            # New rows fill the blank rows first, then go after the last
+            # row. They are written by address, so the empty cells don't
+            # need reading first.
             while missing_raw_keys:
-                wks_row = iter_empty_rows.next()
+                row_num = free_rows.popleft() if free_rows else self.max_row + 1
                 key_tuple = missing_raw_keys.pop()
                 logger.debug("Adding new row: %s", str(key_tuple))
                 raw_row = fixed_data[key_tuple]
@@ -998,11 +2948,113 @@ class Sheet(object):
                 if row_change_callback:
                     row_change_callback(key_tuple, None, 
                                         raw_row, raw_row.keys())
-                self._insert_row(key_tuple, wks_row, raw_row)
+                self._insert_row(key_tuple, row_num, raw_row)
+                synced_rows[row_num] = self._inserted_values(key_tuple, raw_row)
+            results.lap('insert')
 
         self._flush_writes()
+        updated = self._worksheet_updated()
+        self.key_index.updated = updated
+        results.lap('flush')
+        if (self.compact_threshold is not None and
+                len(self.blank_rows) >= self.compact_threshold):
+            try:
+                results.compacted = self.compact()
+            except Exception, e:
+                if not _api_not_enabled(e):
+                    raise
+                logger.warning("Unable to compact worksheet '%s'. %s",
+                               self.worksheet_name, e)
+            results.lap('compact')
+        if self.snapshot_store:
+            if whole_rows and not results.compacted:
+                self._save_snapshot(synced_rows, updated)
+            else:
+                # Only some columns were read, so the stale snapshot can't
+                # be brought up to date.
+                self.snapshot_store.clear(self.document_key, self.worksheet_name)
+
+        results.timings['write'] = (self._counts['write_seconds'] -
+                                    counts_before['write_seconds'])
+        for counter in REQUEST_COUNTERS:
+            setattr(results, counter,
+                    self._counts[counter] - counts_before[counter])
+        if self.metrics_callback:
+            self.metrics_callback(results.metrics())
         return results
 
+    def compact(self):
+        """ Deletes the blank rows below the header, and the empty rows at
+        the end of the worksheet, moving the rows of data up to fill the
+        gaps. Rows holding a value in any column, with or without a header,
+        are kept, and so is one blank row if there are no others. The key
+        index is renumbered to match. Deleting rows needs
+        the Sheets v4 API.
+
+        Hard deletes (flag_deletes=False) only blank rows, so worksheets that
+        are synced often can fill up with them. See also compact_threshold.
+
+        Returns:
+          The number of rows deleted.
+        """
+        self._flush_writes()
+        updated = self._worksheet_updated()
+        index_current = self.key_index.is_current(self.key_column_headers,
+                                                  updated)
+        first_row = max(self.header_row_ix, self.formula_ref_row_ix) + 1
+        used_rows = set(cell.row for cell in self._iter_cell_feed(row=first_row))
+        blank_rows = [row_num for row_num in
+                      xrange(first_row, self.worksheet.row_count + 1)
+                      if row_num not in used_rows]
+        if not used_rows:
+            # Sheets refuses to delete every row that isn't frozen, so one
+            # blank row is kept below the header.
+            blank_rows = blank_rows[1:]
+        if not blank_rows:
+            return 0
+
+        # Delete from the bottom up, so the earlier runs don't move.
+        requests = [{'deleteDimension': {'range': {'sheetId': self._sheet_id(),
+                                                   'dimension': 'ROWS',
+                                                   'startIndex': first - 1,
+                                                   'endIndex': last}}}
+                    for first, last in reversed(_consecutive_runs(blank_rows))]
+        logger.info("Compacting worksheet '%s', deleting %s blank rows",
+                    self.worksheet_name, len(blank_rows))
+        self._execute('spreadsheets.batchUpdate',
+                      self.sheets_service.spreadsheets().batchUpdate(
+                          spreadsheetId=self.document_key,
+                          body={'requests': requests}).execute,
+                      rows=len(blank_rows))
+
+        self.key_index.delete_rows(blank_rows)
+        self.key_index.updated = None
+        if index_current:
+            self.key_index.updated = self._worksheet_updated()
+        else:
+            self._refresh_worksheet()
+        self.max_row = first_row - 1 + len(used_rows)
+        self.blank_rows = set()
+        if self.snapshot_store:
+            self.snapshot_store.clear(self.document_key, self.worksheet_name)
+        return len(blank_rows)
+
+    def _sheet_id(self):
+        # The worksheet's sheetId in the Sheets v4 API, which isn't the id
+        # used by the v3 feeds.
+        if self._v4_sheet_id is None:
+            response = self._execute('spreadsheets.get',
+                        self.sheets_service.spreadsheets().get(
+                            spreadsheetId=self.document_key).execute)
+            for sheet in response.get('sheets', []):
+                if sheet['properties']['title'] == self.worksheet.title:
+                    self._v4_sheet_id = sheet['properties']['sheetId']
+                    break
+            else:
+                raise MissingSheet("Worksheet '%s' not found with the Sheets "
+                                   "v4 API" % self.worksheet.title)
+        return self._v4_sheet_id
+
     def _log_change(self, key_tuple, description, old_val="", new_val=""):
 
         def truncate(text, length=18):
@@ -1025,18 +3077,22 @@ class Sheet(object):
         return False
 
     def _delete_flag_row(self, key_tuple, wks_row):
-        for cell in wks_row.cell_list():
-            if self.header.col_lookup(cell.col) in self.key_column_headers:
-                # Append the DELETE_ME_FLAG
-                cell.value = "%s%s" % (cell.value,DELETE_ME_FLAG)
-                self._write_cell(cell)
-
+        flagged_key = []
+        for key_hdr in self.key_column_headers:
+            # Append the DELETE_ME_FLAG
+            value = "%s%s" % (wks_row.get(key_hdr, ""), DELETE_ME_FLAG)
+            self._write_cell(wks_row.row_num,
+                             self.header.header_lookup(key_hdr), value)
+            flagged_key.append(value[1:] if value.startswith("'") else value)
+
+        self.key_index.add(tuple(flagged_key), wks_row.row_num)
         self._log_change(key_tuple, "Deleted entry")
 
     def _delete_row(self, key_tuple, wks_row):
-        for cell in wks_row.cell_list():
-            cell.value = ''
-            self._write_cell(cell)
+        for col in self.header.columns:
+            self._write_cell(wks_row.row_num, col, '')
+        self.key_index.remove_row(wks_row.row_num)
+        self.blank_rows.add(wks_row.row_num)
 
     def _get_value_for_column(self, key_tuple, raw_row, col):
         # Given a column, and a row dictionary.. returns the value
@@ -1062,19 +3118,32 @@ class Sheet(object):
 
         return ""
 
-    def _insert_row(self, key_tuple, wks_row, raw_row):
+    def _inserted_values(self, key_tuple, raw_row):
+        # The values a new row will show once inserted. Formula cells are
+        # left out as their values are calculated by google.
+        row_values = {}
+        for col, header in self.header.col_to_header.iteritems():
+            value = self._get_value_for_column(key_tuple, raw_row, col)
+            if value.startswith("="):
+                continue
+            if value.startswith("'"):
+                value = value[1:]
+            row_values[header] = value
+        return row_values
+
+    def _insert_row(self, key_tuple, row_num, raw_row):
 
-        for cell in wks_row.cell_list():
-            if cell.col in self.header.columns:
-                value = self._get_value_for_column(key_tuple, raw_row, cell.col)
-                logger.debug("Batching write of %s", value[:50])
-                cell.value = value
-                self._write_cell(cell)
+        for col in self.header.columns:
+            value = self._get_value_for_column(key_tuple, raw_row, col)
+            logger.debug("Batching write of %s", value[:50])
+            self._write_cell(row_num, col, value)
 
-        logger.debug("Inserting row %s with batch operation.", wks_row.row_num)
+        logger.debug("Inserting row %s with batch operation.", row_num)
 
+        self.key_index.add(key_tuple, row_num)
+        self.blank_rows.discard(row_num)
         self._log_change(key_tuple, "Added entry")
-        self.max_row += 1
+        self.max_row = max(self.max_row, row_num)
 
  
     def _change_row(self, key_tuple, wks_row, 
@@ -1082,25 +3151,273 @@ class Sheet(object):
                     row_change_callback):
 
         changed_fields = []
-        for cell in wks_row.cell_list():
-            if cell.col not in self.header.columns:
+        for header in different_fields:
+            col = self.header.header_lookup(header)
+            if col is None:
                 continue
 
-            header = self.header.col_lookup(cell.col)
-            if header in different_fields:
-                raw_val = raw_row[header]
-                sheet_val = wks_row.db.get(header,"")
-                if (header in self.protected_fields) and sheet_val != "":
-                    # Do not overwrite this protected field.
-                    continue
+            raw_val = raw_row[header]
+            sheet_val = wks_row.get(header,"")
+            if (header in self.protected_fields) and sheet_val != "":
+                # Do not overwrite this protected field.
+                continue
 
-                cell.value = raw_val
-                self._write_cell(cell)
-                changed_fields.append(header)
-                self._log_change(key_tuple, ("Updated %s" % header), 
-                                 old_val=sheet_val, new_val=raw_val)
+            self._write_cell(wks_row.row_num, col, raw_val)
+            changed_fields.append(header)
+            self._log_change(key_tuple, ("Updated %s" % header), 
+                             old_val=sheet_val, new_val=raw_val)
 
         if row_change_callback:
-            row_change_callback(key_tuple, wks_row.db, raw_row, changed_fields)
+            row_change_callback(key_tuple, dict(wks_row), raw_row,
+                                changed_fields)
 
         return changed_fields
+
+
+class Spreadsheet(_GoogleDocument):
+    """ A google spreadsheet document, for syncing data to many of its
+    worksheets at once.
+
+    The document is found (or created) once, and each worksheet is opened as
+    a Sheet that shares it. sync and inject update several worksheets in
+    parallel, on a pool of threads. Every worksheet uses the same client
+    registry connections and the module's rate_limiter, so a job takes about
+    as long as its slowest worksheet rather than all of them in turn.
+
+    Attributes:
+       document_key (str): The spreadsheet's document key.
+       document_name (str): The title of the google spreadsheet document.
+       document_href (str): The HTML href for the google spreadsheet document.
+       sheets (dict): The Sheet for each worksheet name opened so far.
+
+    Args:
+        credentials (OAuth2Credentials): As for Sheet.
+        document_key (Optional) (str): As for Sheet.
+        document_name (Optional) (str): As for Sheet.
+        concurrency (Optional) (int): The number of worksheets updated at
+            once. Defaults to 4.
+        request_hooks (Optional) (list of RequestHook): As for Sheet, and used
+            by every worksheet.
+        retry_policy (Optional) (RetryPolicy): As for Sheet, and used by every
+            worksheet.
+        client_registry (Optional) (ClientRegistry): As for Sheet.
+        template_key, template_name, folder_key, folder_name (Optional)
+            (str): As for Sheet, used if the document has to be created.
+        **sheet_options: Other keyword arguments for Sheet, such as
+            key_column_headers or flag_deletes, used for every worksheet.
+    """
+    def __init__(self, credentials=None,
+                 document_key=None, document_name=None,
+                 concurrency=4,
+                 request_hooks=None,
+                 retry_policy=None,
+                 client_registry=None,
+                 template_key=None, template_name=None,
+                 folder_key=None, folder_name=None,
+                 **sheet_options):
+        self._connect(credentials, request_hooks, retry_policy,
+                      client_registry)
+        self._open_document(document_key, document_name,
+                            template_key, template_name,
+                            folder_key, folder_name)
+        self.concurrency = max(1, concurrency)
+        self.sheet_options = sheet_options
+        self.sheets = {}
+        self._lock = threading.Lock()
+
+    def _open_worksheet(self, worksheet_name):
+        # Worksheets are opened from several threads at once, and share
+        # gspread's list of worksheets in the document.
+        with self._lock:
+            return super(Spreadsheet, self)._open_worksheet(worksheet_name)
+
+    def worksheet(self, worksheet_name=None, **options):
+        """ Returns the Sheet for a worksheet in the document, opening it
+        (and creating the worksheet if necessary) the first time.
+
+        Args:
+            worksheet_name (Optional) (str): The name of the worksheet.
+                Defaults to "Sheet1".
+            **options: Keyword arguments for Sheet, used instead of the
+                spreadsheet's sheet_options. Only used when the worksheet is
+                first opened.
+        """
+        worksheet_name = worksheet_name or DEFAULT_WORKSHEET_NAME
+        sheet = self.sheets.get(worksheet_name)
+        if sheet is None:
+            sheet_options = dict(self.sheet_options, **options)
+            sheet = Sheet(spreadsheet=self, worksheet_name=worksheet_name,
+                          **sheet_options)
+            with self._lock:
+                sheet = self.sheets.setdefault(worksheet_name, sheet)
+        return sheet
+
+    def sync(self, data, row_change_callback=None):
+        """ Syncs data to several worksheets in parallel. Each worksheet
+        is synced as by Sheet.sync.
+
+        Args:
+            data (dict): Maps each worksheet name to the dictionary of rows
+                to sync to it.
+            row_change_callback (Optional) (func): As for Sheet.sync. It is
+                called from several threads at once.
+
+        Returns:
+            dict: The UpdateResults for each worksheet name.
+        """
+        return self._update_all(data, lambda sheet, rows:
+                                sheet.sync(rows, row_change_callback))
+
+    def inject(self, data, row_change_callback=None, narrow_read=False):
+        """ Injects data into several worksheets in parallel. Each
+        worksheet is updated as by Sheet.inject.
+
+        Args:
+            data (dict): Maps each worksheet name to the dictionary of rows
+                to inject into it.
+            row_change_callback (Optional) (func): As for Sheet.inject. It is
+                called from several threads at once.
+            narrow_read (Optional) (bool): As for Sheet.inject.
+
+        Returns:
+            dict: The UpdateResults for each worksheet name.
+        """
+        return self._update_all(data, lambda sheet, rows:
+                                sheet.inject(rows, row_change_callback,
+                                             narrow_read=narrow_read))
+
+    def _update_all(self, data, update):
+        # Opens and updates each worksheet on a thread of the pool shared
+        # with AsyncSheets. If any fail, the first error is raised once the
+        # others have finished.
+        def update_worksheet(worksheet_name):
+            sheet = self.worksheet(worksheet_name)
+            return worksheet_name, update(sheet, data[worksheet_name])
+
+        worksheet_names = list(data)
+        if self.concurrency == 1 or len(worksheet_names) < 2:
+            return dict(update_worksheet(name) for name in worksheet_names)
+
+        def try_update_worksheet(worksheet_name):
+            try:
+                return update_worksheet(worksheet_name), None
+            except Exception, e:
+                return None, e
+
+        logger.info("Updating %s worksheets, %s at a time",
+                    len(worksheet_names), self.concurrency)
+        updates = list(_bounded_imap(_shared_async_pool(), try_update_worksheet,
+                                     worksheet_names, self.concurrency))
+        for result, error in updates:
+            if error is not None:
+                raise error
+        return dict(result for result, error in updates)
+
+
+_async_pool = None
+_async_pool_lock = threading.Lock()
+
+def _shared_async_pool():
+    global _async_pool
+    with _async_pool_lock:
+        if _async_pool is None:
+            _async_pool = ThreadPool(ASYNC_POOL_SIZE)
+        return _async_pool
+
+class AsyncSheet(object):
+    """ A Sheet whose calls run in the background and return a
+    concurrent.futures.Future straight away, so one thread can drive syncs
+    of many worksheets at once. The futures work with concurrent.futures.wait
+    and as_completed (on python 2 from the futures package).
+
+    The Sheet itself is also opened in the background. Calls on one
+    AsyncSheet run one after another, in the order they were made, while
+    calls on different AsyncSheets share a pool of ASYNC_POOL_SIZE threads.
+    The pool threads share clients through the client registry, so their
+    connections are reused from one worksheet to the next.
+
+    This isn't asynchronous I/O: each call holds a pool thread while it
+    waits for google, so at most ASYNC_POOL_SIZE worksheets (or the size of
+    the pool given) are worked on at once, and the rest wait their turn.
+
+    For example:
+
+    >>> sheets = [sheetsync.AsyncSheet(credentials=creds, document_key=key,
+    ...                                worksheet_name=name) for name in names]
+    >>> futures = [sheet.sync(data[sheet.worksheet_name]) for sheet in sheets]
+    >>> results = [future.result() for future in futures]
+
+    Args:
+        *args, **kwargs: The arguments for Sheet.
+        pool (Optional) (ThreadPool): The threads that calls run on. Defaults
+            to a pool shared by all AsyncSheets.
+
+    Attributes:
+        opened (Future): The result is the Sheet, once it's open.
+    """
+    def __init__(self, *args, **kwargs):
+        self.worksheet_name = kwargs.get('worksheet_name')
+        self.pool = kwargs.pop('pool', None) or _shared_async_pool()
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        self._running = False
+        self.opened = self._submit(Sheet, *args, **kwargs)
+
+    def _submit(self, func, *args, **kwargs):
+        # Queues a call, and starts running the queue on a pool thread if it
+        # isn't already.
+        future = futures.Future()
+        with self._lock:
+            self._pending.append((future, func, args, kwargs))
+            if self._running:
+                return future
+            self._running = True
+        self.pool.apply_async(self._run_pending)
+        return future
+
+    def _run_pending(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._running = False
+                    return
+                future, func, args, kwargs = self._pending.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = func(*args, **kwargs)
+            except Exception, e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def _call(self, method, *args, **kwargs):
+        # Calls a method of the Sheet. Fails the same way if it couldn't be
+        # opened.
+        return self._submit(lambda: getattr(self.opened.result(), method)(
+                                                            *args, **kwargs))
+
+    def data(self, as_cells=False):
+        """ Like Sheet.data, but returns a Future. """
+        return self._call('data', as_cells)
+
+    def get(self, key):
+        """ Like Sheet.get, but returns a Future. """
+        return self._call('get', key)
+
+    def get_many(self, keys):
+        """ Like Sheet.get_many, but returns a Future. """
+        return self._call('get_many', keys)
+
+    def sync(self, raw_data, row_change_callback=None):
+        """ Like Sheet.sync, but returns a Future. row_change_callback
+        is called on a pool thread. """
+        return self._call('sync', raw_data, row_change_callback)
+
+    def inject(self, raw_data, row_change_callback=None, narrow_read=False):
+        """ Like Sheet.inject, but returns a Future. row_change_callback
+        is called on a pool thread. """
+        return self._call('inject', raw_data, row_change_callback,
+                          narrow_read=narrow_read)
+
+sys.modules[__name__] = _ExportingModule(sys.modules[__name__])
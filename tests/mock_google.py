@@ -0,0 +1,689 @@
+# -*- coding: utf-8 -*-
+"""
+In-process stand-in for the Google Drive (v2), Spreadsheets (v3 feeds) and
+Sheets (v4 values) APIs, used to test and benchmark sheetsync without a Google account.
+
+The fake services are plugged in at the transport layer: MockHttp replaces
+httplib2.Http for the Drive and Sheets APIs and MockConnection replaces the
+httplib connections that gspread's HTTPSession opens for the spreadsheet
+feeds. Both serve requests from one shared
+MockGoogle instance, which holds the documents and worksheets in memory and
+can add latency or enforce payload limits. For example:
+
+    def test_something(monkeypatch):
+        google = mock_google.install(monkeypatch)
+        sheet = sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                                document_name="Muppets")
+"""
+import json
+import re
+import sys
+import time
+import threading
+import itertools
+import httplib
+from StringIO import StringIO
+from urlparse import urlparse, parse_qs
+from xml.etree import ElementTree
+from xml.etree.ElementTree import Element, SubElement
+
+import httplib2
+
+import sheetsync
+
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+SPREADSHEET_NS = 'http://schemas.google.com/spreadsheets/2006'
+BATCH_NS = 'http://schemas.google.com/gdata/batch'
+
+FEEDS_URL = 'https://spreadsheets.google.com/feeds/'
+DRIVE_URL = 'https://www.googleapis.com/drive/v2/'
+SHEETS_URL = 'https://sheets.googleapis.com/v4/'
+
+def _ns(name):
+    return '{%s}%s' % (ATOM_NS, name)
+
+def _ns1(name):
+    return '{%s}%s' % (SPREADSHEET_NS, name)
+
+def _nsb(name):
+    return '{%s}%s' % (BATCH_NS, name)
+
+def _col_label(col):
+    label = ''
+    while col:
+        col, rem = divmod(col - 1, 26)
+        label = chr(65 + rem) + label
+    return label
+
+def _drive_method(method_id, path, http_method, params=(), body=False):
+    parameters = {}
+    order = []
+    for name in params:
+        if name.startswith('?'):
+            parameters[name[1:]] = {'type': 'string', 'location': 'query'}
+        else:
+            parameters[name] = {'type': 'string', 'location': 'path',
+                                'required': True}
+            order.append(name)
+    method = {'id': method_id, 'path': path, 'httpMethod': http_method,
+              'parameters': parameters, 'parameterOrder': order,
+              'response': {'$ref': 'File'}}
+    if body:
+        method['request'] = {'$ref': 'File'}
+    return method
+
+DRIVE_DISCOVERY_DOC = {
+    'kind': 'discovery#restDescription',
+    'discoveryVersion': 'v1',
+    'id': 'drive:v2',
+    'name': 'drive',
+    'version': 'v2',
+    'protocol': 'rest',
+    'rootUrl': 'https://www.googleapis.com/',
+    'servicePath': 'drive/v2/',
+    'baseUrl': DRIVE_URL,
+    'parameters': {},
+    'schemas': {'File': {'id': 'File', 'type': 'object'}},
+    'resources': {'files': {'methods': {
+        'get': _drive_method('drive.files.get', 'files/{fileId}', 'GET',
+                             ['fileId']),
+        'list': _drive_method('drive.files.list', 'files', 'GET', ['?q']),
+        'insert': _drive_method('drive.files.insert', 'files', 'POST',
+                                body=True),
+        'copy': _drive_method('drive.files.copy', 'files/{fileId}/copy',
+                              'POST', ['fileId'], body=True),
+        'delete': _drive_method('drive.files.delete', 'files/{fileId}',
+                                'DELETE', ['fileId']),
+        }}},
+    }
+
+SHEETS_DISCOVERY_DOC = {
+    'kind': 'discovery#restDescription',
+    'discoveryVersion': 'v1',
+    'id': 'sheets:v4',
+    'name': 'sheets',
+    'version': 'v4',
+    'protocol': 'rest',
+    'rootUrl': 'https://sheets.googleapis.com/',
+    'servicePath': '',
+    'baseUrl': 'https://sheets.googleapis.com/',
+    'parameters': {},
+    'schemas': dict((name, {'id': name, 'type': 'object'}) for name in
+                    ['Spreadsheet', 'BatchUpdateSpreadsheetRequest',
+                     'BatchUpdateSpreadsheetResponse', 'BatchUpdateValuesRequest',
+                     'BatchUpdateValuesResponse']),
+    'resources': {'spreadsheets': {
+      'methods': {
+        'get': {
+            'id': 'sheets.spreadsheets.get',
+            'path': 'v4/spreadsheets/{spreadsheetId}',
+            'httpMethod': 'GET',
+            'parameters': {'spreadsheetId': {'type': 'string',
+                                             'location': 'path',
+                                             'required': True}},
+            'parameterOrder': ['spreadsheetId'],
+            'response': {'$ref': 'Spreadsheet'}},
+        'batchUpdate': {
+            'id': 'sheets.spreadsheets.batchUpdate',
+            'path': 'v4/spreadsheets/{spreadsheetId}:batchUpdate',
+            'httpMethod': 'POST',
+            'parameters': {'spreadsheetId': {'type': 'string',
+                                             'location': 'path',
+                                             'required': True}},
+            'parameterOrder': ['spreadsheetId'],
+            'request': {'$ref': 'BatchUpdateSpreadsheetRequest'},
+            'response': {'$ref': 'BatchUpdateSpreadsheetResponse'}},
+        },
+      'resources': {'values': {'methods': {
+        'batchUpdate': {
+            'id': 'sheets.spreadsheets.values.batchUpdate',
+            'path': 'v4/spreadsheets/{spreadsheetId}/values:batchUpdate',
+            'httpMethod': 'POST',
+            'parameters': {'spreadsheetId': {'type': 'string',
+                                             'location': 'path',
+                                             'required': True}},
+            'parameterOrder': ['spreadsheetId'],
+            'request': {'$ref': 'BatchUpdateValuesRequest'},
+            'response': {'$ref': 'BatchUpdateValuesResponse'}},
+        }}}}},
+    }
+
+def _parse_a1(address):
+    match = re.match(r'([A-Z]+)(\d+)$', address)
+    col = 0
+    for char in match.group(1):
+        col = col * 26 + ord(char) - 64
+    return int(match.group(2)), col
+
+
+class MockCredentials(object):
+    """ Quacks like an OAuth2Credentials object that never expires. """
+    access_token = 'mock-access-token'
+    access_token_expired = False
+    client_id = 'mock-client-id'
+    refresh_token = 'mock-refresh-token'
+
+    def refresh(self, http):
+        pass
+
+    def authorize(self, http):
+        return http
+
+
+class MockWorksheet(object):
+    _sheet_ids = itertools.count()
+
+    def __init__(self, ws_id, title, rows, cols):
+        self.id = ws_id
+        self.sheet_id = next(self._sheet_ids)    # The id used by Sheets v4.
+        self.title = title
+        self.rows = rows
+        self.cols = cols
+        self.cells = {}     # (row, col) -> input value
+        self.version = 1
+        self.touch()
+
+    def touch(self):
+        self.version += 1
+        self.updated = '2014-01-01T00:00:%06.3fZ' % (self.version / 1000.0)
+
+    def display_value(self, row, col):
+        value = self.cells.get((row, col), '')
+        if value.startswith("'"):
+            return value[1:]
+        if value.startswith('='):
+            return ''
+        return value
+
+
+class MockDocument(object):
+    def __init__(self, key, title, parents=None):
+        self.key = key
+        self.title = title
+        self.parents = parents or []
+        self.worksheets = []
+
+    def resource(self):
+        return {'kind': 'drive#file',
+                'id': self.key,
+                'title': self.title,
+                'mimeType': 'application/vnd.google-apps.spreadsheet',
+                'alternateLink': 'https://docs.google.com/spreadsheets/d/%s/edit' % self.key,
+                'parents': self.parents}
+
+
+class MockGoogle(object):
+    """ Holds the state of the fake Google services.
+
+    Args:
+        latency (float): Seconds to sleep before serving each request.
+        max_batch_entries (int): Largest accepted cells batch.
+        max_body_bytes (int): Largest accepted request body.
+        sheets_v4 (bool): Whether the Sheets v4 API is enabled. If it isn't,
+            its requests fail with 403 errors.
+    """
+    def __init__(self, latency=0.0, max_batch_entries=1000,
+                 max_body_bytes=1024*1024, sheets_v4=True):
+        self.latency = latency
+        self.max_batch_entries = max_batch_entries
+        self.max_body_bytes = max_body_bytes
+        self.sheets_v4 = sheets_v4
+        self.documents = {}
+        self.folders = {}
+        self._failures = []
+        self._entry_failures = []
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self.reset_counters()
+
+    def reset_counters(self):
+        """ Zeroes the request counters and clears the request log. """
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.log = []
+
+    def fail_requests(self, count, status=503, retry_after=None, match=None):
+        """ Makes the next count requests fail with the given HTTP status,
+        optionally with a Retry-After header. If match is given only
+        requests whose "METHOD url" starts with it fail. """
+        self._failures.extend([(status, retry_after, match)] * count)
+
+    def fail_batch_entries(self, count, status=503):
+        """ Makes the last count entries of the next cells batch fail with
+        the given status, leaving those cells unchanged. """
+        self._entry_failures.append((count, status))
+
+    def _new_key(self, prefix):
+        return '%s%06d' % (prefix, next(self._ids))
+
+    def create_document(self, title, worksheet_name='Sheet1', rows=100,
+                        cols=20, parents=None):
+        doc = MockDocument(self._new_key('doc'), title, parents)
+        doc.worksheets.append(MockWorksheet('od6', worksheet_name, rows, cols))
+        self.documents[doc.key] = doc
+        return doc
+
+    def load_rows(self, doc, header, rows, worksheet=None, header_row=1):
+        """ Writes a header row and rows of values straight into a worksheet. """
+        wks = worksheet or doc.worksheets[0]
+        for col, name in enumerate(header, 1):
+            wks.cells[(header_row, col)] = name
+        for row, values in enumerate(rows, header_row + 1):
+            for col, value in enumerate(values, 1):
+                if value != '':
+                    wks.cells[(row, col)] = value
+        wks.rows = max(wks.rows, header_row + len(rows))
+        wks.cols = max(wks.cols, len(header))
+        wks.touch()
+        return wks
+
+    # ------------------------------------------------------------------
+    # Transport entry point.
+    # ------------------------------------------------------------------
+    def handle(self, method, url, body=None):
+        """ Serves one request. Returns the status, body and headers of the
+        response. """
+        if self.latency:
+            time.sleep(self.latency)
+        body = body or ''
+        if isinstance(body, unicode):
+            body = body.encode('utf-8')
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += len(body)
+            self.log.append((method, url))
+            headers = {}
+            failure = next((failure for failure in self._failures
+                            if failure[2] is None or
+                            ('%s %s' % (method, url)).startswith(failure[2])),
+                           None)
+            if failure:
+                self._failures.remove(failure)
+                status, retry_after, _ = failure
+                content = 'Injected failure'
+                if retry_after is not None:
+                    headers['retry-after'] = str(retry_after)
+            elif len(body) > self.max_body_bytes:
+                status, content = 413, 'Request Entity Too Large'
+            elif url.startswith(FEEDS_URL):
+                status, content = self._feeds(method, url, body)
+            elif url.startswith(DRIVE_URL):
+                status, content = self._drive(method, url, body)
+            elif url.startswith(SHEETS_URL):
+                status, content = self._sheets(method, url, body)
+            elif 'discovery' in url and '/sheets/' in url:
+                status, content = 200, json.dumps(SHEETS_DISCOVERY_DOC)
+            elif 'discovery' in url:
+                status, content = 200, json.dumps(DRIVE_DISCOVERY_DOC)
+            else:
+                status, content = 404, 'Not Found: %s' % url
+            self.bytes_received += len(content)
+        return status, content, headers
+
+    # ------------------------------------------------------------------
+    # Drive v2.
+    # ------------------------------------------------------------------
+    def _drive(self, method, url, body):
+        parsed = urlparse(url)
+        path = parsed.path[len('/drive/v2/'):].strip('/').split('/')
+        query = parse_qs(parsed.query)
+        resource = json.loads(body) if body else {}
+        if path == ['files'] and method == 'GET':
+            return 200, json.dumps({'items': self._drive_query(query['q'][0])})
+        if path == ['files'] and method == 'POST':
+            return 200, json.dumps(self._drive_insert(resource))
+        key = path[1] if len(path) > 1 else None
+        item = self._drive_item(key)
+        if item is None:
+            return 404, json.dumps({'error': {'code': 404,
+                                    'message': 'File not found: %s' % key}})
+        if len(path) == 3 and path[2] == 'copy':
+            return 200, json.dumps(self._drive_copy(key, resource))
+        if method == 'DELETE':
+            self.documents.pop(key, None)
+            self.folders.pop(key, None)
+            return 204, ''
+        return 200, json.dumps(item)
+
+    def _drive_item(self, key):
+        if key in self.documents:
+            return self.documents[key].resource()
+        return self.folders.get(key)
+
+    def _drive_query(self, q):
+        title = re.search(r"title='((?:[^'\\]|\\.)*)'", q).group(1)
+        title = title.replace("\\'", "'")
+        if 'folder' in q:
+            return [f for f in self.folders.values() if f['title'] == title]
+        return [d.resource() for d in self.documents.values()
+                if d.title == title]
+
+    def _drive_insert(self, resource):
+        parents = resource.get('parents', [])
+        if resource.get('mimeType') == 'application/vnd.google-apps.folder':
+            folder = {'kind': 'drive#file', 'id': self._new_key('folder'),
+                      'title': resource['title'],
+                      'mimeType': resource['mimeType'], 'parents': parents}
+            self.folders[folder['id']] = folder
+            return folder
+        return self.create_document(resource['title'],
+                                    parents=parents).resource()
+
+    def _drive_copy(self, key, resource):
+        source = self.documents[key]
+        doc = MockDocument(self._new_key('doc'), resource['title'],
+                           resource.get('parents', []))
+        for wks in source.worksheets:
+            copy = MockWorksheet(wks.id, wks.title, wks.rows, wks.cols)
+            copy.cells = dict(wks.cells)
+            doc.worksheets.append(copy)
+        self.documents[doc.key] = doc
+        return doc.resource()
+
+    # ------------------------------------------------------------------
+    # Sheets v4 values.
+    # ------------------------------------------------------------------
+    def _sheets(self, method, url, body):
+        if not self.sheets_v4:
+            return 403, json.dumps({'error': {'code': 403,
+                    'message': 'Google Sheets API has not been used in this '
+                               'project before or it is disabled.',
+                    'status': 'PERMISSION_DENIED',
+                    'errors': [{'reason': 'accessNotConfigured'}]}})
+        match = re.match(re.escape(SHEETS_URL) +
+                         r'spreadsheets/([^/:?]+)(/values:batchUpdate|:batchUpdate)?', url)
+        if match is None:
+            return 400, json.dumps({'error': {'code': 400,
+                                              'message': 'Unsupported request'}})
+        doc = self.documents.get(match.group(1))
+        if doc is None:
+            return 404, json.dumps({'error': {'code': 404,
+                    'message': 'Requested entity was not found.'}})
+        if match.group(2) is None and method == 'GET':
+            return 200, json.dumps({'spreadsheetId': doc.key, 'sheets': [
+                {'properties': {'sheetId': wks.sheet_id, 'title': wks.title,
+                                'gridProperties': {'rowCount': wks.rows,
+                                                   'columnCount': wks.cols}}}
+                for wks in doc.worksheets]})
+        if match.group(2) == ':batchUpdate' and method == 'POST':
+            return self._sheets_batch_update(doc, json.loads(body))
+        if match.group(2) != '/values:batchUpdate' or method != 'POST':
+            return 400, json.dumps({'error': {'code': 400,
+                                              'message': 'Unsupported request'}})
+        request = json.loads(body)
+        writes = []
+        for data in request['data']:
+            title, cells = data['range'].rsplit('!', 1)
+            title = title[1:-1].replace("''", "'")
+            wks = next((w for w in doc.worksheets if w.title == title), None)
+            first, last = [_parse_a1(address) for address in cells.split(':')]
+            if wks is None or last[0] > wks.rows or last[1] > wks.cols:
+                return 400, json.dumps({'error': {'code': 400,
+                    'message': 'Unable to parse range: %s' % data['range']}})
+            for row, values in enumerate(data['values'], first[0]):
+                for col, value in enumerate(values, first[1]):
+                    writes.append((wks, row, col, value))
+        for wks, row, col, value in writes:
+            if value:
+                wks.cells[(row, col)] = value
+            else:
+                wks.cells.pop((row, col), None)
+        for wks in set(wks for wks, row, col, value in writes):
+            wks.touch()
+        return 200, json.dumps({'spreadsheetId': doc.key,
+                                'totalUpdatedCells': len(writes)})
+
+    def _sheets_batch_update(self, doc, request):
+        # Only deleting rows is supported.
+        for item in request['requests']:
+            dimension_range = item['deleteDimension']['range']
+            wks = next((w for w in doc.worksheets
+                        if w.sheet_id == dimension_range['sheetId']), None)
+            start, end = dimension_range['startIndex'], dimension_range['endIndex']
+            if (wks is None or dimension_range['dimension'] != 'ROWS' or
+                    not 0 <= start < end <= wks.rows or end - start == wks.rows):
+                return 400, json.dumps({'error': {'code': 400,
+                    'message': 'Invalid requests[0].deleteDimension'}})
+            deleted = end - start
+            cells = {}
+            for (row, col), value in wks.cells.iteritems():
+                if row <= start:
+                    cells[(row, col)] = value
+                elif row > end:
+                    cells[(row - deleted, col)] = value
+            wks.cells = cells
+            wks.rows -= deleted
+            wks.touch()
+        return 200, json.dumps({'spreadsheetId': doc.key,
+                                'replies': [{} for item in request['requests']]})
+
+    # ------------------------------------------------------------------
+    # Spreadsheets v3 feeds.
+    # ------------------------------------------------------------------
+    def _feeds(self, method, url, body):
+        parsed = urlparse(url)
+        path = parsed.path[len('/feeds/'):].strip('/').split('/')
+        query = dict((k, v[0]) for k, v in parse_qs(parsed.query).items())
+        feed_type = path[0]
+        try:
+            if feed_type == 'spreadsheets':
+                return 200, self._spreadsheets_feed()
+            doc = self.documents[path[1]]
+            if feed_type == 'worksheets':
+                if len(path) == 4:
+                    if method == 'POST':
+                        return self._add_worksheet(doc, body)
+                    return 200, self._worksheets_feed(doc)
+                wks = self._find_worksheet(doc, path[4])
+                if method == 'PUT':
+                    return self._resize(doc, wks, body)
+                return 200, self._tostring(self._worksheet_entry(doc, wks))
+            if feed_type == 'cells':
+                wks = self._find_worksheet(doc, path[2])
+                if path[-1] == 'batch':
+                    return self._batch(doc, wks, body)
+                return 200, self._cells_feed(doc, wks, query)
+        except (KeyError, StopIteration), e:
+            return 404, 'Not found: %s' % e
+        return 400, 'Unsupported request'
+
+    def _find_worksheet(self, doc, ws_id):
+        return next(w for w in doc.worksheets if w.id == ws_id)
+
+    def _tostring(self, elem):
+        return ElementTree.tostring(elem, 'utf-8')
+
+    def _spreadsheets_feed(self):
+        feed = Element(_ns('feed'))
+        for doc in self.documents.values():
+            entry = SubElement(feed, _ns('entry'))
+            SubElement(entry, _ns('id')).text = (
+                FEEDS_URL + 'spreadsheets/private/full/' + doc.key)
+            SubElement(entry, _ns('title')).text = doc.title
+            SubElement(entry, _ns('link'), {'rel': 'alternate',
+                'href': 'https://docs.google.com/spreadsheets/d/%s/edit' % doc.key})
+        return self._tostring(feed)
+
+    def _worksheet_entry(self, doc, wks):
+        base = FEEDS_URL + 'worksheets/%s/private/full/%s' % (doc.key, wks.id)
+        entry = Element(_ns('entry'))
+        SubElement(entry, _ns('id')).text = base
+        SubElement(entry, _ns('updated')).text = wks.updated
+        SubElement(entry, _ns('title')).text = wks.title
+        SubElement(entry, _ns('link'), {'rel': 'self', 'href': base})
+        SubElement(entry, _ns('link'), {'rel': 'edit',
+                                        'href': '%s/%s' % (base, wks.version)})
+        SubElement(entry, _ns1('rowCount')).text = str(wks.rows)
+        SubElement(entry, _ns1('colCount')).text = str(wks.cols)
+        return entry
+
+    def _worksheets_feed(self, doc):
+        feed = Element(_ns('feed'))
+        for wks in doc.worksheets:
+            feed.append(self._worksheet_entry(doc, wks))
+        return self._tostring(feed)
+
+    def _add_worksheet(self, doc, body):
+        elem = ElementTree.fromstring(body)
+        wks = MockWorksheet(self._new_key('ws'),
+                            elem.find(_ns('title')).text,
+                            int(elem.find(_ns1('rowCount')).text),
+                            int(elem.find(_ns1('colCount')).text))
+        doc.worksheets.append(wks)
+        return 201, self._tostring(self._worksheet_entry(doc, wks))
+
+    def _resize(self, doc, wks, body):
+        elem = ElementTree.fromstring(body)
+        wks.rows = int(elem.find(_ns1('rowCount')).text)
+        wks.cols = int(elem.find(_ns1('colCount')).text)
+        for (row, col) in wks.cells.keys():
+            if row > wks.rows or col > wks.cols:
+                del wks.cells[(row, col)]
+        wks.touch()
+        return 200, self._tostring(self._worksheet_entry(doc, wks))
+
+    def _cell_entry(self, parent, base, wks, row, col):
+        cell_id = 'R%sC%s' % (row, col)
+        entry = SubElement(parent, _ns('entry'))
+        SubElement(entry, _ns('id')).text = '%s/%s' % (base, cell_id)
+        SubElement(entry, _ns('title')).text = '%s%s' % (_col_label(col), row)
+        SubElement(entry, _ns('link'), {'rel': 'edit',
+            'type': 'application/atom+xml',
+            'href': '%s/%s/%s' % (base, cell_id, wks.version)})
+        attrs = {'row': str(row), 'col': str(col),
+                 'inputValue': wks.cells.get((row, col), '')}
+        SubElement(entry, _ns1('cell'), attrs).text = (
+            wks.display_value(row, col) or None)
+
+    def _cells_feed(self, doc, wks, query):
+        if 'range' in query:
+            raise KeyError('range queries are not supported')
+        min_row = int(query.get('min-row', 1))
+        max_row = min(int(query.get('max-row', wks.rows)), wks.rows)
+        min_col = int(query.get('min-col', 1))
+        max_col = min(int(query.get('max-col', wks.cols)), wks.cols)
+        return_empty = query.get('return-empty') == 'true'
+        base = FEEDS_URL + 'cells/%s/%s/private/full' % (doc.key, wks.id)
+        feed = Element(_ns('feed'))
+        SubElement(feed, _ns('updated')).text = wks.updated
+        for row in xrange(min_row, max_row + 1):
+            for col in xrange(min_col, max_col + 1):
+                if return_empty or wks.cells.get((row, col)):
+                    self._cell_entry(feed, base, wks, row, col)
+        return self._tostring(feed)
+
+    def _batch(self, doc, wks, body):
+        feed = ElementTree.fromstring(body)
+        entries = feed.findall(_ns('entry'))
+        if len(entries) > self.max_batch_entries:
+            return 413, 'Too many batch entries: %s' % len(entries)
+        failures, failure_status = 0, None
+        if self._entry_failures:
+            failures, failure_status = self._entry_failures.pop(0)
+        response = Element(_ns('feed'))
+        for ix, entry in enumerate(entries):
+            cell = entry.find(_ns1('cell'))
+            row, col = int(cell.get('row')), int(cell.get('col'))
+            out = SubElement(response, _ns('entry'))
+            SubElement(out, _nsb('id')).text = entry.find(_nsb('id')).text
+            if row > wks.rows or col > wks.cols:
+                SubElement(out, _nsb('status'), {'code': '400',
+                                                 'reason': 'Out of range'})
+                continue
+            if ix >= len(entries) - failures:
+                SubElement(out, _nsb('status'), {'code': str(failure_status),
+                                                 'reason': 'Injected failure'})
+                continue
+            value = cell.get('inputValue')
+            if value:
+                wks.cells[(row, col)] = value
+            else:
+                wks.cells.pop((row, col), None)
+            SubElement(out, _nsb('status'), {'code': '200',
+                                             'reason': 'Success'})
+        wks.touch()
+        return 200, self._tostring(response)
+
+
+class MockResponse(object):
+    def __init__(self, status, content, headers=None):
+        self.status = status
+        self._content = StringIO(content)
+        self._headers = headers or {}
+
+    def read(self, size=-1):
+        return self._content.read(size)
+
+    def getheader(self, name, default=None):
+        return self._headers.get(name.lower(), default)
+
+    def getheaders(self):
+        return self._headers.items()
+
+
+class MockConnection(object):
+    """ Replacement for httplib's HTTP(S)Connection, as used by gspread's
+    HTTPSession. """
+    def __init__(self, google, host, *args, **kwargs):
+        self.google = google
+        self.host = host
+        self._response = None
+
+    def request(self, method, url, body=None, headers=None):
+        self._response = MockResponse(*self.google.handle(method, url, body))
+
+    def getresponse(self):
+        response, self._response = self._response, None
+        return response
+
+    def close(self):
+        pass
+
+
+class MockHttp(object):
+    """ Replacement for httplib2.Http. """
+    def __init__(self, google, *args, **kwargs):
+        self.google = google
+
+    def request(self, uri, method='GET', body=None, headers=None,
+                redirections=5, connection_type=None):
+        status, content, headers = self.google.handle(method, uri, body)
+        headers['status'] = status
+        return httplib2.Response(headers), content
+
+
+def patch_sleep(monkeypatch, fake):
+    """ Makes sheetsync's calls to time.sleep call fake instead. Other
+    callers, like the threads managing sheetsync's pools, still sleep. """
+    sleep = time.sleep
+
+    def patched(seconds):
+        if sys._getframe(1).f_globals.get('__name__') == 'sheetsync':
+            return fake(seconds)
+        return sleep(seconds)
+    monkeypatch.setattr(time, 'sleep', patched)
+
+
+def install(monkeypatch=None, google=None):
+    """ Routes all sheetsync traffic to a MockGoogle instance.
+
+    Args:
+        monkeypatch (Optional): A pytest monkeypatch fixture, so that the
+            patches are undone after the test. If omitted the patches stay
+            in place for the rest of the process, as benchmarks want.
+        google (Optional) (MockGoogle): The fake services to use. A new one is
+            created if this isn't given.
+
+    Returns:
+        MockGoogle: The fake services that requests are routed to.
+    """
+    google = google or MockGoogle()
+    patch = monkeypatch.setattr if monkeypatch else setattr
+    patch(httplib2, 'Http', lambda *args, **kwargs: MockHttp(google))
+    for name in ('HTTPConnection', 'HTTPSConnection'):
+        patch(httplib, name,
+              lambda *args, **kwargs: MockConnection(google, *args, **kwargs))
+    # Clients shared by earlier Sheets would still talk to the old services.
+    patch(sheetsync, 'shared_clients', sheetsync.ClientRegistry())
+    return google
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for batching cell updates. These don't need a google account.
+"""
+import threading
+import sheetsync
+import gspread
+
+class FakeCell(object):
+    def __init__(self, value):
+        self.value = value
+
+def test_too_large_batches_are_split():
+    print ('A batch rejected as too large is split until it is accepted.')
+    sent = []
+    def send_batch(cells):
+        if len(cells) > 100:
+            raise gspread.exceptions.HTTPError("413: Request Entity Too Large")
+        sent.extend(cells)
+        return len(cells)
+
+    writer = sheetsync.BatchWriter(send_batch)
+    cells = [FakeCell(str(i)) for i in range(500)]
+    writer.submit(cells)
+    writer.join()
+    assert sent == cells
+    assert writer.batch_size <= 100
+    assert any(stats.error for stats in writer.stats)
+
+def test_parallel_writer_reports_first_error():
+    print ('Errors from background batches are raised by join, in order.')
+    def send_batch(cells):
+        if cells[0].value != 'ok':
+            raise ValueError(cells[0].value)
+        return 1
+
+    writer = sheetsync.BatchWriter(send_batch, concurrency=3)
+    writer.submit([FakeCell('ok')])
+    writer.submit([FakeCell('first')])
+    try:
+        writer.join()
+    except ValueError, e:
+        assert str(e) == 'first'
+    else:
+        assert False, "join should raise the batch error"
+
+def test_writer_back_pressure():
+    print ('submit returns while batches are sent, until too many are waiting.')
+    release = threading.Event()
+    lock = threading.Lock()
+    sending = [0, 0]    # Batches being sent now, and the most at once.
+    def send_batch(cells):
+        with lock:
+            sending[0] += 1
+            sending[1] = max(sending)
+        release.wait(10)
+        with lock:
+            sending[0] -= 1
+        return len(cells)
+
+    writer = sheetsync.BatchWriter(send_batch, concurrency=2, max_pending=2)
+    for i in range(4):
+        writer.submit([FakeCell(str(i))])
+    blocked = threading.Thread(target=writer.submit, args=([FakeCell('4')],))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+    release.set()
+    blocked.join(10)
+    writer.join()
+    assert len(writer.stats) == 5 and sending == [0, 2]
+
+def test_entry_size_estimate():
+    print ('Long values and escaped characters make bigger batch entries.')
+    short = sheetsync._estimate_entry_bytes(FakeCell(u'x'))
+    assert sheetsync._estimate_entry_bytes(FakeCell(u'x' * 101)) == short + 100
+    assert sheetsync._estimate_entry_bytes(FakeCell(u'<x>')) > short + 2
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the row diff used when syncing. These don't need a google account.
+"""
+import random
+import pytest
+import sheetsync
+
+def row_differences(raw_row, sheet_row):
+    # The fields of one row that differ, found a field at a time.
+    return [header for header, raw_value in raw_row.items()
+            if not sheetsync.google_equivalent(raw_value,
+                                               sheet_row.get(header, u""))]
+
+def test_row_differences():
+    print ('Only fields that would change in the sheet are reported.')
+    sheet_row = {'Name': u'Kermit', 'Color': u'Green', 'Born': u'5/9/1955'}
+    raw_rows = [{'Name': u'Kermit '},
+                {'Born': u'1955-05-09'},
+                {'Color': u'Blue', 'Name': u'Kermit'},
+                {'Voice': u'Jim Henson'}]
+    assert sheetsync.bulk_row_differences(raw_rows, [sheet_row] * 4) == \
+           [[], [], ['Color'], ['Voice']]
+
+PIECES = [u'a', u'Kermit', u'B', u' ', u'  ', u'\t', u'\n', u'\r\n', u'\r',
+          u'\x0b', u'\x85', u' ', u'/', u'-', u':', u'.', u'0', u'1',
+          u'12', u'31', u'2014', u'99', u'\xe9', u'Jan', u'PM', 'x', '\n',
+          u'\x1c', '\x1c', '\t']
+
+# Equal str and unicode values that split into lines differently.
+MIXED_PAIRS = [('\x1c', u'\n'), (u'\x1c', u'\n'),
+               (u'\x1c', u'\t\x1c'), ('\x1c', u'\t\x1c')]
+
+def random_text(rng):
+    if rng.random() < 0.4:
+        month, day, year = rng.randint(0, 14), rng.randint(0, 33), rng.randint(0, 2100)
+        text = rng.choice([u'%s/%s/%s' % (month, day, year),
+                           u'%02d/%02d/%04d' % (month, day, year),
+                           u'%04d-%02d-%02d' % (year, month, day),
+                           u'%s %s %s' % (rng.choice([u'Jan', u'May']), day, year),
+                           u'%s/%s' % (month, day)])
+    else:
+        text = u''.join(rng.choice(PIECES) for i in range(rng.randint(0, 6)))
+    if rng.random() < 0.3:
+        text = rng.choice([u' ', u'\t', u'']) + text + rng.choice([u' ', u'\n', u''])
+    return text
+
+def similar_text(rng, text):
+    # Often a variation that google might consider equal.
+    choice = rng.random()
+    if choice < 0.3:
+        return text
+    if choice < 0.6:
+        return u' %s\t' % text.replace(u' ', u'\t')
+    if choice < 0.75:
+        return text.lstrip(u'0').replace(u'/0', u'/')
+    if choice < 0.8:
+        # Too large for dateutil, which raises OverflowError.
+        return u'99999999999999999999'
+    return random_text(rng)
+
+def scalar_results(pairs):
+    results = []
+    for text1, text2 in pairs:
+        try:
+            results.append(sheetsync.google_equivalent(text1, text2))
+        except Exception, e:
+            results.append(type(e))
+    return results
+
+def test_equivalent_columns_match_scalar():
+    print ('google_equivalent_columns decides every pair as google_equivalent does.')
+    rng = random.Random(2014)
+    for trial in range(20):
+        pairs = []
+        for i in range(500):
+            text1 = random_text(rng)
+            pairs.append((text1, similar_text(rng, text1)))
+        pairs.extend(MIXED_PAIRS)
+        expected = scalar_results(pairs)
+        assert True in expected and False in expected
+
+        values = [(pair, result) for pair, result in zip(pairs, expected)
+                                 if result in (True, False)]
+        for date_column in (None, True, False):
+            assert sheetsync.google_equivalent_columns(
+                        [text1 for (text1, text2), result in values],
+                        [text2 for (text1, text2), result in values],
+                        date_column) == [result for pair, result in values]
+
+        for (text1, text2), result in zip(pairs, expected):
+            if result not in (True, False):
+                for date_column in (True, False):
+                    with pytest.raises(result):
+                        sheetsync.google_equivalent_columns([text1], [text2],
+                                                            date_column)
+
+def test_bulk_row_differences():
+    print ('bulk_row_differences matches google_equivalent field by field.')
+    rng = random.Random(1955)
+    headers = ['Name', 'Born', 'Notes', 'Voice']
+    raw_rows, sheet_rows = [], []
+    for i in range(2000):
+        sheet_row = dict((header, random_text(rng)) for header in headers)
+        raw_row = dict((header, similar_text(rng, value))
+                       for header, value in sheet_row.items()
+                       if rng.random() < 0.8)
+        try:
+            row_differences(raw_row, sheet_row)
+        except Exception:
+            continue
+        raw_rows.append(raw_row)
+        sheet_rows.append(sheet_row)
+    assert sheetsync.bulk_row_differences(raw_rows, sheet_rows) == \
+           [row_differences(raw_row, sheet_row)
+            for raw_row, sheet_row in zip(raw_rows, sheet_rows)]
+
+def test_date_cache():
+    print ('The date cache keeps recently used dates, and only dates.')
+    cache = sheetsync.DateCache(maxsize=4)
+    assert cache.google_date(u'1/5/2014').year == 2014
+    assert cache.google_date(u'2014-01-05') is False
+    assert cache.parse(u'2014-01-05') == cache.parse(u'1/5/2014')
+    assert cache.parse(u'Kermit') is sheetsync._UNPARSEABLE
+    # Text not shaped like a google date isn't looked up, and only dates are
+    # kept.
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (0, 4, 2)
+    cache.parse(u'Kermit')
+    cache.google_date(u'1/5/2014')
+    cache.parse(u'2014-01-05')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (2, 5)
+    assert abs(stats['hit_rate'] - 2 / 7.0) < 1e-9
+
+    # '1/5/2014' is used again after newer dates arrive, so it outlasts
+    # '2014-01-05'.
+    cache.google_date(u'1/6/2014')
+    assert cache.google_date(u'1/5/2014')
+    cache.google_date(u'1/7/2014')
+    assert cache.stats()['size'] <= 4
+    hits = cache.stats()['hits']
+    cache.google_date(u'1/5/2014')
+    cache.parse(u'2014-01-05')
+    assert cache.stats()['hits'] == hits + 1
+
+def test_date_cache_midnight(monkeypatch):
+    print ('The date cache empties at midnight, but keeps its statistics.')
+    cache = sheetsync.DateCache()
+    cache.google_date(u'1/5/2014')
+    cache.google_date(u'1/5/2014')
+    monkeypatch.setattr(cache, '_expires', 0)
+    cache.google_date(u'1/6/2014')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 2, 1)
+    assert cache._expires > 0
+
+def test_date_columns():
+    print ('Columns of dates are recognized from a sample of their values.')
+    assert sheetsync._is_date_column([u'1/5/2014', u'', u'12/31/1999 '] * 10)
+    assert not sheetsync._is_date_column([u'1/5/2014', u'Kermit'] * 10)
+    assert not sheetsync._is_date_column([u''] * 10)
+    assert sheetsync.google_equivalent_columns(
+                [u'2014-01-05', u' 1/5/2014', u'Jan 6 2014', u''],
+                [u'1/5/2014', u'01/05/2014', u'1/5/2014', u' ']) == \
+           [True, True, False, False]
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the key to row number index. These don't need a google account.
+"""
+import sheetsync
+
+def test_key_index_maintenance():
+    print ('Rows can be added, re-keyed and removed from the index.')
+    index = sheetsync.KeyIndex()
+    index.clear(['Key'])
+    index.add(('Kermit',), 2)
+    index.add(('Miss Piggy',), 3)
+    assert index.row_for(('Kermit',)) == 2
+    assert index.key_for(3) == ('Miss Piggy',)
+
+    # Flagging a row for deletion changes its key.
+    index.add(('Kermit (DELETED)',), 2)
+    assert ('Kermit',) not in index
+    assert index.row_for(('Kermit (DELETED)',)) == 2
+
+    index.remove_row(3)
+    assert ('Miss Piggy',) not in index
+    assert len(index) == 1
+
+def test_key_index_is_current():
+    print ('The index is only trusted for the worksheet version it was stamped with.')
+    index = sheetsync.KeyIndex()
+    index.clear(['Key'])
+    assert not index.is_current(['Key'], '2014-06-01T12:00:00.000Z')
+    index.updated = '2014-06-01T12:00:00.000Z'
+    assert index.is_current(['Key'], '2014-06-01T12:00:00.000Z')
+    assert not index.is_current(['Key'], '2014-06-02T12:00:00.000Z')
+    assert not index.is_current(['Name'], '2014-06-01T12:00:00.000Z')
+
+def test_key_index_delete_rows():
+    print ('Deleting rows moves the rows below them up.')
+    index = sheetsync.KeyIndex()
+    index.clear(['Key'])
+    for row_num in range(2, 10):
+        index.add(('row %s' % row_num,), row_num)
+    index.delete_rows([3, 4, 7])
+    assert ('row 3',) not in index and ('row 7',) not in index
+    assert [index.key_for(row_num) for row_num in range(2, 7)] == [
+        ('row 2',), ('row 5',), ('row 6',), ('row 8',), ('row 9',)]
+    assert index.row_for(('row 9',)) == 6
+    assert index.key_for(7) is None
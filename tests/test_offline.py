@@ -0,0 +1,902 @@
+# -*- coding: utf-8 -*-
+"""
+End to end tests against the in-process mock of the Google APIs. These don't
+need a google account.
+"""
+import sheetsync
+import pytest
+import threading
+from concurrent import futures
+from tests import mock_google
+
+def make_data(rows, **extra):
+    data = dict((str(i), {'Color': 'color %s' % i, 'Performer': 'name %s' % i})
+                for i in range(rows))
+    for key, row in extra.items():
+        data[key] = row
+    return data
+
+def expected(data):
+    return dict((key, dict(row, Key=key)) for key, row in data.items())
+
+def new_sheet(**kwargs):
+    kwargs.setdefault('key_column_headers', ['Key'])
+    return sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                           document_name="Muppets", **kwargs)
+
+def test_sync_inject_and_delete(monkeypatch):
+    print ('Add, change, flag and delete rows on a new spreadsheet.')
+    mock_google.install(monkeypatch)
+    sheet = new_sheet()
+    data = make_data(50)
+    result = sheet.sync(data)
+    assert result.added == 50
+    assert sheet.data() == expected(data)
+
+    data['3']['Color'] = 'changed'
+    del data['7']
+    result = sheet.sync(data)
+    assert (result.changed, result.deleted, result.nochange) == (1, 1, 48)
+    rows = sheet.data()
+    assert rows['3']['Color'] == 'changed'
+    assert '7 (DELETED)' in rows
+
+    sheet.flag_delete_mode = False
+    del data['9']
+    result = sheet.sync(data)
+    assert result.deleted == 2
+    rows = sheet.data()
+    assert '9' not in rows and '7 (DELETED)' not in rows
+
+    result = sheet.inject({'new': {'Hat': 'Fez'}})
+    assert result.added == 1
+    assert sheet.data()['new'] == {'Key': 'new', 'Hat': 'Fez',
+                                   'Color': '', 'Performer': ''}
+
+    reopened = sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                               document_key=sheet.document_key)
+    assert reopened.data() == sheet.data()
+
+def test_data_returns_dicts(monkeypatch):
+    print ('data() and get_many() return independent, picklable dictionaries.')
+    import pickle
+    mock_google.install(monkeypatch)
+    sheet = new_sheet()
+    sheet.sync(make_data(3))
+    rows = sheet.data()
+    assert all(type(row) is dict for row in rows.values())
+    assert pickle.loads(pickle.dumps(rows)) == rows
+    rows['0']['New'] = 'value'
+    assert 'New' not in rows['1']
+    assert type(sheet.get('2')) is dict
+
+def test_row_change_callback_gets_dicts(monkeypatch):
+    print ('Row change callbacks get plain dictionaries that can be stored.')
+    import json
+    mock_google.install(monkeypatch)
+    sheet = new_sheet(flag_deletes=False)
+    data = make_data(5)
+    sheet.sync(data)
+    calls = []
+    def callback(key_tuple, before, after, fields):
+        calls.append(json.dumps([before, after]))
+    data['1']['Color'] = 'changed'
+    del data['2']
+    sheet.sync(data, row_change_callback=callback)
+    sheet.flag_delete_mode = True
+    del data['3']
+    sheet.sync(data, row_change_callback=callback)
+    befores = [json.loads(call)[0] for call in calls]
+    assert len(calls) == 3 and all(type(before) is dict for before in befores)
+    assert sorted(before['Key'] for before in befores) == ['1', '2', '3']
+
+def test_paged_and_concurrent_reads(monkeypatch):
+    print ('Paged and parallel reads return the same rows as a single read.')
+    google = mock_google.install(monkeypatch)
+    sheet = new_sheet()
+    data = make_data(250)
+    sheet.sync(data)
+    for page_rows, concurrency in [(7, 1), (None, 4), (13, 3), (1000, 5)]:
+        sheet.read_page_rows = page_rows
+        sheet.read_concurrency = concurrency
+        google.reset_counters()
+        assert sheet.data() == expected(data)
+    sheet.read_page_rows, sheet.read_concurrency = 7, 1
+    google.reset_counters()
+    sheet.data()
+    # The worksheet entry, then 250 rows in pages of 7.
+    assert google.requests == 1 + 36
+
+def test_read_concurrency_limit(monkeypatch):
+    print ('No more than read_concurrency pages are requested at once.')
+    google = mock_google.install(monkeypatch)
+    sheet = new_sheet()
+    data = make_data(120)
+    sheet.sync(data)
+
+    class InFlight(sheetsync.RequestHook):
+        def __init__(self):
+            self.lock = threading.Lock()
+            self.current = self.most = 0
+
+        def before_request(self, operation, params):
+            if operation == 'cells.list':
+                with self.lock:
+                    self.current += 1
+                    self.most = max(self.most, self.current)
+
+        def after_request(self, operation, params, *args):
+            if operation == 'cells.list':
+                with self.lock:
+                    self.current -= 1
+
+    hook = InFlight()
+    sheet.request_hooks.append(hook)
+    google.latency = 0.02
+    sheet.read_page_rows, sheet.read_concurrency = 5, 3
+    assert sheet.data() == expected(data)
+    assert 1 < hook.most <= 3
+
+def test_streamed_reads(monkeypatch):
+    print ('Cells are handed on as each page arrives, not after the whole read.')
+    google = mock_google.install(monkeypatch)
+    mock_google.patch_sleep(monkeypatch, lambda seconds: None)
+    sheet = new_sheet(read_page_rows=10)
+    data = make_data(100)
+    sheet.sync(data)
+    del google.log[:]
+    cells = sheet._iter_cell_feed(row=2)
+    assert next(cells).row == 2
+    assert len([url for method, url in google.log
+                if method == 'GET' and '/feeds/cells/' in url]) == 1
+    assert len(list(cells)) == 3 * 100 - 1
+
+    # A page that fails before its first cell is read again.
+    google.fail_requests(1, status=503,
+                         match='GET ' + mock_google.FEEDS_URL + 'cells')
+    assert sheet.data() == expected(data)
+
+def test_parallel_writes_and_batch_limits(monkeypatch):
+    print ('Batches sent in parallel are split when google rejects them.')
+    google = mock_google.install(monkeypatch)
+    sheet = new_sheet(write_concurrency=4, range_writes=False)
+    data = make_data(700)
+    data['1']['Performer'] = u'Fran\xe7ois'
+    assert sheet.sync(data).added == 700
+    assert sheet.data() == expected(data)
+
+    google.max_batch_entries = 100
+    for row in data.values():
+        row['Color'] = 'x'
+    assert sheet.sync(data).changed == 700
+    assert sheet.data() == expected(data)
+    assert any(stats.error for stats in sheet.batch_stats)
+    assert sheet._batch_writer.batch_size <= 100
+
+    google.max_batch_entries = 1000
+    google.max_body_bytes = 20000
+    for row in data.values():
+        row['Color'] = 'y' * 1000
+    sheet.sync(data)
+    assert sheet.data() == expected(data)
+
+def test_pool_threads_keep_their_clients(monkeypatch):
+    print ('Parallel reads and writes reuse pool threads, and their clients.')
+    import gspread
+    google = mock_google.install(monkeypatch)
+    sessions = []
+    session_class = gspread.client.HTTPSession
+    monkeypatch.setattr(gspread.client, 'HTTPSession',
+                        lambda: sessions.append(1) or session_class())
+    sheet = new_sheet(read_page_rows=10, read_concurrency=4,
+                      write_concurrency=4, range_writes=False)
+    data = make_data(100)
+    for i in range(6):
+        for row in data.values():
+            row['Color'] = 'color %s' % i
+        sheet.sync(data)
+        assert sheet.data() == expected(data)
+    # At most one per pool thread, and one for the calling thread.
+    assert len(sessions) <= sheetsync.WORKER_POOL_SIZE + 1
+
+def test_key_index(monkeypatch):
+    print ('Repeated injects only read the rows they change.')
+    google = mock_google.install(monkeypatch)
+    sheet = new_sheet()
+    data = make_data(200)
+    sheet.sync(data)
+
+    google.reset_counters()
+    full_reads = []
+    data_method = sheet.data
+    sheet.data = lambda *args, **kwargs: (full_reads.append(1) or
+                                          data_method(*args, **kwargs))
+    result = sheet.inject({'5': {'Color': 'five'}, 'new': {'Color': 'n'}})
+    del sheet.data
+    assert (result.changed, result.added) == (1, 1)
+    assert not full_reads
+    rows = sheet.data()
+    assert rows['5']['Color'] == 'five' and rows['new']['Color'] == 'n'
+    assert sheet.key_index.row_for(('new',)) == 202
+
+    # An edit by someone else moves rows, so the index is rebuilt.
+    wks = google.documents[sheet.document_key].worksheets[0]
+    row = sheet.key_index.row_for(('5',))
+    wks.cells[(row, 1)], wks.cells[(row + 1, 1)] = (wks.cells[(row + 1, 1)],
+                                                    wks.cells[(row, 1)])
+    wks.touch()
+    result = sheet.inject({'5': {'Color': 'again'}})
+    assert (result.changed, result.added) == (1, 0)
+    assert sheet.data()['5']['Color'] == 'again'
+    assert sheet.key_index.row_for(('5',)) == row + 1
+
+def test_get_many(monkeypatch):
+    print ('Point reads fetch the key columns and then just the rows needed.')
+    google = mock_google.install(monkeypatch)
+    sheet = new_sheet()
+    sheet.sync(make_data(300))
+    reopened = sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                               document_key=sheet.document_key)
+    google.reset_counters()
+    assert reopened.get('17') == {'Key': '17', 'Color': 'color 17',
+                                  'Performer': 'name 17'}
+    assert google.requests == 2
+    assert reopened.get('Gonzo') is None
+
+    rows = reopened.get_many(['3', '200', 'Gonzo'])
+    assert sorted(rows) == ['200', '3']
+    assert rows['200']['Performer'] == 'name 200'
+
+    # With a current key index only the updated timestamp and rows are read.
+    google.reset_counters()
+    rows = sheet.get_many(['3', '200'])
+    assert rows['3']['Color'] == 'color 3'
+    assert google.requests == 3
+
+def test_get_many_reads_runs_of_rows(monkeypatch):
+    print ('Adjacent rows asked for together are read with one request.')
+    google = mock_google.install(monkeypatch)
+    sheet = new_sheet()
+    data = make_data(300)
+    sheet.sync(data)
+    rows = dict((key, sheet.key_index.row_for((key,))) for key in data)
+    keys = sorted(data, key=rows.get)
+    reopened = sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                               document_key=sheet.document_key)
+
+    def cell_reads():
+        return [url for method, url in google.log
+                if method == 'GET' and '/feeds/cells/' in url]
+
+    del google.log[:]
+    wanted = keys[100:120] + keys[200:205]
+    result = reopened.get_many(wanted)
+    assert result == dict((key, expected(data)[key]) for key in wanted)
+    # The key columns, then one read for each run of rows.
+    assert len(cell_reads()) == 1 + 2
+
+def test_get_many_reads_only_key_columns(monkeypatch):
+    print ('Key columns with others between them are read separately.')
+    google = mock_google.install(monkeypatch)
+    sheet = new_sheet()
+    data = make_data(50)
+    for key, row in data.items():
+        row['Notes'] = 'notes %s' % key
+    sheet.sync(data)
+    notes_col = sheet.header.header_lookup('Notes')
+    assert notes_col > 2
+    reopened = sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                               document_key=sheet.document_key,
+                               key_column_headers=['Key', 'Notes'])
+
+    del google.log[:]
+    rows = reopened.get_many([('7', 'notes 7'), ('7', 'notes 8')])
+    assert rows.keys() == [('7', 'notes 7')]
+    assert rows[('7', 'notes 7')]['Performer'] == 'name 7'
+    key_reads = [url for method, url in google.log
+                 if '/feeds/cells/' in url and 'min-row=2&' in url + '&']
+    assert len(key_reads) == 2
+    assert 'min-col=1&' in key_reads[0] + '&'
+    assert 'max-col=1&' in key_reads[0] + '&'
+    assert 'min-col=%s&' % notes_col in key_reads[1] + '&'
+    assert 'max-col=%s&' % notes_col in key_reads[1] + '&'
+
+def test_narrow_inject(monkeypatch):
+    print ('A narrow inject only downloads the columns it needs.')
+    google = mock_google.install(monkeypatch)
+    sheet = new_sheet(protected_fields=['Notes'])
+    columns = ['Column %02d' % col for col in range(30)]
+    data = dict((str(i), dict((col, '%s %s' % (col, i)) for col in columns))
+                for i in range(100))
+    data['1']['Notes'] = 'keep'
+    sheet.sync(data)
+
+    reopened = sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                               document_key=sheet.document_key,
+                               protected_fields=['Notes'])
+    google.reset_counters()
+    result = reopened.inject({'1': {'Column 05': 'x', 'Notes': 'overwrite'},
+                              '2': {'Column 05': 'y', 'Notes': 'fill'},
+                              '3': {'Column 05': 'Column 05 3'},
+                              'new': {'Column 07': 'n'}}, narrow_read=True)
+    assert (result.changed, result.nochange, result.added) == (2, 1, 1)
+    narrow_bytes = google.bytes_received
+
+    google.reset_counters()
+    rows = reopened.data()
+    assert narrow_bytes * 5 < google.bytes_received
+    assert rows['1']['Column 05'] == 'x' and rows['1']['Notes'] == 'keep'
+    assert rows['2']['Notes'] == 'fill' and rows['2']['Column 06'] == 'Column 06 2'
+    assert rows['new']['Column 07'] == 'n'
+    assert len(rows) == 101
+
+def test_narrow_inject_formulas(monkeypatch):
+    print ('A narrow inject keeps the formula reference row out of the data.')
+    google = mock_google.install(monkeypatch)
+    sheet = new_sheet(formula_ref_row_ix=2)
+    data = make_data(10)
+    sheet.sync(data)
+    wks = google.documents[sheet.document_key].worksheets[0]
+    wks.cells[(1, 4)] = 'Total'
+    wks.cells[(2, 4)] = '=LEN(B2)'
+    wks.touch()
+
+    reopened = sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                               document_key=sheet.document_key,
+                               key_column_headers=['Key'], formula_ref_row_ix=2)
+    result = reopened.inject({'3': {'Color': 'changed'},
+                              'new': {'Color': 'n'}}, narrow_read=True)
+    assert (result.changed, result.added) == (1, 1)
+    new_row = reopened.key_index.row_for(('new',))
+    assert new_row == 3 + len(data)
+    assert wks.cells[(new_row, 4)] == '=LEN(B2)'
+    assert wks.cells[(2, 4)] == '=LEN(B2)'
+    rows = reopened.data()
+    assert len(rows) == len(data) + 1 and rows['3']['Color'] == 'changed'
+
+def test_insert_without_reading_empty_rows(monkeypatch):
+    print ('New rows are written by address, without reading the empty cells.')
+    google = mock_google.install(monkeypatch)
+    sheet = new_sheet()
+    sheet.sync(make_data(1))
+    google.reset_counters()
+    data = make_data(50)
+    result = sheet.sync(data)
+    assert result.added == 49
+    # The header row and the worksheet's rows are the only cells read.
+    assert len([url for method, url in google.log
+                if method == 'GET' and '/feeds/cells/' in url]) == 2
+    assert sheet.data() == expected(data)
+
+    # A narrow read doesn't see a row holding only a value in another
+    # column, so it mustn't be written over.
+    wks = google.documents[sheet.document_key].worksheets[0]
+    performer = sheet.header.header_lookup('Performer')
+    wks.cells[(52, performer)] = 'stray'
+    wks.rows = max(wks.rows, 52)
+    wks.touch()
+    result = sheet.inject({'new': {'Color': 'c'}}, narrow_read=True)
+    assert result.added == 1
+    assert wks.cells[(52, performer)] == 'stray'
+    assert sheet.data()['new'] == {'Key': 'new', 'Color': 'c', 'Performer': ''}
+
+def test_new_headers_written_by_address(monkeypatch):
+    print ('New headers fill the empty header cells without reading them.')
+    google = mock_google.install(monkeypatch)
+    sheet = new_sheet()
+    sheet.sync(make_data(3))
+    wks = google.documents[sheet.document_key].worksheets[0]
+    del wks.cells[(1, sheet.header.header_lookup('Color'))]
+    wks.touch()
+
+    reopened = sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                               document_key=sheet.document_key,
+                               key_column_headers=['Key'])
+    google.reset_counters()
+    reopened.inject({'1': {'Hat': 'Fez', 'Scarf': 'Red'}})
+    header_reads = [url for method, url in google.log if method == 'GET' and
+                    '/feeds/cells/' in url and 'max-row=1&' in url + '&']
+    assert len(header_reads) == 1 and 'return-empty' not in header_reads[0]
+    assert reopened.header.col_lookup(2) == 'Hat'
+    assert reopened.data()['1'] == {'Key': '1', 'Hat': 'Fez', 'Scarf': 'Red',
+                                    'Performer': 'name 1'}
+
+def test_range_writes(monkeypatch):
+    print ('Blocks of cells are written as ranges, scattered cells one by one.')
+    google = mock_google.install(monkeypatch)
+    sheet = new_sheet(range_writes=True)
+    data = make_data(300)
+    writes = lambda: [url.split('?')[0].rsplit('/', 1)[-1]
+                      for method, url in google.log if method == 'POST']
+    google.reset_counters()
+    assert sheet.sync(data).added == 300
+    # One for the new headers and one for the rows.
+    assert writes() == ['values:batchUpdate'] * 2
+    assert google.bytes_sent < 300 * 3 * 50
+    assert sheet.data() == expected(data)
+
+    data['5']['Color'] = 'changed'
+    data['9']['Performer'] = "it's"
+    for key in ('20', '21', '22'):
+        data[key]['Color'] = 'block'
+    del data['40']
+    sheet.flag_delete_mode = False
+    google.reset_counters()
+    result = sheet.sync(data)
+    assert (result.changed, result.deleted) == (5, 1)
+    assert writes() == ['values:batchUpdate', 'batch']
+    assert sheet.data() == expected(data)
+
+    # Other permission errors aren't hidden by writing cell by cell.
+    google.fail_requests(1, status=403,
+                         match='POST ' + mock_google.SHEETS_URL)
+    data['new'] = {'Color': 'new', 'Performer': 'new'}
+    with pytest.raises(Exception) as error:
+        sheet.inject(data)
+    assert sheetsync._http_status(error.value) == 403
+    assert sheet.range_writes
+
+    google.sheets_v4 = False
+    data['new2'] = {'Color': 'new', 'Performer': 'new'}
+    assert sheet.inject(data).added == 2
+    assert not sheet.range_writes
+    assert sheet.data() == expected(data)
+
+def test_compact(monkeypatch):
+    print ('Compacting deletes blank rows and keeps the key index correct.')
+    google = mock_google.install(monkeypatch)
+    sheet = new_sheet(flag_deletes=False)
+    data = make_data(30)
+    sheet.sync(data)
+    wks = google.documents[sheet.document_key].worksheets[0]
+    wks.cells[(40, 9)] = 'note without a header'
+    wks.rows = 45
+    wks.touch()
+    for key in ('3', '4', '5', '17'):
+        del data[key]
+    assert sheet.sync(data).deleted == 4
+    assert len(sheet.blank_rows) == 4
+
+    assert sheet.compact() == 45 - 1 - 27
+    assert wks.rows == 1 + 27 and wks.cells[(28, 9)] == 'note without a header'
+    # The key index was renumbered, so injects still find the right rows.
+    key_col = sheet.header.header_lookup('Key')
+    assert all(wks.cells[(sheet.key_index.row_for((key,)), key_col)]
+               .lstrip("'") == key for key in data)
+    assert sheet.key_index.is_current(['Key'], sheet._worksheet_updated())
+    assert not sheet.blank_rows
+
+    google.reset_counters()
+    data['29']['Color'] = 'changed'
+    assert sheet.inject({'29': data['29']}).changed == 1
+    # Only the changed row was read.
+    assert all('max-row' in url for method, url in google.log
+               if method == 'GET' and '/feeds/cells/' in url)
+    assert sheet.data() == expected(data)
+
+    sheet.compact_threshold = 2
+    del data['10'], data['11']
+    result = sheet.sync(data)
+    assert (result.deleted, result.compacted) == (2, 2)
+    assert wks.rows == 1 + 25
+    assert sheet.data() == expected(data)
+
+    google.sheets_v4 = False
+    del data['12'], data['13']
+    assert sheet.sync(data).compacted == 0
+    assert sheet.data() == expected(data)
+
+    # With every row deleted, one blank row is kept below the header.
+    google.sheets_v4 = True
+    wks.cells = dict((cell, value) for cell, value in wks.cells.items()
+                     if cell[1] != 9)
+    wks.touch()
+    sheet.compact_threshold = None
+    assert sheet.sync({}).deleted == len(data)
+    rows = wks.rows
+    assert sheet.compact() == rows - 2
+    assert wks.rows == 2 and sheet.data() == {}
+
+def test_blank_rows_reused(monkeypatch):
+    print ('New rows fill the blank rows left by deletes before the sheet grows.')
+    google = mock_google.install(monkeypatch)
+    sheet = new_sheet(flag_deletes=False)
+    data = make_data(20)
+    sheet.sync(data)
+    wks = google.documents[sheet.document_key].worksheets[0]
+    rows = wks.rows
+    deleted_rows = set(sheet.key_index.row_for((key,)) for key in ('2', '7', '8'))
+    for key in ('2', '7', '8'):
+        del data[key]
+    sheet.sync(data)
+    assert sheet.blank_rows == deleted_rows
+
+    # A full read finds the blank rows.
+    reopened = sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                               document_key=sheet.document_key,
+                               key_column_headers=['Key'])
+    data.update(make_data(0, new1={'Color': 'a', 'Performer': ''},
+                          new2={'Color': 'b', 'Performer': ''}))
+    google.reset_counters()
+    assert reopened.sync(data).added == 2
+    assert not [url for method, url in google.log if method == 'PUT']
+    assert set(reopened.key_index.row_for((key,)) for key in
+               ('new1', 'new2')) < deleted_rows
+    assert len(reopened.blank_rows) == 1
+
+    # Injects using the key index reuse the last one, then grow the sheet.
+    data.update(make_data(0, new3={'Color': 'c', 'Performer': ''},
+                          new4={'Color': 'd', 'Performer': ''}))
+    assert reopened.inject(dict((key, data[key]) for key in
+                                ('new3', 'new4'))).added == 2
+    assert not reopened.blank_rows
+    assert wks.rows == max(rows, 22)
+    assert reopened.data() == expected(data)
+
+    # A row with a value in a column without a header isn't blank.
+    noted_row = reopened.key_index.row_for(('9',))
+    reopened.flag_delete_mode = False
+    del data['9']
+    reopened.sync(data)
+    wks.cells[(noted_row, 9)] = 'note without a header'
+    wks.touch()
+    data.update(make_data(0, new5={'Color': 'e', 'Performer': ''}))
+    assert reopened.sync(data).added == 1
+    assert reopened.key_index.row_for(('new5',)) != noted_row
+    assert wks.cells[(noted_row, 9)] == 'note without a header'
+    assert reopened.data() == expected(data)
+
+def test_coalesce_ranges():
+    print ('Adjacent cell updates are grouped into rectangles.')
+    cells = [sheetsync.CellUpdate(row, col, '%s,%s' % (row, col))
+             for row in (2, 3, 4) for col in (1, 2, 3)]
+    cells += [sheetsync.CellUpdate(6, 2, 'a'), sheetsync.CellUpdate(7, 2, 'b'),
+              sheetsync.CellUpdate(9, 5, 'lonely'), sheetsync.CellUpdate(3, 2, 'new')]
+    ranges, scattered = sheetsync._coalesce_ranges(cells)
+    assert ranges == [(2, 1, [['2,1', '2,2', '2,3'], ['3,1', 'new', '3,3'],
+                              ['4,1', '4,2', '4,3']]),
+                      (6, 2, [['a'], ['b']])]
+    assert [(cell.row, cell.col) for cell in scattered] == [(9, 5)]
+    assert sheetsync._a1_address(12, 28) == 'AB12'
+
+def test_narrow_then_keyed_inject(monkeypatch):
+    print ('Rows added after a narrow inject go below values in unread columns.')
+    google = mock_google.install(monkeypatch)
+    sheet = new_sheet()
+    data = make_data(50)
+    sheet.sync(data)
+    wks = google.documents[sheet.document_key].worksheets[0]
+    performer = sheet.header.header_lookup('Performer')
+    wks.cells[(52, performer)] = 'stray'
+    wks.rows = max(wks.rows, 52)
+    wks.touch()
+
+    assert sheet.inject({'3': {'Color': 'changed'}},
+                        narrow_read=True).changed == 1
+    assert sheet.max_row == 52
+    # This inject uses the key index stamped by the narrow one.
+    new_rows = {'new1': {'Color': 'a'}, 'new2': {'Color': 'b'}}
+    assert sheet.inject(new_rows).added == 2
+    assert wks.cells[(52, performer)] == 'stray'
+    assert set(sheet.key_index.row_for((key,)) for key in new_rows) == set([53, 54])
+
+def test_update_metrics(monkeypatch):
+    print ('UpdateResults counts requests and bytes, and times each phase.')
+    google = mock_google.install(monkeypatch)
+    pushed = []
+    sheet = new_sheet(metrics_callback=pushed.append, range_writes=False)
+    data = make_data(100)
+    sheet.sync(data)
+    data['3']['Color'] = 'changed'
+    data['new'] = {'Color': 'new'}
+    google.reset_counters()
+    result = sheet.sync(data)
+    assert result.requests == google.requests
+    assert result.bytes_sent == google.bytes_sent
+    assert result.bytes_received == google.bytes_received
+    assert result.cells_read >= 100 * 3
+    assert result.cells_written == 1 + 3
+    assert result.batches == 1
+    assert set(result.timings) == set(['headers', 'read', 'diff', 'resize',
+                                       'insert', 'flush', 'write'])
+    assert pushed[-1] == result.metrics()
+    assert pushed[-1]['changed'] == 1 and pushed[-1]['added'] == 1
+
+def test_request_hooks(monkeypatch):
+    print ('Request hooks see every call made to google.')
+    google = mock_google.install(monkeypatch)
+
+    class Recorder(sheetsync.RequestHook):
+        def __init__(self):
+            self.before, self.after = [], []
+
+        def before_request(self, operation, params):
+            self.before.append(operation)
+
+        def after_request(self, operation, params, seconds, bytes_sent,
+                          bytes_received, error):
+            self.after.append((operation, bytes_sent, bytes_received, error))
+
+    recorder = Recorder()
+    sheet = new_sheet(request_hooks=[recorder], range_writes=False)
+    assert recorder.before[:2] == ['files.list', 'files.insert']
+    del recorder.before[:], recorder.after[:]
+    google.reset_counters()
+    sheet.sync(make_data(10))
+    assert len(recorder.after) == google.requests
+    assert [op for op, _, _, _ in recorder.after] == recorder.before
+    assert sum(sent for _, sent, _, _ in recorder.after) == google.bytes_sent
+    assert sum(got for _, _, got, _ in recorder.after) == google.bytes_received
+    assert 'cells.batch' in recorder.before
+
+    google.max_body_bytes = 10
+    try:
+        sheet.inject({'new': {'Color': 'x' * 100}})
+    except Exception:
+        pass
+    assert recorder.after[-1][0] == 'cells.batch'
+    assert recorder.after[-1][3] is not None
+
+def test_retries(monkeypatch):
+    print ('Rate limit and server errors are retried, and partly failed batches resumed.')
+    google = mock_google.install(monkeypatch)
+    sleeps = []
+    mock_google.patch_sleep(monkeypatch, sleeps.append)
+    sheet = new_sheet(retry_policy=sheetsync.RetryPolicy(base_delay=0.5),
+                      range_writes=False)
+
+    google.fail_requests(2, status=429)
+    data = make_data(20)
+    assert sheet.sync(data).added == 20
+    assert len(sleeps) == 2 and all(0 <= delay <= 1.0 for delay in sleeps)
+
+    # Drive errors carry a Retry-After header.
+    google.fail_requests(1, status=503, retry_after=7)
+    reopened = sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                               document_key=sheet.document_key,
+                               range_writes=False)
+    assert sleeps[-1] == 7
+
+    for row in data.values():
+        row['Color'] = 'changed'
+    google.fail_batch_entries(5)
+    google.reset_counters()
+    assert reopened.sync(data).changed == 20
+    batches = [url for method, url in google.log if url.endswith('/batch')]
+    assert len(batches) == 2
+    assert reopened.data() == expected(data)
+
+    # So do spreadsheet feed errors, though gspread drops the headers.
+    google.fail_requests(1, status=429, retry_after=3)
+    assert reopened.data() == expected(data)
+    assert sleeps[-1] == 3
+
+    google.fail_requests(2, status=500)
+    with pytest.raises(Exception) as error:
+        sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                        document_key=sheet.document_key,
+                        retry_policy=sheetsync.RetryPolicy(max_attempts=2))
+    assert sheetsync._http_status(error.value) == 500
+
+def test_creates_not_repeated(monkeypatch):
+    print ('Requests that create documents are only retried when rate limited.')
+    google = mock_google.install(monkeypatch)
+    mock_google.patch_sleep(monkeypatch, lambda seconds: None)
+    create = 'POST ' + mock_google.DRIVE_URL + 'files'
+    google.fail_requests(1, status=503, match=create)
+    with pytest.raises(Exception) as error:
+        new_sheet()
+    assert sheetsync._http_status(error.value) == 503
+    assert google.documents == {}
+
+    google.fail_requests(1, status=429, match=create)
+    sheet = new_sheet()
+    assert google.documents.keys() == [sheet.document_key]
+
+def test_shared_clients(monkeypatch):
+    print ('Sheets with the same credentials share clients and log in once.')
+    google = mock_google.install(monkeypatch)
+    sheet = new_sheet()
+    sheet.sync(make_data(10))
+    google.reset_counters()
+    del google.log[:]
+    other = sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                            document_key=sheet.document_key,
+                            worksheet_name='Other', key_column_headers=['Key'])
+    other.sync(make_data(5))
+    assert not [url for method, url in google.log if 'discovery' in url]
+    assert other.gspread_client is sheet.gspread_client
+    assert other.drive_service is sheet.drive_service
+
+    # Each thread gets its own client.
+    clients = []
+    thread = threading.Thread(target=lambda: clients.append(sheet.gspread_client))
+    thread.start()
+    thread.join()
+    assert clients[0] is not sheet.gspread_client
+
+    class ExpiringCredentials(mock_google.MockCredentials):
+        refresh_token = 'another-account'
+        access_token_expired = True
+        refreshes = 0
+
+        def refresh(self, http):
+            self.refreshes += 1
+            self.access_token = 'token %s' % self.refreshes
+            self.access_token_expired = False
+
+    credentials = ExpiringCredentials()
+    reopened = sheetsync.Sheet(credentials=credentials,
+                               document_key=sheet.document_key)
+    assert reopened.data() == sheet.data()
+    client = reopened.gspread_client
+    assert client is not sheet.gspread_client
+    assert client.session.headers['Authorization'] == 'Bearer token 1'
+    credentials.access_token_expired = True
+    reopened.data()
+    assert credentials.refreshes == 2
+    assert client.session.headers['Authorization'] == 'Bearer token 2'
+
+def test_discovery_download_lock(monkeypatch):
+    print ('Fetching a discovery document only holds up threads that need it.')
+    google = mock_google.install(monkeypatch)
+    fetching, release = threading.Event(), threading.Event()
+    loads = []
+
+    class SlowCache(object):
+        def load(self, api, version):
+            loads.append(api)
+            fetching.set()
+            assert release.wait(5)
+        def save(self, api, version, content):
+            pass
+
+    registry = sheetsync.ClientRegistry(SlowCache())
+    credentials = mock_google.MockCredentials()
+    services = []
+    threads = [threading.Thread(target=lambda: services.append(
+                                    registry.drive_service(credentials)))
+               for i in range(2)]
+    for thread in threads:
+        thread.start()
+    assert fetching.wait(5)
+    # The registry isn't locked while the document downloads.
+    assert registry.gspread_client(credentials)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(services) == 2
+    assert loads == ['drive']
+    assert len([url for method, url in google.log if 'discovery' in url]) == 1
+
+def test_discovery_cache(monkeypatch, tmpdir):
+    print ('The Drive discovery document is saved between processes.')
+    google = mock_google.install(monkeypatch)
+    cache = sheetsync.DiscoveryCache(str(tmpdir))
+    discovery = lambda: [url for method, url in google.log if 'discovery' in url]
+    monkeypatch.setattr(sheetsync, 'shared_clients',
+                        sheetsync.ClientRegistry(cache))
+    sheet = new_sheet()
+    assert len(discovery()) == 1
+    assert cache.load('drive', 'v2')
+
+    # A new process reads the saved document.
+    monkeypatch.setattr(sheetsync, 'shared_clients',
+                        sheetsync.ClientRegistry(cache))
+    new_sheet()
+    assert len(discovery()) == 1
+
+    # Until it expires.
+    cache.ttl = 0
+    monkeypatch.setattr(sheetsync, 'shared_clients',
+                        sheetsync.ClientRegistry(cache))
+    new_sheet()
+    assert len(discovery()) == 2
+
+def test_discovery_cache_opt_in(monkeypatch, tmpdir):
+    print ('By default discovery documents are only kept in memory.')
+    assert sheetsync.shared_clients.discovery_cache is None
+    google = mock_google.install(monkeypatch)
+    monkeypatch.setenv('HOME', str(tmpdir))
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir))
+    monkeypatch.setattr(sheetsync, 'shared_clients', sheetsync.ClientRegistry())
+    new_sheet()
+    new_sheet()
+    assert len([url for method, url in google.log if 'discovery' in url]) == 1
+    assert tmpdir.listdir() == []
+
+def test_public_reexports():
+    print ('Names from the google libraries are still importable from sheetsync.')
+    import gspread
+    from oauth2client import client
+    from sheetsync import (SpreadsheetNotFound, WorksheetNotFound,
+                           OAuth2Credentials, OAuth2WebServerFlow,
+                           AccessTokenRefreshError)
+    assert SpreadsheetNotFound is gspread.SpreadsheetNotFound
+    assert WorksheetNotFound is gspread.WorksheetNotFound
+    assert OAuth2Credentials is client.OAuth2Credentials
+    assert OAuth2WebServerFlow is client.OAuth2WebServerFlow
+    assert AccessTokenRefreshError is client.AccessTokenRefreshError
+
+    # Missing names are an AttributeError, as for any module.
+    with pytest.raises(AttributeError):
+        sheetsync.NoSuchName
+    with pytest.raises(AttributeError):
+        sheetsync.gspread.NoSuchName
+    assert not hasattr(sheetsync.apiclient, 'no_such_module')
+
+def test_spreadsheet_sync(monkeypatch):
+    print ('A Spreadsheet finds its document once and syncs worksheets in parallel.')
+    google = mock_google.install(monkeypatch)
+    spreadsheet = sheetsync.Spreadsheet(credentials=mock_google.MockCredentials(),
+                                        document_name="Muppets",
+                                        key_column_headers=['Key'])
+    data = dict(('Sheet %s' % i, make_data(20 + i)) for i in range(6))
+    results = spreadsheet.sync(data)
+    assert sorted(results) == sorted(data)
+    assert results['Sheet 5'].added == 25
+    for name, rows in data.items():
+        assert spreadsheet.worksheet(name).data() == expected(rows)
+
+    def requests(path):
+        return len([url for method, url in google.log
+                    if method == 'GET' and url.split('?')[0].endswith(path)])
+    assert requests('drive/v2/files') == 1
+    assert requests('spreadsheets/private/full') == 1
+    assert requests('worksheets/%s/private/full' % spreadsheet.document_key) == 1
+
+    # One worksheet failing doesn't stop the others.
+    data['Sheet 1']['3']['Color'] = 'changed'
+    data['Sheet 2'] = {('bad', 'key'): {'Color': 'x'}}
+    with pytest.raises(sheetsync.BadDataFormat):
+        spreadsheet.inject(data)
+    assert spreadsheet.worksheet('Sheet 1').data()['3']['Color'] == 'changed'
+
+def test_spreadsheet_threads_keep_their_clients(monkeypatch):
+    print ('Repeated Spreadsheet syncs reuse pool threads, and their clients.')
+    import gspread
+    google = mock_google.install(monkeypatch)
+    sessions = []
+    session_class = gspread.client.HTTPSession
+    monkeypatch.setattr(gspread.client, 'HTTPSession',
+                        lambda: sessions.append(1) or session_class())
+    spreadsheet = sheetsync.Spreadsheet(credentials=mock_google.MockCredentials(),
+                                        document_name="Muppets",
+                                        key_column_headers=['Key'])
+    data = dict(('Sheet %s' % i, make_data(5)) for i in range(4))
+    for i in range(6):
+        spreadsheet.sync(data)
+    assert len(sessions) <= sheetsync.ASYNC_POOL_SIZE + 1
+
+def test_async_sheets(monkeypatch):
+    print ('AsyncSheets run calls in the background and in order.')
+    google = mock_google.install(monkeypatch)
+    doc = google.create_document('Muppets')
+    pool = sheetsync.ThreadPool(4)
+    try:
+        sheets = [sheetsync.AsyncSheet(credentials=mock_google.MockCredentials(),
+                                       document_key=doc.key,
+                                       worksheet_name='Sheet %s' % i,
+                                       key_column_headers=['Key'], pool=pool)
+                  for i in range(8)]
+        finished = []
+        syncs = [sheet.sync(make_data(10 + i)) for i, sheet in enumerate(sheets)]
+        reads = [sheet.data() for sheet in sheets]
+        reads[-1].add_done_callback(finished.append)
+        assert all(isinstance(sync, futures.Future) for sync in syncs)
+        assert len(list(futures.as_completed(syncs, timeout=30))) == 8
+        assert [sync.result().added for sync in syncs] == range(10, 18)
+        futures.wait(reads, timeout=30)
+        for i, read in enumerate(reads):
+            assert read.result(timeout=30) == expected(make_data(10 + i))
+        assert finished == [reads[-1]]
+
+        # Errors are raised by result, and later calls still run.
+        bad = sheets[0].inject({('bad', 'key'): {'Color': 'x'}})
+        good = sheets[0].get('3')
+        assert isinstance(bad.exception(timeout=30), sheetsync.BadDataFormat)
+        with pytest.raises(sheetsync.BadDataFormat):
+            bad.result()
+        assert good.result(timeout=30)['Color'] == 'color 3'
+    finally:
+        pool.terminate()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the retry policy and rate limiter. These don't need a google account.
+"""
+import sheetsync
+from tests import mock_google
+
+def test_retry_policy():
+    print ('Only rate limit and server errors are retried, with growing delays.')
+    policy = sheetsync.RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=3.0)
+    assert policy.should_retry(Exception("429: Rate Limit Exceeded"), 1)
+    assert policy.should_retry(Exception("503: Backend Error"), 3)
+    assert not policy.should_retry(Exception("503: Backend Error"), 4)
+    assert not policy.should_retry(Exception("400: Bad Request"), 1)
+    creating = dict(idempotent=False)
+    assert policy.should_retry(Exception("429: Rate Limit Exceeded"), 1, **creating)
+    assert not policy.should_retry(Exception("503: Backend Error"), 1, **creating)
+    import socket, errno, httplib
+    refused = socket.error(errno.ECONNREFUSED, "Connection refused")
+    assert policy.should_retry(refused, 1, **creating)
+    assert not policy.should_retry(httplib.BadStatusLine(''), 1, **creating)
+    for attempt, limit in [(1, 1.0), (2, 2.0), (3, 3.0), (6, 3.0)]:
+        for _ in range(20):
+            assert 0 <= policy.delay(Exception("500: Error"), attempt) <= limit
+
+def test_token_bucket(monkeypatch):
+    print ('The token bucket allows a burst, then spaces requests out.')
+    clock = [1000.0]
+    monkeypatch.setattr(sheetsync.time, 'time', lambda: clock[0])
+    mock_google.patch_sleep(monkeypatch,
+                        lambda seconds: clock.__setitem__(0, clock[0] + seconds))
+    bucket = sheetsync.TokenBucket(rate=2, capacity=4)
+    for _ in range(4):
+        bucket.acquire()
+    assert clock[0] == 1000.0
+    for _ in range(4):
+        bucket.acquire()
+    assert abs(clock[0] - 1002.0) < 1e-6
+
+    unlimited = sheetsync.TokenBucket()
+    for _ in range(100):
+        unlimited.acquire()
+    assert abs(clock[0] - 1002.0) < 1e-6
+
+def test_connection_dropped_after_transport_error():
+    print ('A connection that fails is replaced, so the retry can be sent.')
+    import socket
+    import threading
+    import httplib
+    import gspread
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(2)
+    replies = ["", "HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok"]
+
+    def serve():
+        for reply in replies:
+            conn, _ = listener.accept()
+            conn.recv(4096)
+            conn.sendall(reply)
+            conn.close()
+    server = threading.Thread(target=serve)
+    server.daemon = True
+    server.start()
+
+    url = 'http://127.0.0.1:%s/feed' % listener.getsockname()[1]
+    session = sheetsync._CountedSession(gspread.client.HTTPSession(),
+                                        lambda **amounts: None)
+    try:
+        session.get(url)
+        assert False, "The dropped connection should raise"
+    except (socket.error, httplib.HTTPException):
+        pass
+    assert session.connections == {}
+    assert session.get(url).read() == "ok"
+    server.join(5)
+    listener.close()
+
+def test_session_copies_headers():
+    print ('Requests get their own headers, and still go through the counter.')
+    import gspread
+    seen = []
+    class RecordingSession(gspread.client.HTTPSession):
+        def request(self, method, url, data=None, headers=None):
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            seen.append((method, headers))
+    counts = []
+    session = sheetsync._CountedSession(RecordingSession(),
+                                        lambda **amounts: counts.append(amounts))
+    url = 'http://127.0.0.1/feed'
+    session.post(url, 'a')
+    headers = {'If-Match': '*'}
+    session.put(url, 'b', headers=headers)
+    session.get(url)
+    assert headers == {'If-Match': '*'}
+    assert gspread.client.HTTPSession.post.im_func.func_defaults == (None, {})
+    assert [method for method, headers in seen] == ['POST', 'PUT', 'GET']
+    assert seen[1][1]['If-Match'] == '*'
+    assert len(counts) == 3 and counts[0]['bytes_sent'] == 1
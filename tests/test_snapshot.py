@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the on-disk snapshot store. These don't need a google account.
+"""
+import sheetsync
+from tests import mock_google
+import shutil, tempfile
+
+def test_snapshot_round_trip():
+    print ('Save, load and clear a worksheet snapshot.')
+    directory = tempfile.mkdtemp()
+    try:
+        store = sheetsync.SnapshotStore(directory)
+        assert store.load("doc-key", "Sheet1") is None
+
+        snapshot = {'updated': '2014-06-01T12:00:00.000Z',
+                    'rows': [[2, {'Key': 'Kermit', 'Color': 'Green'}]]}
+        store.save("doc-key", "Sheet1", snapshot)
+        assert store.load("doc-key", "Sheet1") == snapshot
+        assert store.load("doc-key", "Sheet2") is None
+
+        store.clear("doc-key", "Sheet1")
+        assert store.load("doc-key", "Sheet1") is None
+    finally:
+        shutil.rmtree(directory)
+
+def test_snapshot_sync(monkeypatch, tmpdir):
+    print ('Syncs with an up to date snapshot only read the rows they change.')
+    google = mock_google.install(monkeypatch)
+    sheet = sheetsync.Sheet(credentials=mock_google.MockCredentials(),
+                            document_name="Muppets",
+                            key_column_headers=['Key'],
+                            snapshot_store=sheetsync.SnapshotStore(str(tmpdir)))
+    data = dict((str(i), {'Color': 'color %s' % i}) for i in range(200))
+    assert sheet.sync(data).added == 200
+
+    google.reset_counters()
+    assert sheet.sync(data).nochange == 200
+    assert google.bytes_received < 5000
+
+    data['3']['Color'] = 'changed'
+    del data['7']
+    result = sheet.sync(data)
+    assert (result.changed, result.deleted, result.nochange) == (1, 1, 198)
+
+    # An edit by someone else makes the snapshot stale.
+    wks = google.documents[sheet.document_key].worksheets[0]
+    wks.cells[(5, 2)] = 'edited'
+    wks.touch()
+    assert sheet.sync(data).changed == 1
+
+    rows = sheet.data()
+    for key, row in data.items():
+        assert rows[key]['Color'] == row['Color']
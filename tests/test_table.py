@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the column-oriented row storage. These don't need a google account.
+"""
+import sheetsync
+
+def test_row_views():
+    print ('Rows read and write through views onto the table columns.')
+    table = sheetsync.Table(['Key', 'Color'])
+    kermit = table.append(2, {'Key': 'Kermit', 'Color': 'Green'})
+    piggy = table.append(5, {'Key': 'Miss Piggy'})
+
+    assert len(table) == 2
+    assert kermit.row_num == 2 and piggy.row_num == 5
+    assert kermit == {'Key': 'Kermit', 'Color': 'Green'}
+    assert piggy == {'Key': 'Miss Piggy', 'Color': u''}
+
+    piggy['Color'] = 'Pink'
+    assert table.columns['Color'] == ['Green', 'Pink']
+    assert dict(piggy) == {'Key': 'Miss Piggy', 'Color': 'Pink'}